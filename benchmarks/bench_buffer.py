@@ -0,0 +1,44 @@
+"""
+NPZReplayBuffer.append / sample latency at several fill levels.
+
+The ring is filled with packed rows from random positions, then append()
+(float planes, as the trainer calls it) and sample(64) are timed.
+
+    python -m benchmarks.bench_buffer
+"""
+from __future__ import annotations
+import os
+import tempfile
+from typing import List
+
+import numpy as np
+
+from benchmarks.common import Result, best_of, print_results, random_boards
+from src.learning.dataset import NPZReplayBuffer
+from src.learning.features import board_to_planes, pack_planes
+
+def results(quick: bool = False, fills=None, batch_size: int = 64) -> List[Result]:
+    fills = fills or ((1_000, 10_000) if quick else (1_000, 10_000, 100_000))
+    ops, samples, repeat = 1_000, 200, (3 if quick else 5)
+    planes = np.stack([board_to_planes(b) for b in random_boards(1_000)])
+    bitboards, flags = pack_planes(planes)
+    out: List[Result] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fill in fills:
+            buf = NPZReplayBuffer(os.path.join(tmp, f"buf_{fill}.npz"), capacity=fill)
+            for i in range(fill):
+                j = i % len(planes)
+                buf.append_packed(bitboards[j], flags[j], 0.0, i % 4672)
+            t_append = best_of(lambda: [buf.append(planes[i % len(planes)], 0.0, 0) for i in range(ops)], repeat)
+            t_sample = best_of(lambda: [buf.sample(batch_size) for _ in range(samples)], repeat)
+            buf.close()
+            out.append(Result(f"buffer.append[{fill}]", t_append / ops * 1e6, "us"))
+            out.append(Result(f"buffer.sample{batch_size}[{fill}]", t_sample / samples * 1e3, "ms"))
+    return out
+
+def main() -> int:
+    print_results(results())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
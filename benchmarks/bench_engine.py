@@ -0,0 +1,47 @@
+"""
+EngineWrapper.analyse overhead, excluding search time.
+
+The bundled fake UCI engine is driven through EngineWrapper with the
+profiler on; the wrapper's own cost is the engine.analyse span minus the
+engine.search span inside it (limits, line building, cache lookups and
+stores). Cache hits are timed separately, since they skip the engine.
+
+    python -m benchmarks.bench_engine
+"""
+from __future__ import annotations
+from typing import List
+
+from benchmarks.common import Result, best_of, fake_engine_cmd, print_results, random_boards
+from src.engine.engine_wrapper import EngineWrapper
+from src.engine.eval_cache import EvalCache
+from src.utils.logging_utils import PROFILER
+
+def results(quick: bool = False, depth: int = 4, multipv: int = 3) -> List[Result]:
+    n, repeat = (20, 3) if quick else (100, 5)
+    boards = [b for b in random_boards(2 * n, seed=2) if not b.is_game_over()][:n]
+    enabled = PROFILER.enabled
+    PROFILER.enabled = True
+    try:
+        with EvalCache(None) as cache, \
+                EngineWrapper(fake_engine_cmd(), depth=depth, multipv=multipv, cache=cache) as eng:
+            eng.analyse(boards[0])                      # warm-up
+            PROFILER.reset()
+            for b in boards:
+                eng.analyse(b)
+            spans = PROFILER.summary()
+            hit_s = best_of(lambda: [eng.analyse(b) for b in boards], repeat)
+    finally:
+        PROFILER.enabled = enabled
+        PROFILER.reset()
+    analyse, search = spans["engine.analyse"], spans["engine.search"]
+    return [Result("engine.search_fake", search["mean_ms"], "ms"),
+            Result("engine.analyse_overhead",
+                   (analyse["total_ms"] - search["total_ms"]) / analyse["count"] * 1e3, "us"),
+            Result("engine.analyse_cache_hit", hit_s / n * 1e6, "us")]
+
+def main() -> int:
+    print_results(results())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
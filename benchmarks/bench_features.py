@@ -0,0 +1,38 @@
+"""
+board_to_planes (per board, Python loops) vs boards_to_planes (batched NumPy).
+
+    python -m benchmarks.bench_features
+"""
+from __future__ import annotations
+from typing import List
+
+import numpy as np
+
+from benchmarks.common import Result, best_of, random_boards
+from src.learning.features import board_to_planes, boards_to_planes
+
+def run(sizes=(1, 100, 10_000), repeat: int = 5) -> List[dict]:
+    rows = []
+    for n in sizes:
+        boards = random_boards(n)
+        out = np.empty((n, 18, 8, 8), dtype=np.float32)
+        assert np.array_equal(np.stack([board_to_planes(b) for b in boards]), boards_to_planes(boards))
+        t_loop = best_of(lambda: [board_to_planes(b) for b in boards], repeat)
+        t_vec = best_of(lambda: boards_to_planes(boards, out=out), repeat)
+        rows.append({"n": n, "loop_s": t_loop, "batched_s": t_vec, "speedup": t_loop / t_vec})
+    return rows
+
+def results(quick: bool = False) -> List[Result]:
+    n = 1_000 if quick else 10_000
+    r = run(sizes=(n,), repeat=3 if quick else 5)[0]
+    return [Result("features.board_to_planes", n / r["loop_s"], "boards/s", higher_is_better=True),
+            Result("features.boards_to_planes", n / r["batched_s"], "boards/s", higher_is_better=True)]
+
+def main() -> int:
+    print(f"{'N':>7} {'board_to_planes':>16} {'boards_to_planes':>17} {'speedup':>8}")
+    for r in run():
+        print(f"{r['n']:>7} {r['loop_s'] * 1e3:>13.3f} ms {r['batched_s'] * 1e3:>14.3f} ms {r['speedup']:>7.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
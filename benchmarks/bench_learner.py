@@ -0,0 +1,48 @@
+"""
+OnlineLearner.step_after_move latency (append + one update + checkpoint).
+
+Runs on a fresh model and a replay buffer prefilled past one batch, in a
+temporary directory so real checkpoints are never touched.
+
+    python -m benchmarks.bench_learner
+"""
+from __future__ import annotations
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import torch
+
+from benchmarks.common import Result, print_results, random_boards
+from src.learning.features import board_to_planes
+from src.learning.learner import OnlineLearner
+
+def results(quick: bool = False, batch_size: int = 64) -> List[Result]:
+    steps = 10 if quick else 50
+    torch.manual_seed(0)
+    planes = [board_to_planes(b) for b in random_boards(4 * batch_size)]
+    times: List[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        learner = OnlineLearner(model_path=os.path.join(tmp, "model", "latest.ckpt"),
+                                opt_path=os.path.join(tmp, "opt", "latest.opt"),
+                                buffer_path=os.path.join(tmp, "buffer.npz"))
+        for i, x in enumerate(planes):
+            learner.buffer.append(x, 0.0, i)
+        learner.step_after_move(planes[0], 0.0, 0, batch_size=batch_size)     # warm-up
+        for i in range(steps):
+            t0 = time.perf_counter()
+            learner.step_after_move(planes[i % len(planes)], 0.0, i, batch_size=batch_size)
+            times.append(time.perf_counter() - t0)
+        learner.buffer.close()
+    ms = np.array(times) * 1e3
+    return [Result("learner.step_after_move_p50", float(np.percentile(ms, 50)), "ms"),
+            Result("learner.step_after_move_p95", float(np.percentile(ms, 95)), "ms")]
+
+def main() -> int:
+    print_results(results())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
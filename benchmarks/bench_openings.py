@@ -0,0 +1,69 @@
+"""
+OpeningExplorer.identify latency versus book size.
+
+Books of synthetic named lines (random games of 4-16 plies) are written as
+ECO JSON and loaded the way the trainer loads its book. Queries are the
+final positions of book lines (hits) and random positions (mostly misses).
+
+    python -m benchmarks.bench_openings
+"""
+from __future__ import annotations
+import json
+import os
+import random
+import tempfile
+from typing import Dict, List, Tuple
+
+import chess
+
+from benchmarks.common import Result, best_of, print_results, random_boards
+from src.openings.opening_explorer import OpeningExplorer
+
+def synthetic_book(n: int, seed: int = 0) -> Dict[str, Tuple[str, str]]:
+    rng = random.Random(seed)
+    book: Dict[str, Tuple[str, str]] = {}
+    while len(book) < n:
+        b = chess.Board()
+        sans = []
+        for _ in range(rng.randint(4, 16)):
+            moves = list(b.legal_moves)
+            if not moves:
+                break
+            mv = rng.choice(moves)
+            sans.append(b.san(mv))
+            b.push(mv)
+        book.setdefault(" ".join(sans), (f"A{len(book) % 100:02d}", f"Line {len(book)}"))
+    return book
+
+def _line_board(seq: str) -> chess.Board:
+    b = chess.Board()
+    for san in seq.split():
+        b.push_san(san)
+    return b
+
+def results(quick: bool = False, sizes=None) -> List[Result]:
+    sizes = sizes or ((100, 1_000) if quick else (100, 1_000, 10_000))
+    queries, repeat = (200, 3) if quick else (1_000, 5)
+    out: List[Result] = []
+    misses = random_boards(queries, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            book = synthetic_book(n)
+            path = os.path.join(tmp, f"book_{n}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(book, f)
+            explorer = OpeningExplorer(eco_json_path=path)
+            rng = random.Random(n)
+            hits = [_line_board(seq) for seq in rng.sample(sorted(book), min(queries, n))]
+            t_hit = best_of(lambda: [explorer.identify(b) for b in hits], repeat)
+            t_miss = best_of(lambda: [explorer.identify(b) for b in misses], repeat)
+            out.append(Result(f"openings.identify_hit[{n}]", t_hit / len(hits) * 1e6, "us"))
+            out.append(Result(f"openings.identify_random[{n}]", t_miss / len(misses) * 1e6, "us"))
+    return out
+
+def main() -> int:
+    print_results(results())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
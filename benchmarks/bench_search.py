@@ -0,0 +1,45 @@
+"""
+simple_ab search speed: nodes/s and best_move() time to a fixed depth.
+
+best_move() does not report its node count, so nodes/s comes from the same
+fresh AlphaBetaSearcher it builds internally, searched to the same depth.
+
+    python -m benchmarks.bench_search
+"""
+from __future__ import annotations
+import time
+from typing import List
+
+import chess
+
+from benchmarks.common import Result, best_of, print_results
+from src.engine.simple_ab import AlphaBetaSearcher, best_move
+
+POSITIONS = [
+    chess.STARTING_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",        # Italian
+    "r2q1rk1/pp2bppp/2n1bn2/3p4/3P4/2NBBN2/PP3PPP/R2Q1RK1 w - - 4 11",             # IQP middlegame
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",                                       # back-rank mate
+]
+
+def results(quick: bool = False) -> List[Result]:
+    depth, repeat = (3, 1) if quick else (4, 3)
+    boards = [chess.Board(fen) for fen in POSITIONS]
+    nodes = 0
+    elapsed = 0.0
+    for b in boards:
+        searcher = AlphaBetaSearcher(tt_size=1 << 16)
+        t0 = time.perf_counter()
+        searcher.analyse(b, depth=depth)
+        elapsed += time.perf_counter() - t0
+        nodes += searcher.nodes
+    t_best = best_of(lambda: [best_move(b, depth=depth) for b in boards], repeat)
+    return [Result(f"search.nodes_per_s[d{depth}]", nodes / elapsed, "nodes/s", higher_is_better=True),
+            Result(f"search.best_move[d{depth}]", t_best / len(boards) * 1e3, "ms")]
+
+def main() -> int:
+    print_results(results())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
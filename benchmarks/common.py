@@ -0,0 +1,59 @@
+"""
+Shared helpers for the benchmark modules.
+
+Each module exposes results(quick=False) -> List[Result]; benchmarks.suite runs
+them all, writes JSON and compares against a baseline.
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, List
+
+import chess
+
+# the deterministic UCI stub the tests use; no Stockfish needed
+FAKE_ENGINE = Path(__file__).resolve().parent.parent / "tests" / "fake_uci_engine.py"
+
+@dataclass
+class Result:
+    name: str                       # "<group>.<metric>[<param>]", stable across runs
+    value: float
+    unit: str
+    higher_is_better: bool = False
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+def fake_engine_cmd(*flags: str) -> List[str]:
+    return [sys.executable, str(FAKE_ENGINE), *flags]
+
+def random_boards(n: int, seed: int = 0) -> List[chess.Board]:
+    """`n` positions from seeded random games (restarted after 80 plies)."""
+    rng = random.Random(seed)
+    boards: List[chess.Board] = []
+    b = chess.Board()
+    while len(boards) < n:
+        moves = list(b.legal_moves)
+        if not moves or b.ply() > 80:
+            b = chess.Board()
+            continue
+        b.push(rng.choice(moves))
+        boards.append(b.copy(stack=False))
+    return boards
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    """Fastest of `repeat` calls, in seconds (the least noisy estimate)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def print_results(results: List[Result]):
+    width = max((len(r.name) for r in results), default=0)
+    for r in results:
+        print(f"{r.name:<{width}} {r.value:>12.3f} {r.unit}")
@@ -0,0 +1,128 @@
+"""
+Run every benchmark, write the results as JSON and compare them with a
+baseline from an earlier run.
+
+    python -m benchmarks.suite --quick                     # smoke run, seconds
+    python -m benchmarks.suite --save-baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/results/baseline.json --threshold 0.15
+
+Runs offline: engine benchmarks use the bundled fake UCI engine. With a
+baseline, a metric regresses when it is worse by more than the threshold
+(a fraction: 0.15 = 15%) and the exit status is 1. Only metrics present
+in both runs are compared, so quick and full runs of parametrised
+benchmarks never mix. Baselines are machine-specific; keep them out of git.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import bench_buffer, bench_engine, bench_features, bench_learner, bench_openings, bench_search
+from benchmarks.common import Result
+
+BENCHMARKS: Dict[str, Callable[[bool], List[Result]]] = {
+    "openings": bench_openings.results,
+    "features": bench_features.results,
+    "buffer": bench_buffer.results,
+    "learner": bench_learner.results,
+    "engine": bench_engine.results,
+    "search": bench_search.results,
+}
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def run(names: Optional[List[str]] = None, quick: bool = False) -> dict:
+    results: List[Result] = []
+    for name in names or list(BENCHMARKS):
+        t0 = time.perf_counter()
+        results.extend(BENCHMARKS[name](quick))
+        print(f"[{name}] {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": _git_commit(), "quick": quick,
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "results": [r.as_dict() for r in results],
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[dict]:
+    """One row per metric in both runs; `change` > 0 means worse."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        b = base.get(r["name"])
+        if b is None or not b["value"] or b["value"] <= 0:
+            continue
+        change = (r["value"] - b["value"]) / b["value"]
+        if r.get("higher_is_better"):
+            change = -change
+        rows.append({"name": r["name"], "unit": r["unit"], "baseline": b["value"], "value": r["value"],
+                     "change": change, "regressed": change > threshold})
+    return rows
+
+def format_report(current: dict, rows: Optional[List[dict]] = None) -> str:
+    by_name = {row["name"]: row for row in rows or []}
+    width = max((len(r["name"]) for r in current["results"]), default=0)
+    out = []
+    for r in current["results"]:
+        line = f"{r['name']:<{width}} {r['value']:>12.3f} {r['unit']:<8}"
+        row = by_name.get(r["name"])
+        if row is not None:
+            verdict = "worse" if row["change"] > 0 else "better"
+            line += f" baseline {row['baseline']:>12.3f}  {abs(row['change']) * 100:5.1f}% {verdict}"
+            if row["regressed"]:
+                line += "  REGRESSION"
+        out.append(line.rstrip())
+    return "\n".join(out)
+
+def _write(path: str, payload: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run the benchmark suite")
+    p.add_argument("--only", default=None,
+                   help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    p.add_argument("--quick", action="store_true", help="Smaller sizes and fewer repeats")
+    p.add_argument("--out", default="benchmarks/results/latest.json", help="Where to write this run's JSON")
+    p.add_argument("--baseline", default=None, help="JSON from an earlier run to compare against")
+    p.add_argument("--threshold", type=float, default=0.20,
+                   help="Relative slowdown that counts as a regression (default 0.20)")
+    p.add_argument("--save-baseline", default=None, help="Also write this run as the new baseline")
+    return p.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = [n.strip() for n in args.only.split(",")] if args.only else None
+    unknown = [n for n in names or [] if n not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    current = run(names, quick=args.quick)
+    _write(args.out, current)
+    if args.save_baseline:
+        _write(args.save_baseline, current)
+    rows = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(current, json.load(f), args.threshold)
+    print(format_report(current, rows))
+    regressions = [r["name"] for r in rows or [] if r["regressed"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,9 +8,10 @@ class ValuePolicyNet(nn.Module):
     Inputs: (B, C, 8, 8)
     Outputs:
       - value: (B, 1) in [-1, 1]
-      - policy_logits: (B, 64) naive square-based logits (used as a soft hint)
+      - policy_logits: (B, policy_size) move logits, 64 from-squares x 73
+        move planes (see src/learning/move_encoding.py)
     """
-    def __init__(self, in_channels: int = 18):
+    def __init__(self, in_channels: int = 18, policy_size: int = 64 * 73):
         super().__init__()
         self.conv1 = nn.Conv2d(in_channels, 32, 3, padding=1)
         self.conv2 = nn.Conv2d(32, 64, 3, padding=1)
@@ -29,7 +30,7 @@ class ValuePolicyNet(nn.Module):
             nn.Flatten(),
             nn.Linear(64*8*8, 128),
             nn.ReLU(),
-            nn.Linear(128, 64)  # naive policy over to-squares
+            nn.Linear(128, policy_size)
         )
 
     def forward(self, x):
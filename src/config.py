@@ -1,23 +1,46 @@
 import os
 import argparse
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict
 
 @dataclass
 class EngineConfig:
     engine_path: str
     depth: int
     multipv: int
+    eval_cache: str | None = "data/cache/evals.lmdb"
+    # per-purpose latency targets in seconds (see EngineSelector)
+    budgets: Dict[str, float] = field(default_factory=lambda: {"hint": 0.05})
+    threads: int = 2
+    hash_mb: int | None = None          # None keeps the engine's default
+    adaptive: bool = True               # stop early once the best move is settled
 
 @dataclass
 class TrainerConfig:
     side: str
     mode: str
     eco_pgn: str | None
+    ponder: bool = True
+    repertoire: str = "data/repertoire/my_repertoire.pgn"
+    drill_stats: str = "data/cache/drill_stats.npy"
+    sessions_dir: str = "data/sessions"  # where finished games are saved
+    explorer_db: str | None = "data/cache/explorer"
+    profile: bool = False               # print the latency report at the end
+    profile_json: str | None = None
+    trace: str | None = None            # Chrome trace output
 
 def load_env_default(key: str, fallback):
     val = os.environ.get(key)
     return val if val is not None else fallback
 
+def parse_budgets(items) -> Dict[str, float]:
+    """['hint=50', 'eval=200'] (milliseconds) -> {'hint': 0.05, 'eval': 0.2}"""
+    budgets = {"hint": 0.05}
+    for item in items or []:
+        name, _, ms = item.partition("=")
+        budgets[name.strip()] = float(ms) / 1000.0
+    return budgets
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Chess Openings Trainer")
     parser.add_argument(
@@ -35,6 +58,30 @@ def parse_args():
         default=int(load_env_default("ENGINE_MULTIPV", 3)),
         help="Number of best move candidates to show"
     )
+    parser.add_argument(
+        "--eval-cache", type=str,
+        default=load_env_default("EVAL_CACHE", "data/cache/evals.lmdb"),
+        help="On-disk engine evaluation cache ('none' to disable)"
+    )
+    parser.add_argument(
+        "--threads", type=int,
+        default=int(load_env_default("ENGINE_THREADS", 2)),
+        help="Engine search threads"
+    )
+    parser.add_argument(
+        "--hash", type=int,
+        default=int(load_env_default("ENGINE_HASH", "") or 0) or None,
+        help="Engine hash table size in MB (default: the engine's own)"
+    )
+    parser.add_argument(
+        "--adaptive", action=argparse.BooleanOptionalAction, default=True,
+        help="End searches early when the best move is clear, go deeper when it is close"
+    )
+    parser.add_argument(
+        "--budget", action="append", metavar="PURPOSE=MS",
+        default=[b for b in load_env_default("ENGINE_BUDGETS", "").split(",") if b],
+        help="Latency target per request type, e.g. --budget hint=50 (repeatable)"
+    )
     parser.add_argument(
         "--side", type=str, choices=["white", "black"], default="white",
         help="Which side the human plays"
@@ -43,6 +90,42 @@ def parse_args():
         "--mode", type=str, choices=["drill", "blind", "free"], default="drill",
         help="Training mode"
     )
+    parser.add_argument(
+        "--repertoire", type=str,
+        default=load_env_default("REPERTOIRE_PGN", "data/repertoire/my_repertoire.pgn"),
+        help="Repertoire PGN (variations included) for drill/blind mode"
+    )
+    parser.add_argument(
+        "--drill-stats", type=str,
+        default=load_env_default("DRILL_STATS", "data/cache/drill_stats.npy"),
+        help="Where drill progress is kept"
+    )
+    parser.add_argument(
+        "--sessions-dir", type=str,
+        default=load_env_default("SESSIONS_DIR", "data/sessions"),
+        help="Directory for the PGNs of finished sessions"
+    )
+    parser.add_argument(
+        "--explorer-db", type=str,
+        default=load_env_default("EXPLORER_DB", "data/cache/explorer"),
+        help="Move statistics database built with src.openings.stats_db ('none' to disable)"
+    )
+    parser.add_argument(
+        "--ponder", action=argparse.BooleanOptionalAction, default=True,
+        help="Pre-analyse likely replies in the background while you think"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Print per-span latency percentiles at the end of the session"
+    )
+    parser.add_argument(
+        "--profile-json", type=str, default=None,
+        help="Write the latency summary as JSON"
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None,
+        help="Record every span and write a Chrome trace (chrome://tracing, Perfetto)"
+    )
     parser.add_argument(
         "--eco-pgn", type=str, default=None,
         help="Optional ECO PGN to expand opening recognition"
@@ -53,13 +136,26 @@ def parse_args():
     engine_cfg = EngineConfig(
         engine_path=args.engine,
         depth=args.depth,
-        multipv=args.multipv
+        multipv=args.multipv,
+        eval_cache=None if args.eval_cache.lower() == "none" else args.eval_cache,
+        budgets=parse_budgets(args.budget),
+        threads=args.threads,
+        hash_mb=args.hash,
+        adaptive=args.adaptive
     )
 
     trainer_cfg = TrainerConfig(
         side=args.side,
         mode=args.mode,
-        eco_pgn=args.eco_pgn
+        eco_pgn=args.eco_pgn,
+        ponder=args.ponder,
+        repertoire=args.repertoire,
+        drill_stats=args.drill_stats,
+        sessions_dir=args.sessions_dir,
+        explorer_db=None if args.explorer_db.lower() == "none" else args.explorer_db,
+        profile=args.profile,
+        profile_json=args.profile_json,
+        trace=args.trace
     )
 
     return engine_cfg, trainer_cfg
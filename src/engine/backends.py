@@ -0,0 +1,283 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence
+import asyncio
+import math
+import sys
+import time
+
+import chess
+import chess.engine
+
+from src.engine.engine_wrapper import AdaptiveDepth, EngineLine, EngineWrapper
+from src.engine.simple_ab import AlphaBetaSearcher
+
+if TYPE_CHECKING:
+    from src.engine.background import BackgroundAnalyser
+    from src.engine.eval_cache import EvalCache
+    from src.learning.inference_server import InferenceServer
+
+# failures that make the selector move on to the next backend; anything
+# else is a bug and propagates
+BACKEND_ERRORS = (chess.engine.EngineError, TimeoutError, asyncio.TimeoutError, OSError)
+
+class EngineBackend(ABC):
+    """
+    One source of EngineLines for a position.
+
+      max_depth  deepest search the backend can honour (0 = static guess)
+      timed      whether analyse() keeps to a `time` cap
+      latency_s  running average of its wall time per call, seeded with a guess
+
+    analyse() returns lines best first, or [] when it has nothing.
+    `root_moves` limits the lines to those first moves (UCI searchmoves).
+    """
+    name = "backend"
+    max_depth = 0
+    timed = False
+
+    def __init__(self, latency_s: float = 0.1):
+        self.latency_s = latency_s
+        self.available = True
+
+    def can_serve(self, board: chess.Board, depth: int) -> bool:
+        return depth <= self.max_depth
+
+    @abstractmethod
+    def analyse(self, board: chess.Board, multipv: int = 1, depth: Optional[int] = None,
+                time: Optional[float] = None, nodes: Optional[int] = None,
+                root_moves: Optional[List[chess.Move]] = None) -> List[EngineLine]:
+        """Lines best first, or [] when the backend has nothing."""
+
+    def start(self, board: chess.Board):
+        """Hint that `board` will be asked for soon."""
+
+    def observe(self, seconds: float):
+        self.latency_s = 0.8 * self.latency_s + 0.2 * seconds
+
+class UCIBackend(EngineBackend):
+    """An EngineWrapper, optionally read through a BackgroundAnalyser."""
+    name = "uci"
+    timed = True
+
+    def __init__(self, eng: EngineWrapper, bg: Optional["BackgroundAnalyser"] = None):
+        super().__init__(latency_s=0.5)
+        self.eng = eng
+        self.bg = bg
+
+    @property
+    def max_depth(self) -> int:
+        return self.eng.depth
+
+    def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+        if root_moves is not None:
+            if self.bg is not None:     # the worker thread owns the engine
+                return self.bg.restricted(board, root_moves, timeout=time)[:multipv]
+            return self.eng.analyse(board, time=time, depth=depth, nodes=nodes, root_moves=root_moves)[:multipv]
+        if self.bg is not None:
+            # a time cap returns the deepest partial result reached so far
+            lines = self.bg.lines(board, min_depth=depth, timeout=time)
+        else:
+            lines = self.eng.analyse(board, time=time, depth=depth, nodes=nodes)
+        return lines[:multipv]
+
+    def start(self, board):
+        if self.bg is not None:
+            self.bg.start(board)
+
+class SimpleABBackend(EngineBackend):
+    """The in-process alpha-beta searcher; `default_time` caps calls without a budget."""
+    name = "simple_ab"
+    timed = True
+
+    def __init__(self, searcher: Optional[AlphaBetaSearcher] = None, max_depth: int = 6,
+                 default_time: float = 1.0):
+        super().__init__(latency_s=default_time)
+        self.searcher = searcher or AlphaBetaSearcher()
+        self.max_depth = max_depth
+        self.default_time = default_time
+
+    def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+        return self.searcher.analyse(board, multipv=multipv, depth=depth,
+                                     time_limit=self.default_time if time is None else time, nodes=nodes,
+                                     root_moves=root_moves)
+
+class StoreBackend(EngineBackend):
+    """Precomputed analyses from an EvalCache, whichever engine produced them."""
+    name = "store"
+    max_depth = 99
+
+    def __init__(self, cache: "EvalCache"):
+        super().__init__(latency_s=0.0)
+        self.cache = cache
+
+    def _best(self, board: chess.Board):
+        best = None
+        for key in self.cache.engine_keys():
+            hit = self.cache.peek(key, board)
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        return best
+
+    def can_serve(self, board, depth):
+        hit = self._best(board)
+        return hit is not None and hit[0] >= depth
+
+    def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+        hit = self._best(board)
+        if hit is None or (depth is not None and hit[0] < depth):
+            return []
+        lines = hit[1] if root_moves is None else [ln for ln in hit[1] if ln.move in root_moves]
+        return lines[:multipv]
+
+class NeuralBackend(EngineBackend):
+    """
+    One-ply lookahead with the value/policy net: the policy picks candidate
+    moves, one batched call scores the positions after them.
+    """
+    name = "neural"
+    max_depth = 0
+
+    def __init__(self, server: "InferenceServer", candidates: int = 8):
+        super().__init__(latency_s=0.005)
+        self.server = server
+        self.candidates = candidates
+
+    @staticmethod
+    def _cp(value: float) -> float:
+        # inverse of targets_from_engine's tanh(cp / 800)
+        return 800.0 * math.atanh(max(-0.999, min(0.999, value)))
+
+    def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+        ranked = self.server.predict(board).moves(board)
+        if root_moves is not None:
+            ranked = [(m, p) for m, p in ranked if m in root_moves]
+        ranked = ranked[:max(multipv, self.candidates)]
+        if not ranked:
+            return []
+        children = []
+        for move, _ in ranked:
+            child = board.copy(stack=False)
+            child.push(move)
+            children.append(child)
+        preds = self.server.predict_many(children)
+        root = board.copy(stack=False)
+        lines = []
+        for (move, _), child, pred in zip(ranked, children, preds):
+            if child.is_checkmate():
+                lines.append(EngineLine(move=move, cp=None, mate=1, pv=[move], root=root))
+            else:
+                lines.append(EngineLine(move=move, cp=round(-self._cp(pred.value)), mate=None, pv=[move], root=root))
+        lines.sort(key=lambda ln: (ln.mate is not None, ln.cp if ln.cp is not None else 0), reverse=True)
+        return lines[:multipv]
+
+class EngineSelector:
+    """
+    Picks a backend per request.
+
+    A backend qualifies when it can reach `depth` and either keeps to a time
+    cap or usually answers within the budget; qualifying backends are tried
+    cheapest first (ties keep the configured order). If none of them
+    produces lines, every remaining backend is tried in the configured order
+    without the depth requirement, so a missing engine degrades quality
+    instead of failing. `budgets` maps a purpose ("hint", ...) to seconds.
+
+    depth=None asks for `default_depth`, the full configured strength.
+    """
+    def __init__(self, backends: Sequence[EngineBackend], default_depth: int = 16,
+                 budgets: Optional[Dict[str, float]] = None):
+        self.backends = list(backends)
+        self.default_depth = default_depth
+        self.budgets = dict(budgets or {})
+        self.last_backend: Optional[str] = None
+
+    @property
+    def background(self) -> Optional["BackgroundAnalyser"]:
+        """The BackgroundAnalyser of the first working UCI engine, if any."""
+        for be in self.backends:
+            if be.available and getattr(be, "bg", None) is not None:
+                return be.bg
+        return None
+
+    def start(self, board: chess.Board):
+        for be in self.backends:
+            if be.available:
+                be.start(board)
+
+    def _qualified(self, board: chess.Board, depth: int, budget: Optional[float]) -> List[EngineBackend]:
+        out = []
+        for be in self.backends:
+            if not be.available or not be.can_serve(board, depth):
+                continue
+            if budget is not None and not be.timed and be.latency_s > budget:
+                continue
+            out.append(be)
+        cost = lambda be: budget if (be.timed and budget is not None) else be.latency_s
+        return sorted(out, key=cost)
+
+    def analyse(self, board: chess.Board, multipv: int = 1, depth: Optional[int] = None,
+                purpose: Optional[str] = None, budget: Optional[float] = None,
+                nodes: Optional[int] = None, root_moves: Optional[List[chess.Move]] = None) -> List[EngineLine]:
+        if budget is None and purpose is not None:
+            budget = self.budgets.get(purpose)
+        want = self.default_depth if depth is None else depth
+        deadline = None if budget is None else time.perf_counter() + budget
+        tried = set()
+        strict = self._qualified(board, want, budget)
+        relaxed = [be for be in self.backends if be.available and be not in strict]
+        for be, d in [(be, depth) for be in strict] + [(be, None) for be in relaxed]:
+            if id(be) in tried or not be.available:
+                continue
+            tried.add(id(be))
+            t0 = time.perf_counter()
+            left = None
+            if deadline is not None:
+                left = deadline - t0        # fallbacks only get what the failed attempts left over
+                if left <= 0:
+                    break
+            try:
+                lines = be.analyse(board, multipv=multipv, depth=d, time=left, nodes=nodes,
+                                   root_moves=root_moves)
+            except chess.engine.EngineTerminatedError as exc:
+                print(f"Backend {be.name!r} terminated ({exc}); disabled.", file=sys.stderr)
+                be.available = False
+                continue
+            except BACKEND_ERRORS as exc:
+                print(f"Backend {be.name!r} failed ({type(exc).__name__}: {exc}); trying the next one.",
+                      file=sys.stderr)
+                continue
+            be.observe(time.perf_counter() - t0)
+            if lines:
+                self.last_backend = be.name
+                return lines
+        self.last_backend = None
+        return []
+
+@contextmanager
+def open_engine(engine_path, depth: int = 16, multipv: int = 3,
+                cache: Optional["EvalCache"] = None, server: Optional["InferenceServer"] = None,
+                budgets: Optional[Dict[str, float]] = None, ponder: bool = False,
+                background: bool = True, threads: int = 2, hash_mb: Optional[int] = None,
+                adaptive: Optional[AdaptiveDepth] = None) -> Iterator[EngineSelector]:
+    """
+    EngineSelector over store -> UCI -> simple_ab -> neural. A UCI engine
+    that cannot be started is reported on stderr and left out.
+    """
+    from src.engine.background import BackgroundAnalyser
+    with ExitStack() as stack:
+        backends: List[EngineBackend] = []
+        if cache is not None:
+            backends.append(StoreBackend(cache))
+        try:
+            eng = stack.enter_context(EngineWrapper(engine_path, depth, multipv, cache=cache,
+                                                    threads=threads, hash_mb=hash_mb, adaptive=adaptive))
+        except (OSError, chess.engine.EngineError) as exc:
+            print(f"Engine {engine_path!r} unavailable ({exc}); using the built-in search.", file=sys.stderr)
+        else:
+            bg = stack.enter_context(BackgroundAnalyser(eng, ponder=ponder)) if background else None
+            backends.append(UCIBackend(eng, bg))
+        backends.append(SimpleABBackend())
+        if server is not None:
+            backends.append(NeuralBackend(server))
+        yield EngineSelector(backends, default_depth=depth, budgets=budgets)
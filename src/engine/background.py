@@ -0,0 +1,255 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+import chess
+import chess.engine
+
+from src.engine.engine_wrapper import EngineLine, EngineWrapper
+from src.utils.logging_utils import profiled
+
+class BackgroundAnalyser:
+    """
+    Runs the engine on a worker thread so the trainer never waits for a search
+    it does not need yet.
+
+    start(board) makes `board` the current position: a search of any other
+    position is stopped and the worker analyses `board` to the wrapper's depth.
+    With ponder=True it then moves on to the positions after each candidate
+    move, so the analysis needed once the user has replied is usually ready.
+    lines(board) returns the finished result or blocks until it is; with
+    min_depth it settles for the deepest partial result at least that deep.
+
+    All engine and cache access happens on the worker thread or under the lock.
+    """
+    def __init__(self, eng: EngineWrapper, ponder: bool = True, keep: int = 256):
+        self.eng = eng
+        self.ponder = ponder
+        self.keep = keep
+        self._cond = threading.Condition()
+        # (position, generation, root moves); root moves set = one restricted search
+        self._queue: List[Tuple[chess.Board, int, Optional[List[chess.Move]]]] = []
+        self._gen = 0                                            # bumped by start()
+        self._running: Optional[str] = None                      # EPD being searched
+        self._search: Optional[chess.engine.SimpleAnalysisResult] = None
+        self._cancelled = False
+        self._partial: Dict[str, Tuple[int, List[EngineLine]]] = {}
+        self._done: "OrderedDict[str, List[EngineLine]]" = OrderedDict()
+        self._restricted: Dict[Tuple[str, Tuple[str, ...]], List[EngineLine]] = {}
+        self._wanted: Dict[Tuple[str, Tuple[str, ...]], int] = {}    # restricted() callers waiting per key
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="background-analysis", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._stop_running_locked()
+            self._cond.notify_all()
+        self._thread.join()
+
+    def start(self, board: chess.Board):
+        """Make `board` the current position and begin analysing it."""
+        epd = board.epd()
+        with self._cond:
+            self._gen += 1
+            # restricted searches someone is waiting for stay queued
+            self._queue = [q for q in self._queue if q[2] is not None]
+            self._queue.append((board.copy(stack=False), self._gen, None))
+            if self._running is not None and self._running != epd:
+                self._stop_running_locked()
+            self._cond.notify_all()
+
+    @profiled("background.wait")
+    def lines(self, board: chess.Board, min_depth: Optional[int] = None,
+              timeout: Optional[float] = None) -> List[EngineLine]:
+        """
+        Analysis of `board` at the wrapper's depth, or the deepest partial
+        result reaching `min_depth`. Positions nobody asked for yet jump the
+        queue. On timeout, returns whatever partial lines exist.
+        """
+        epd = board.epd()
+        target = self.eng.depth if min_depth is None else min_depth
+        with self._cond:
+            while True:
+                if self._error is not None:
+                    raise self._error
+                res = self._finished_locked(board, epd)
+                if res is not None:
+                    return res
+                part = self._partial.get(epd)
+                if part is not None and part[0] >= target:
+                    return part[1]
+                queued_next = any(b.epd() == epd and r is None for b, _, r in self._queue[:1])
+                if self._running != epd and not queued_next:
+                    self._queue.insert(0, (board.copy(stack=False), -1, None))
+                    self._stop_running_locked()
+                    self._cond.notify_all()
+                if not self._cond.wait(timeout):
+                    return part[1] if part else []
+
+    def updates(self, board: chess.Board, poll: float = 0.1) -> Iterator[Tuple[int, List[EngineLine], bool]]:
+        """
+        Follow the analysis of `board` after start(board): yields
+        (depth, lines, False) each time a deeper iteration completes, then
+        (depth, lines, True) once the result is final. Ends early, without a
+        final item, when another position is started or the search is dropped.
+        """
+        epd = board.epd()
+        with self._cond:
+            gen = self._gen
+        last = 0
+        while True:
+            with self._cond:
+                if self._error is not None:
+                    raise self._error
+                done = self._finished_locked(board, epd)
+                part = self._partial.get(epd)
+                pending = self._running == epd or any(b.epd() == epd for b, _, _ in self._queue)
+                if done is None and (part is None or part[0] <= last):
+                    if self._gen != gen or not pending:
+                        return
+                    self._cond.wait(poll)
+                    continue
+            if done is not None:
+                yield last, done, True
+                return
+            last = part[0]
+            yield part[0], part[1], False
+
+    def restricted(self, board: chess.Board, root_moves: List[chess.Move],
+                   timeout: Optional[float] = None) -> List[EngineLine]:
+        """
+        A search of `board` limited to `root_moves`, run ahead of everything
+        queued (the running search is stopped). Not cached; [] on timeout.
+        """
+        key = (board.epd(), tuple(sorted(m.uci() for m in root_moves)))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        item = (board.copy(stack=False), -1, list(root_moves))
+        with self._cond:
+            self._queue.insert(0, item)
+            self._wanted[key] = self._wanted.get(key, 0) + 1
+            self._stop_running_locked()
+            self._cond.notify_all()
+            try:
+                while key not in self._restricted:
+                    if self._error is not None:
+                        raise self._error
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._queue = [q for q in self._queue if q is not item]
+                        return []
+                    self._cond.wait(remaining)
+                return self._restricted.pop(key)
+            finally:
+                self._wanted[key] -= 1
+                if not self._wanted[key]:
+                    del self._wanted[key]
+
+    def _finished_locked(self, board: chess.Board, epd: str) -> Optional[List[EngineLine]]:
+        res = self._done.get(epd)
+        if res is None:
+            res = self.eng.cached(board)
+        return res
+
+    def _stop_running_locked(self):
+        if self._search is not None:
+            self._cancelled = True
+            self._search.stop()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                board, gen, root_moves = self._queue.pop(0)
+                epd = board.epd()
+                lines = self._finished_locked(board, epd) if root_moves is None else None
+                if lines is None and root_moves is None:
+                    try:
+                        self._search = self.eng.analysis(board)
+                    except Exception as exc:
+                        self._error = exc
+                        self._cond.notify_all()
+                        return
+                    self._running = epd
+                    self._cancelled = False
+            if root_moves is not None:
+                self._search_restricted(board, root_moves)
+                continue
+            if lines is None:
+                lines = self._search_position(board, epd)
+            if lines and self.ponder:
+                with self._cond:
+                    if gen == self._gen:     # still the current position: queue likely replies
+                        for ln in lines:
+                            nxt = board.copy(stack=False)
+                            nxt.push(ln.move)
+                            self._queue.append((nxt, 0, None))
+
+    def _search_restricted(self, board: chess.Board, root_moves: List[chess.Move]):
+        key = (board.epd(), tuple(sorted(m.uci() for m in root_moves)))
+        try:
+            lines = self.eng.analyse(board, root_moves=root_moves)
+        except Exception as exc:
+            with self._cond:
+                self._error = exc
+                self._cond.notify_all()
+            return
+        with self._cond:
+            if key in self._wanted:     # nobody waits for results of timed-out requests
+                self._restricted[key] = lines
+            self._cond.notify_all()
+
+    @profiled("background.search")
+    def _search_position(self, board: chess.Board, epd: str) -> Optional[List[EngineLine]]:
+        n_lines = min(self.eng.multipv, board.legal_moves.count())
+        adaptive = self.eng.adaptive
+        depth = 0
+        lines: List[EngineLine] = []
+        best: List[chess.Move] = []
+        settled = False
+        try:
+            with self._search as search:
+                for info in search:
+                    if "pv" not in info or info.get("multipv", 1) != n_lines:
+                        continue
+                    # last line of an iteration: every MultiPV slot is at this depth
+                    depth = info.get("depth", depth)
+                    lines = EngineWrapper.lines_from_infos(board, search.multipv)
+                    best.append(lines[0].move)
+                    with self._cond:
+                        self._partial[epd] = (depth, lines)
+                        self._cond.notify_all()
+                    if adaptive is not None and adaptive.decided(depth, self.eng.depth, lines, best):
+                        settled = True
+                        break
+        except Exception as exc:
+            with self._cond:
+                self._error = exc
+                self._running = self._search = None
+                self._cond.notify_all()
+            return None
+        with self._cond:
+            complete = settled or depth >= self.eng.depth or not self._cancelled
+            self._running = self._search = None
+            self._partial.pop(epd, None)
+            if complete:
+                self._done[epd] = lines
+                while len(self._done) > self.keep:
+                    self._done.popitem(last=False)
+                self.eng.store(board, lines, depth=depth, settled=settled)
+            self._cond.notify_all()
+        return lines if complete else None
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Deque, Iterable, Iterator, List, Optional, Set, Union
+import asyncio
+import contextlib
+import os
+import queue
+
+import chess
+import chess.engine
+
+from src.engine.engine_wrapper import EngineLine, EngineWrapper
+
+if TYPE_CHECKING:
+    from src.engine.eval_cache import EvalCache
+
+@dataclass
+class PoolResult:
+    index: int                      # position of the board in the input iterable
+    fen: str
+    lines: List[EngineLine] = field(default_factory=list)
+    error: Optional[str] = None     # set when the position failed after retries
+
+class EnginePool:
+    """
+    N independent UCI processes for bulk analysis.
+
+    Threads and Hash are split across processes from the machine's core count
+    and a total hash budget, so N processes together use the whole box the
+    way one big engine would. Results stream back as they finish, with at
+    most `max_pending` positions in flight (back-pressure on the input).
+    A crashed engine, or one that takes longer than `task_timeout` seconds
+    on a position, is restarted and its position retried; the timeout does
+    not limit the search itself, which always runs to `depth`.
+
+        with EnginePool("stockfish", depth=14) as pool:
+            for res in pool.imap(fens, ordered=False):
+                ...
+    """
+    def __init__(self, engine_path: Union[str, List[str]], size: Optional[int] = None,
+                 depth: int = 16, multipv: int = 3, hash_total_mb: int = 256,
+                 cache: Optional["EvalCache"] = None,
+                 task_timeout: Optional[float] = None, retries: int = 1,
+                 max_pending: Optional[int] = None):
+        cores = os.cpu_count() or 1
+        self.size = max(1, size or cores)
+        self.threads = max(1, cores // self.size)
+        self.hash_mb = max(16, hash_total_mb // self.size)
+        self.engine_path = engine_path
+        self.depth = depth
+        self.multipv = multipv
+        self.cache = cache
+        self.task_timeout = task_timeout
+        self.retries = retries
+        self.max_pending = max_pending or 2 * self.size
+        self._idle: "queue.Queue[EngineWrapper]" = queue.Queue()
+        self._engines: List[EngineWrapper] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._calls: Optional[ThreadPoolExecutor] = None      # engine calls awaited with a deadline
+
+    def __enter__(self):
+        for _ in range(self.size):
+            eng = EngineWrapper(self.engine_path, self.depth, self.multipv, cache=self.cache,
+                                threads=self.threads, hash_mb=self.hash_mb)
+            self._engines.append(eng.__enter__())
+            self._idle.put(eng)
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="engine-pool")
+        if self.task_timeout is not None:
+            self._calls = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="engine-call")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._calls is not None:
+            self._calls.shutdown(wait=True, cancel_futures=True)
+            self._calls = None
+        for eng in self._engines:
+            eng.__exit__(None, None, None)
+        self._engines.clear()
+
+    @property
+    def engine_key(self) -> str:
+        """Cache key of the pooled engine (all processes run the same binary)."""
+        return self._engines[0].engine_key
+
+    def _restart(self, eng: EngineWrapper, hung: bool = False):
+        if hung:
+            eng.kill()
+        with contextlib.suppress(Exception):
+            eng.__exit__(None, None, None)
+        eng.__enter__()
+
+    def _analyse(self, eng: EngineWrapper, board: chess.Board) -> List[EngineLine]:
+        if self._calls is None:
+            return eng.analyse(board)
+        # SimpleEngine has no response timeout for depth-limited searches
+        return self._calls.submit(eng.analyse, board).result(timeout=self.task_timeout)
+
+    def _run(self, index: int, board: chess.Board) -> PoolResult:
+        eng = self._idle.get()
+        try:
+            error = None
+            for _ in range(self.retries + 1):
+                try:
+                    lines = self._analyse(eng, board)
+                    return PoolResult(index=index, fen=board.fen(), lines=lines)
+                except (FutureTimeoutError, TimeoutError, asyncio.TimeoutError) as exc:
+                    error = f"{type(exc).__name__}: no answer within {self.task_timeout}s"
+                    self._restart(eng, hung=True)
+                except chess.engine.EngineError as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                    self._restart(eng)
+            return PoolResult(index=index, fen=board.fen(), error=error)
+        finally:
+            self._idle.put(eng)
+
+    def imap(self, boards: Iterable[Union[chess.Board, str]], ordered: bool = True) -> Iterator[PoolResult]:
+        """
+        Analyse every board (or FEN), yielding PoolResults. ordered=False yields
+        in completion order, which keeps every engine busy on uneven inputs.
+        """
+        assert self._executor is not None, "Pool not started. Use 'with EnginePool(...):'"
+        source = iter(enumerate(boards))
+        fifo: Deque[Future] = deque()
+        pending: Set[Future] = set()
+
+        def submit_next() -> bool:
+            try:
+                i, b = next(source)
+            except StopIteration:
+                return False
+            board = chess.Board(b) if isinstance(b, str) else b.copy(stack=False)
+            fut = self._executor.submit(self._run, i, board)
+            fifo.append(fut)
+            pending.add(fut)
+            return True
+
+        while len(pending) < self.max_pending and submit_next():
+            pass
+        while pending:
+            if ordered:
+                fut = fifo.popleft()
+                res = fut.result()
+                pending.discard(fut)
+                yield res
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pending.discard(fut)
+                    fifo.remove(fut)
+                    yield fut.result()
+            while len(pending) < self.max_pending and submit_next():
+                pass
+
+    def analyse_many(self, boards: Iterable[Union[chess.Board, str]]) -> List[PoolResult]:
+        return list(self.imap(boards, ordered=True))
@@ -1,35 +1,152 @@
 import contextlib
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import chess
 import chess.engine
 
-@dataclass
+from src.utils.logging_utils import profiled, span
+
+if TYPE_CHECKING:
+    from src.engine.eval_cache import EvalCache
+
+PV_SAN_PLIES = 12              # longest PV rendered in SAN
+
+def pv_to_san(board: chess.Board, pv: List[chess.Move], limit: int = PV_SAN_PLIES) -> str:
+    """SAN of `pv` from `board`, cut at the first illegal move (one legality check per ply)."""
+    tmp = board.copy(stack=False)
+    sans = []
+    for m in pv[:limit]:
+        if not tmp.is_legal(m):
+            break
+        sans.append(tmp.san_and_push(m))
+    return " ".join(sans)
+
+@dataclass(init=False)
 class EngineLine:
+    """
+    One analysed line. `pv_san` may be given directly (e.g. from a cache) or
+    left to be rendered from `pv` and `root` on first access, then memoized;
+    most lines are only ever looked at for their move and score.
+
+    Lines are shared between threads (BackgroundAnalyser hands out partial
+    results it later stores), so `root` is never modified after
+    construction; rendering twice in a race only computes the same string.
+    """
     move: chess.Move
     cp: Optional[float]           # centipawns from side-to-move perspective
     mate: Optional[int]           # mate in N (positive = mate for side-to-move)
-    pv_san: str                   # principal variation in SAN
+    pv: List[chess.Move] = field(default_factory=list)    # raw principal variation
+    root: Optional[chess.Board] = field(default=None, repr=False, compare=False)
+    _pv_san: Optional[str] = field(default=None, repr=False, compare=False)
+
+    def __init__(self, move: chess.Move, cp: Optional[float], mate: Optional[int],
+                 pv_san: Optional[str] = None, pv: Optional[List[chess.Move]] = None,
+                 root: Optional[chess.Board] = None):
+        self.move = move
+        self.cp = cp
+        self.mate = mate
+        self.pv = list(pv) if pv is not None else []
+        self.root = root
+        self._pv_san = pv_san
+
+    @property
+    def pv_san(self) -> str:
+        """Principal variation in SAN, rendered on first access."""
+        text = self._pv_san
+        if text is None:
+            root = self.root
+            with span("engine.pv_san"):
+                text = pv_to_san(root, self.pv) if root is not None else ""
+            self._pv_san = text
+        return text
+
+    @property
+    def san(self) -> str:
+        """SAN of `move` alone."""
+        text, root = self._pv_san, self.root
+        if text is None and root is not None:
+            return root.san(self.move) if root.is_legal(self.move) else ""
+        return self.pv_san.partition(" ")[0]
+
+def _line_cp(ln: EngineLine) -> float:
+    """A line's score as one number, mates beyond any centipawn value."""
+    if ln.mate is not None:
+        return 100000 - ln.mate if ln.mate > 0 else -100000 - ln.mate
+    return ln.cp if ln.cp is not None else 0.0
+
+@dataclass
+class AdaptiveDepth:
+    """
+    Early-stop rule for a streaming search, checked after every completed
+    iteration. Past `min_depth`, the search stops once the best move has
+    been the same for `stable_iters` iterations and leads the second line by
+    `gap_cp`. At the configured depth it stops unless the top two lines are
+    within `close_cp`, in which case it may go `extend` plies deeper.
+    """
+    min_depth: int = 8
+    stable_iters: int = 3
+    gap_cp: float = 50.0
+    close_cp: float = 15.0
+    extend: int = 4
+
+    def max_depth(self, depth: int) -> int:
+        return depth + self.extend
+
+    def decided(self, depth: int, base_depth: int, lines: List[EngineLine], best: List[chess.Move]) -> bool:
+        if not lines or depth < min(self.min_depth, base_depth):
+            return False
+        gap = _line_cp(lines[0]) - _line_cp(lines[1]) if len(lines) > 1 else float("inf")
+        recent = best[-self.stable_iters:]
+        if len(recent) == self.stable_iters and all(m == recent[-1] for m in recent) and gap >= self.gap_cp:
+            return True
+        if depth >= self.max_depth(base_depth):
+            return True
+        return depth >= base_depth and gap >= self.close_cp
 
 class EngineWrapper:
     """
     Thin wrapper around a UCI engine (e.g., Stockfish) to fetch MultiPV
     candidate lines with evaluations and SAN-converted PVs.
+    An optional EvalCache is consulted before the engine is asked.
+    With `adaptive`, searches stream and stop as soon as the AdaptiveDepth
+    rule is satisfied, so easy positions cost a fraction of `depth`.
     """
-    def __init__(self, engine_path: str, depth: int = 16, multipv: int = 3):
+    def __init__(self, engine_path: str, depth: int = 16, multipv: int = 3,
+                 cache: Optional["EvalCache"] = None,
+                 threads: int = 2, hash_mb: Optional[int] = None,
+                 adaptive: Optional[AdaptiveDepth] = None):
         self.engine_path = engine_path
         self.depth = depth
         self.multipv = max(1, multipv)
+        self.cache = cache
+        self.threads = threads
+        self.hash_mb = hash_mb
+        self.adaptive = adaptive
+        self.last_depth = 0             # depth reached by the last search
         self._proc: Optional[chess.engine.SimpleEngine] = None
 
+    @property
+    def engine_key(self) -> str:
+        """
+        Identifies the engine for cache keys. Threads/Hash only change speed,
+        not what a depth-N result means, so they are deliberately left out.
+        """
+        name = self._proc.id.get("name") if self._proc is not None else None
+        return name or str(self.engine_path)
+
     def __enter__(self):
         self._proc = chess.engine.SimpleEngine.popen_uci(self.engine_path)
-        try:
-            # set a few safe defaults; ignore if unsupported
-            self._proc.configure({"Threads": 2})
-        except Exception:
-            pass
+        options = {"Threads": self.threads}
+        if self.hash_mb:
+            options["Hash"] = self.hash_mb
+        for name, value in options.items():
+            try:
+                # set a few safe defaults; ignore if unsupported
+                self._proc.configure({name: value})
+            except Exception:
+                pass
         return self
 
     def __exit__(self, exc_type, exc, tb):
@@ -38,20 +155,125 @@ class EngineWrapper:
                 self._proc.quit()
         self._proc = None
 
-    def analyse(self, board: chess.Board) -> List[EngineLine]:
+    def kill(self):
+        """Drop the engine process without waiting for it to answer (it may be hung)."""
+        if self._proc:
+            with contextlib.suppress(Exception):
+                self._proc.close()
+        self._proc = None
+
+    @profiled("engine.analyse")
+    def analyse(self, board: chess.Board, time: Optional[float] = None, depth: Optional[int] = None,
+                nodes: Optional[int] = None, budget: Optional[float] = None,
+                root_moves: Optional[List[chess.Move]] = None) -> List[EngineLine]:
         """
         Returns a list of EngineLine for the top multipv moves.
         If engine returns fewer lines, we return what we have.
+        The search ends at whichever limit comes first: `depth` (default: the
+        wrapper's), `time` and `nodes` as sent to the engine, or `budget`
+        seconds of wall time including our own overhead, which returns the
+        last completed iteration. Only the depth reached is cached.
+        `root_moves` searches just those moves (UCI searchmoves); such
+        restricted results bypass the cache.
         """
         assert self._proc is not None, "Engine not started. Use 'with EngineWrapper(...):'"
-        limit = chess.engine.Limit(depth=self.depth)
-        info_list = self._proc.analyse(board, limit=limit, multipv=self.multipv)
+        target = depth or self.depth
+        if root_moves is not None:
+            limit = chess.engine.Limit(depth=target, time=time if budget is None else budget, nodes=nodes)
+            with span("engine.search"):
+                info_list = self._proc.analyse(board, limit=limit, multipv=min(self.multipv, len(root_moves)),
+                                               root_moves=root_moves)
+            return self.lines_from_infos(board, info_list)
+        hit = self.cached(board, depth)
+        if hit is not None:
+            return hit
+        if self.adaptive is None and budget is None:
+            limit = chess.engine.Limit(depth=target, time=time, nodes=nodes)
+            with span("engine.search"):
+                info_list = self._proc.analyse(board, limit=limit, multipv=self.multipv)
+            lines = self.lines_from_infos(board, info_list)
+            if isinstance(info_list, dict):
+                info_list = [info_list]
+            reached = min(min((info.get("depth", target) for info in info_list), default=target), target)
+            settled = False
+        else:
+            lines, reached, settled = self._analyse_streaming(board, target, time, nodes, budget)
+        self.last_depth = reached
+        self.store(board, lines, depth=reached, settled=settled)
+        return lines
+
+    @profiled("engine.search")
+    def _analyse_streaming(self, board: chess.Board, depth: int, time: Optional[float],
+                           nodes: Optional[int], budget: Optional[float]) -> Tuple[List[EngineLine], int, bool]:
+        """(lines, depth reached, whether the adaptive rule settled the search)."""
+        n_lines = min(self.multipv, board.legal_moves.count())
+        max_depth = self.adaptive.max_depth(depth) if self.adaptive else depth
+        cap = budget if time is None else time if budget is None else min(time, budget)
+        deadline = None if budget is None else perf_counter() + budget
+        lines: List[EngineLine] = []
+        best: List[chess.Move] = []
+        reached = 0
+        settled = False
+        limit = chess.engine.Limit(depth=max_depth, time=cap, nodes=nodes)
+        with self._proc.analysis(board, limit=limit, multipv=self.multipv) as search:
+            for info in search:
+                if "pv" not in info or info.get("multipv", 1) != n_lines:
+                    continue
+                # last line of an iteration: every MultiPV slot is at this depth
+                reached = info.get("depth", reached)
+                lines = self.lines_from_infos(board, search.multipv)
+                best.append(lines[0].move)
+                if self.adaptive is not None and self.adaptive.decided(reached, depth, lines, best):
+                    settled = True
+                    break
+                if deadline is not None and perf_counter() >= deadline:
+                    break
+            if not lines:
+                lines = self.lines_from_infos(board, search.multipv)
+        return lines, reached, settled
 
+    def analysis(self, board: chess.Board) -> chess.engine.SimpleAnalysisResult:
+        """
+        Start a streaming search with the wrapper's depth/MultiPV (plus the
+        adaptive extension, if any). The caller iterates the info updates and
+        may stop() it early (see BackgroundAnalyser).
+        """
+        assert self._proc is not None, "Engine not started. Use 'with EngineWrapper(...):'"
+        depth = self.adaptive.max_depth(self.depth) if self.adaptive else self.depth
+        return self._proc.analysis(board, limit=chess.engine.Limit(depth=depth), multipv=self.multipv)
+
+    @profiled("engine.cache")
+    def cached(self, board: chess.Board, depth: Optional[int] = None) -> Optional[List[EngineLine]]:
+        """
+        Stored lines at least `depth` deep. Without `depth`, the wrapper's
+        depth, or with adaptive depth an adaptive search that settled past
+        its minimum; budget- or time-capped partial results do not qualify.
+        """
+        if self.cache is None:
+            return None
+        if depth is not None:
+            return self.cache.get(self.engine_key, board, depth, self.multipv)
+        settled = min(self.adaptive.min_depth, self.depth) if self.adaptive else None
+        return self.cache.get(self.engine_key, board, self.depth, self.multipv, settled_depth=settled)
+
+    def store(self, board: chess.Board, lines: List[EngineLine], depth: Optional[int] = None,
+              settled: bool = False):
+        """Cache `lines` as searched to `depth` (default: the wrapper's); depth 0 means no
+        iteration completed, so nothing is stored."""
+        if self.cache is None or depth == 0:
+            return
+        self.cache.put(self.engine_key, board, self.depth if depth is None else depth, self.multipv, lines,
+                       settled=settled)
+
+    @staticmethod
+    @profiled("engine.lines")
+    def lines_from_infos(board: chess.Board, info_list) -> List[EngineLine]:
         # python-chess returns either a dict (single) or list of dicts (multi)
         if isinstance(info_list, dict):
             info_list = [info_list]
 
         lines: List[EngineLine] = []
+        root: Optional[chess.Board] = None
         for info in info_list:
             pv = info.get("pv", [])
             if not pv:
@@ -71,21 +293,18 @@ class EngineWrapper:
                     if cp is not None:
                         cp_val = float(cp)
 
-            # Build SAN PV string
-            tmp = board.copy(stack=False)
-            pv_sans = []
-            for m in pv[:12]:  # limit PV length
-                if m not in tmp.legal_moves:
-                    break
-                pv_sans.append(tmp.san(m))
-                tmp.push(m)
-            lines.append(EngineLine(move=top_move, cp=cp_val, mate=mate_val, pv_san=" ".join(pv_sans)))
+            # SAN is rendered from one shared snapshot of the root, on demand
+            if root is None:
+                root = board.copy(stack=False)
+            lines.append(EngineLine(move=top_move, cp=cp_val, mate=mate_val, pv=pv, root=root))
         # Sort best first by cp (higher better for side to move) and then by mate
         def key_fn(el: EngineLine):
             if el.mate is not None:
-                # Prefer faster mates for side to move (smaller positive number is better)
-                # We invert sign so that smaller positive mate is sorted first when descending.
-                return (float('inf'), -abs(el.mate))
+                # Faster mates for the side to move first; being mated sorts last,
+                # the slowest of those before the quickest
+                if el.mate > 0:
+                    return (float('inf'), -el.mate)
+                return (float('-inf'), -el.mate)
             return (el.cp if el.cp is not None else float('-inf'), 0)
         lines.sort(key=key_fn, reverse=True)
         return lines
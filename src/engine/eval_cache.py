@@ -0,0 +1,145 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+import json
+import os
+import threading
+
+import chess
+
+from src.engine.engine_wrapper import EngineLine
+
+# (depth, multipv, [(uci, cp, mate, pv_san), ...], settled)
+_Record = Tuple[int, int, List[tuple], bool]
+# engine keys seen by the store; "\x00" sorts before every real key
+_ENGINES_KEY = b"\x00engines"
+
+class EvalCache:
+    """
+    Two-tier cache of engine analyses: an in-memory LRU in front of an optional
+    LMDB store on disk. One entry per (engine key, EPD) keeps the best result
+    seen; it satisfies any request for the same or a shallower depth and the
+    same or fewer MultiPV lines. Safe to share between threads.
+    """
+    def __init__(self, path: Optional[str] = "data/cache/evals.lmdb",
+                 max_entries: int = 4096, map_size: int = 1 << 30):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, _Record]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._env = None
+        self._engines: Set[str] = set()
+        if path:
+            import lmdb
+            os.makedirs(path, exist_ok=True)
+            self._env = lmdb.open(path, map_size=map_size, subdir=True)
+            with self._env.begin() as txn:
+                raw = txn.get(_ENGINES_KEY)
+            if raw is not None:
+                self._engines.update(json.loads(raw))
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self._env is not None:
+            self._env.close()
+            self._env = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _key(engine_key: str, board: chess.Board) -> str:
+        # EPD drops the move clocks, so transpositions share an entry
+        return f"{engine_key}|{board.epd()}"
+
+    def _remember(self, key: str, rec: _Record):
+        self._mem[key] = rec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[_Record]:
+        rec = self._mem.get(key)
+        if rec is not None:
+            self._mem.move_to_end(key)
+            return rec
+        if self._env is None:
+            return None
+        with self._env.begin() as txn:
+            raw = txn.get(key.encode("utf-8"))
+        if raw is None:
+            return None
+        d, mpv, lines, *rest = json.loads(raw)
+        rec = (d, mpv, [tuple(l) for l in lines], bool(rest and rest[0]))
+        self._remember(key, rec)
+        return rec
+
+    def engine_keys(self) -> List[str]:
+        """Engines with at least one stored analysis."""
+        with self._lock:
+            return sorted(self._engines)
+
+    def peek(self, engine_key: str, board: chess.Board) -> Optional[Tuple[int, List[EngineLine]]]:
+        """Stored (depth, lines) for `board` whatever their depth, without touching hit counts."""
+        with self._lock:
+            rec = self._load(self._key(engine_key, board))
+        if rec is None:
+            return None
+        return rec[0], [EngineLine(move=chess.Move.from_uci(uci), cp=cp, mate=mate, pv_san=pv_san)
+                        for uci, cp, mate, pv_san in rec[2]]
+
+    def get(self, engine_key: str, board: chess.Board, depth: int, multipv: int,
+            settled_depth: Optional[int] = None) -> Optional[List[EngineLine]]:
+        """
+        Lines at least `depth` deep; with `settled_depth`, also an adaptive
+        search that settled at or beyond that depth.
+        """
+        with self._lock:
+            rec = self._load(self._key(engine_key, board))
+        deep_enough = rec is not None and (rec[0] >= depth or
+                                           (settled_depth is not None and rec[3] and rec[0] >= settled_depth))
+        if not deep_enough or rec[1] < multipv:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [EngineLine(move=chess.Move.from_uci(uci), cp=cp, mate=mate, pv_san=pv_san)
+                for uci, cp, mate, pv_san in rec[2][:multipv]]
+
+    def put(self, engine_key: str, board: chess.Board, depth: int, multipv: int, lines: List[EngineLine],
+            settled: bool = False):
+        """
+        Store lines searched to `depth`. `settled` marks an adaptive search
+        that stopped early because its result was decided, as opposed to one
+        cut short by a time or node budget.
+        """
+        if not lines:
+            return
+        key = self._key(engine_key, board)
+        rec = (depth, multipv, [(ln.move.uci(), ln.cp, ln.mate, ln.pv_san) for ln in lines], settled)
+        with self._lock:
+            old = self._load(key)
+            # keep the old entry only if it serves everything the new one does
+            if old is not None and old[0] >= depth and old[1] >= multipv and (old[3] or not settled):
+                return
+            self._remember(key, rec)
+            self._persist(key, rec)
+            if engine_key not in self._engines:
+                self._engines.add(engine_key)
+                self._persist_raw(_ENGINES_KEY, json.dumps(sorted(self._engines)).encode("utf-8"))
+
+    def _persist(self, key: str, rec: _Record):
+        self._persist_raw(key.encode("utf-8"), json.dumps(rec, separators=(",", ":")).encode("utf-8"))
+
+    def _persist_raw(self, key: bytes, raw: bytes):
+        if self._env is not None:
+            import lmdb
+            try:
+                with self._env.begin(write=True) as txn:
+                    txn.put(key, raw)
+            except lmdb.MapFullError:
+                self._env.set_mapsize(self._env.info()["map_size"] * 2)
+                with self._env.begin(write=True) as txn:
+                    txn.put(key, raw)
@@ -1,9 +1,15 @@
-from typing import Tuple, Optional
-import math
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import time
 import chess
+import chess.polyglot
 
-# Minimal alpha-beta fallback for when a UCI engine is not available.
-# It's intentionally simple (material + mobility) and not meant to replace Stockfish.
+from src.engine.engine_wrapper import EngineLine
+
+# Alpha-beta fallback for when a UCI engine is not available. Not meant to
+# replace Stockfish, but it answers within a time budget: iterative deepening,
+# a bounded transposition table, move ordering and quiescence search over an
+# incrementally updated material + piece-square evaluation.
 
 PIECE_VALUES = {
     chess.PAWN: 100,
@@ -14,44 +20,402 @@ PIECE_VALUES = {
     chess.KING: 0,
 }
 
+MATE = 100000
+MATE_BOUND = MATE - 1000        # scores beyond this are mate-in-N
+MAX_PLY = 64
+INF = MATE + 1
+
+# Piece-square bonuses from White's side, rank 8 first (as a board is drawn).
+_PST = {
+    chess.PAWN: [
+        0,  0,  0,  0,  0,  0,  0,  0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5,  5, 10, 25, 25, 10,  5,  5,
+        0,  0,  0, 20, 20,  0,  0,  0,
+        5, -5,-10,  0,  0,-10, -5,  5,
+        5, 10, 10,-20,-20, 10, 10,  5,
+        0,  0,  0,  0,  0,  0,  0,  0],
+    chess.KNIGHT: [
+        -50,-40,-30,-30,-30,-30,-40,-50,
+        -40,-20,  0,  0,  0,  0,-20,-40,
+        -30,  0, 10, 15, 15, 10,  0,-30,
+        -30,  5, 15, 20, 20, 15,  5,-30,
+        -30,  0, 15, 20, 20, 15,  0,-30,
+        -30,  5, 10, 15, 15, 10,  5,-30,
+        -40,-20,  0,  5,  5,  0,-20,-40,
+        -50,-40,-30,-30,-30,-30,-40,-50],
+    chess.BISHOP: [
+        -20,-10,-10,-10,-10,-10,-10,-20,
+        -10,  0,  0,  0,  0,  0,  0,-10,
+        -10,  0,  5, 10, 10,  5,  0,-10,
+        -10,  5,  5, 10, 10,  5,  5,-10,
+        -10,  0, 10, 10, 10, 10,  0,-10,
+        -10, 10, 10, 10, 10, 10, 10,-10,
+        -10,  5,  0,  0,  0,  0,  5,-10,
+        -20,-10,-10,-10,-10,-10,-10,-20],
+    chess.ROOK: [
+        0,  0,  0,  0,  0,  0,  0,  0,
+        5, 10, 10, 10, 10, 10, 10,  5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        -5,  0,  0,  0,  0,  0,  0, -5,
+        0,  0,  0,  5,  5,  0,  0,  0],
+    chess.QUEEN: [
+        -20,-10,-10, -5, -5,-10,-10,-20,
+        -10,  0,  0,  0,  0,  0,  0,-10,
+        -10,  0,  5,  5,  5,  5,  0,-10,
+        -5,  0,  5,  5,  5,  5,  0, -5,
+        0,  0,  5,  5,  5,  5,  0, -5,
+        -10,  5,  5,  5,  5,  5,  0,-10,
+        -10,  0,  5,  0,  0,  0,  0,-10,
+        -20,-10,-10, -5, -5,-10,-10,-20],
+    chess.KING: [
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -30,-40,-40,-50,-50,-40,-40,-30,
+        -20,-30,-30,-40,-40,-30,-30,-20,
+        -10,-20,-20,-20,-20,-20,-20,-10,
+        20, 20,  0,  0,  0,  0, 20, 20,
+        20, 30, 10,  0,  0, 10, 30, 20],
+}
+
+def _build_tables():
+    # _PSQ[color][piece_type][square]: material + placement, from that colour's side
+    # _ZPIECE[color][piece_type][square]: polyglot Zobrist key of the piece
+    psq = [[[0] * 64 for _ in range(7)] for _ in range(2)]
+    zpiece = [[[0] * 64 for _ in range(7)] for _ in range(2)]
+    for pt, table in _PST.items():
+        for sq in range(64):
+            r, f = chess.square_rank(sq), chess.square_file(sq)
+            psq[chess.WHITE][pt][sq] = PIECE_VALUES[pt] + table[(7 - r) * 8 + f]
+            psq[chess.BLACK][pt][sq] = PIECE_VALUES[pt] + table[r * 8 + f]
+            for color in chess.COLORS:
+                zpiece[color][pt][sq] = chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((pt - 1) * 2 + color) + sq]
+    return psq, zpiece
+
+_PSQ, _ZPIECE = _build_tables()
+_Z = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+_CASTLING_KEYS = ((chess.BB_H1, _Z[768]), (chess.BB_A1, _Z[769]), (chess.BB_H8, _Z[770]), (chess.BB_A8, _Z[771]))
+# MVV-LVA: most valuable victim first, then least valuable attacker
+_ORDER_VALUE = [0, 1, 3, 3, 5, 9, 10]
+
+def material(board: chess.Board) -> int:
+    """Material + piece-square score from White's side."""
+    score = 0
+    for color in chess.COLORS:
+        sign = 1 if color == chess.WHITE else -1
+        for pt in PIECE_VALUES:
+            for sq in chess.scan_forward(board.pieces_mask(pt, color)):
+                score += sign * _PSQ[color][pt][sq]
+    return score
+
 def evaluate(board: chess.Board) -> int:
+    """Static evaluation in centipawns from White's side."""
     if board.is_checkmate():
-        return -100000 if board.turn else 100000
+        return -MATE if board.turn else MATE
     if board.is_stalemate() or board.is_insufficient_material():
         return 0
-    score = 0
-    for pt, val in PIECE_VALUES.items():
-        score += len(board.pieces(pt, chess.WHITE)) * val
-        score -= len(board.pieces(pt, chess.BLACK)) * val
-    # light mobility term
-    moves = board.legal_moves.count()
-    score += moves if board.turn else -moves
-    return score
+    return material(board)
 
-def _search(board: chess.Board, depth: int, alpha: int, beta: int) -> int:
-    if depth == 0 or board.is_game_over():
-        return evaluate(board)
-    best = -math.inf
-    for move in board.legal_moves:
-        board.push(move)
-        val = -_search(board, depth - 1, -beta, -alpha)
-        board.pop()
-        if val > best:
-            best = val
-        if best > alpha:
-            alpha = best
-        if alpha >= beta:
-            break
-    return int(best)
-
-def best_move(board: chess.Board, depth: int = 3) -> Tuple[chess.Move, int]:
-    best_mv: Optional[chess.Move] = None
-    best_val = -math.inf
-    for move in board.legal_moves:
+def _piece_hash(board: chess.Board) -> int:
+    h = 0
+    for color in chess.COLORS:
+        for pt in PIECE_VALUES:
+            for sq in chess.scan_forward(board.pieces_mask(pt, color)):
+                h ^= _ZPIECE[color][pt][sq]
+    return h
+
+def _state_hash(board: chess.Board) -> int:
+    """Castling, en-passant and turn part of the polyglot key."""
+    h = 0
+    rights = board.clean_castling_rights()
+    for bb, key in _CASTLING_KEYS:
+        if rights & bb:
+            h ^= key
+    ep = board.ep_square
+    if ep is not None:
+        # only hashed when a pawn could capture, as polyglot does
+        mask = chess.shift_down(chess.BB_SQUARES[ep]) if board.turn else chess.shift_up(chess.BB_SQUARES[ep])
+        if (chess.shift_left(mask) | chess.shift_right(mask)) & board.pawns & board.occupied_co[board.turn]:
+            h ^= _Z[772 + chess.square_file(ep)]
+    if board.turn == chess.WHITE:
+        h ^= _Z[780]
+    return h
+
+class _Stop(Exception):
+    pass
+
+# transposition table entry: (key, depth, flag, score, move, generation)
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+class AlphaBetaSearcher:
+    """
+    Iterative-deepening alpha-beta search with MultiPV output.
+
+    The transposition table is a fixed array of `tt_size` slots indexed by
+    the polyglot Zobrist key (updated incrementally on every move); a slot is
+    overwritten by a deeper search or by any entry from a newer analyse()
+    call. Moves are tried TT move first, then captures by MVV-LVA,
+    promotions, two killer moves per ply and the history heuristic. The
+    searcher keeps its tables between calls, so analysing consecutive
+    positions of a game reuses earlier work.
+    """
+    def __init__(self, tt_size: int = 1 << 18):
+        self.tt_size = 1 << max(10, (tt_size - 1).bit_length())
+        self._mask = self.tt_size - 1
+        self._tt: List[Optional[tuple]] = [None] * self.tt_size
+        self._gen = 0
+        self._history: Dict[int, int] = {}
+        self.nodes = 0
+        self.depth = 0          # deepest completed iteration of the last analyse()
+
+    def clear(self):
+        self._tt = [None] * self.tt_size
+        self._history.clear()
+
+    # --- public API --------------------------------------------------------
+    def analyse(self, board: chess.Board, multipv: int = 1, depth: Optional[int] = None,
+                time_limit: Optional[float] = None, nodes: Optional[int] = None,
+                root_moves: Optional[List[chess.Move]] = None) -> List[EngineLine]:
+        """
+        Best `multipv` lines, best first, from the deepest iteration finished
+        within the limits (depth 1 always completes). Without any limit the
+        search stops at depth 4. `root_moves` restricts the moves searched at
+        the root, like UCI searchmoves.
+        """
+        if depth is None and time_limit is None and nodes is None:
+            depth = 4
+        moves = [m for m in board.legal_moves if root_moves is None or m in root_moves]
+        if not moves:
+            return []
+        self._root_moves = moves
+        board = board.copy(stack=False)
+        self._gen += 1
+        for k in self._history:
+            self._history[k] //= 8
+        self._killers: List[List[Optional[chess.Move]]] = [[None, None] for _ in range(MAX_PLY + 1)]
+        self._pv: List[List[chess.Move]] = [[] for _ in range(MAX_PLY + 2)]
+        self._deadline = time.monotonic() + time_limit if time_limit is not None else None
+        self._max_nodes = nodes
+        self._can_stop = False
+        self.nodes = 0
+        self.depth = 0
+        self._score = material(board)
+        self._phash = _piece_hash(board)
+        self._keys = [self._phash ^ _state_hash(board)]
+        self._undo: List[Tuple[int, int]] = []
+
+        n_lines = min(max(1, multipv), len(moves))
+        results: List[Tuple[int, List[chess.Move]]] = []
+        for d in range(1, (depth or MAX_PLY) + 1):
+            try:
+                results = self._search_root(board, d, n_lines, [pv[0] for _, pv in results])
+            except _Stop:
+                while self._undo:        # unwind the interrupted iteration
+                    self._unmake(board)
+                break
+            self.depth = d
+            self._can_stop = True
+            if all(abs(score) >= MATE_BOUND for score, _ in results):   # deeper will not change them
+                break
+        return [self._line(board, score, pv) for score, pv in results]
+
+    def zobrist(self) -> int:
+        """Incremental key of the current search position (polyglot compatible)."""
+        return self._keys[-1]
+
+    # --- make / unmake -----------------------------------------------------
+    def _make(self, board: chess.Board, move: chess.Move):
+        us, frm, to = board.turn, move.from_square, move.to_square
+        them = not us
+        piece = board.piece_type_at(frm)
+        psq, zp = _PSQ[us], _ZPIECE[us]
+        if board.is_castling(move):
+            rank = chess.square_rank(frm)
+            kingside = to > frm
+            k_to = chess.square(6 if kingside else 2, rank)
+            r_to = chess.square(5 if kingside else 3, rank)
+            # standard castling moves the king two squares, chess960 moves it onto the rook
+            r_from = to if board.rooks & board.occupied_co[us] & chess.BB_SQUARES[to] \
+                else chess.square(7 if kingside else 0, rank)
+            ds = (psq[chess.KING][k_to] - psq[chess.KING][frm] + psq[chess.ROOK][r_to] - psq[chess.ROOK][r_from])
+            dh = zp[chess.KING][frm] ^ zp[chess.KING][k_to] ^ zp[chess.ROOK][r_from] ^ zp[chess.ROOK][r_to]
+        else:
+            new = move.promotion or piece
+            ds = psq[new][to] - psq[piece][frm]
+            dh = zp[piece][frm] ^ zp[new][to]
+            if board.is_en_passant(move):
+                cap, cap_sq = chess.PAWN, to - 8 if us else to + 8
+            else:
+                cap, cap_sq = board.piece_type_at(to), to
+            if cap:
+                ds += _PSQ[them][cap][cap_sq]
+                dh ^= _ZPIECE[them][cap][cap_sq]
         board.push(move)
-        val = -_search(board, depth - 1, -math.inf, math.inf)
+        self._undo.append((self._score, self._phash))
+        self._score += ds if us == chess.WHITE else -ds
+        self._phash ^= dh
+        self._keys.append(self._phash ^ _state_hash(board))
+
+    def _unmake(self, board: chess.Board):
         board.pop()
-        if val > best_val:
-            best_val = val
-            best_mv = move
-    return best_mv or chess.Move.null(), int(best_val)
+        self._score, self._phash = self._undo.pop()
+        self._keys.pop()
+
+    # --- search ------------------------------------------------------------
+    def _tick(self):
+        self.nodes += 1
+        if self._can_stop and (self.nodes & 1023) == 0:
+            if (self._deadline is not None and time.monotonic() >= self._deadline) or \
+                    (self._max_nodes is not None and self.nodes >= self._max_nodes):
+                raise _Stop
+
+    def _ordered(self, board: chess.Board, tt_move: Optional[chess.Move], ply: int,
+                 moves=None) -> List[chess.Move]:
+        them = board.occupied_co[not board.turn]
+        killers = self._killers[ply] if ply <= MAX_PLY else (None, None)
+        history = self._history
+        side = 4096 if board.turn else 0
+        scored = []
+        for m in (board.legal_moves if moves is None else moves):
+            if m == tt_move:
+                s = 1 << 30
+            elif chess.BB_SQUARES[m.to_square] & them:
+                s = (1 << 24) + 10 * _ORDER_VALUE[board.piece_type_at(m.to_square)] \
+                    - _ORDER_VALUE[board.piece_type_at(m.from_square)]
+            elif m.promotion:
+                s = (1 << 23) + m.promotion
+            elif m == killers[0]:
+                s = (1 << 22) + 1
+            elif m == killers[1]:
+                s = 1 << 22
+            else:
+                s = history.get(side + m.from_square * 64 + m.to_square, 0)
+            scored.append((s, m))
+        scored.sort(key=lambda t: t[0], reverse=True)
+        return [m for _, m in scored]
+
+    def _search_root(self, board: chess.Board, depth: int, n_lines: int,
+                     previous: List[chess.Move]) -> List[Tuple[int, List[chess.Move]]]:
+        """One iteration: the best line, then the best excluding it, and so on."""
+        remaining = list(self._root_moves)
+        # last iteration's choices first, in their order
+        first = [m for m in previous if m in remaining]
+        remaining = first + self._ordered(board, None, 0, [m for m in remaining if m not in first])
+        out: List[Tuple[int, List[chess.Move]]] = []
+        for _ in range(n_lines):
+            alpha, best_pv = -INF, None
+            for move in remaining:
+                self._make(board, move)
+                score = -self._negamax(board, depth - 1, -INF, -alpha, 1)
+                self._unmake(board)
+                if score > alpha:
+                    alpha, best_pv = score, [move] + self._pv[1]
+            out.append((alpha, best_pv))
+            remaining = [m for m in remaining if m != best_pv[0]]
+        out.sort(key=lambda t: t[0], reverse=True)
+        return out
+
+    def _negamax(self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self._tick()
+        self._pv[ply] = []
+        key = self._keys[-1]
+        # fifty-move rule and repetitions inside the reversible part of the path
+        hm = board.halfmove_clock
+        if hm >= 100:
+            return 0
+        if hm >= 4 and key in self._keys[-hm - 1:-2]:
+            return 0
+
+        slot = key & self._mask
+        entry = self._tt[slot]
+        tt_move = None
+        if entry is not None and entry[0] == key:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                s = entry[3]
+                s = s - ply if s >= MATE_BOUND else s + ply if s <= -MATE_BOUND else s
+                flag = entry[2]
+                if flag == _EXACT or (flag == _LOWER and s >= beta) or (flag == _UPPER and s <= alpha):
+                    if tt_move is not None:
+                        self._pv[ply] = [tt_move]
+                    return s
+
+        in_check = board.is_check()
+        if in_check and ply < MAX_PLY:
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiesce(board, alpha, beta, ply)
+
+        moves = self._ordered(board, tt_move, ply)
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        alpha_orig, best, best_move = alpha, -INF, None
+        them = board.occupied_co[not board.turn]
+        for move in moves:
+            self._make(board, move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            self._unmake(board)
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv[ply + 1]
+                    if alpha >= beta:
+                        if not (chess.BB_SQUARES[move.to_square] & them) and not move.promotion:
+                            killers = self._killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                            hkey = (4096 if board.turn else 0) + move.from_square * 64 + move.to_square
+                            self._history[hkey] = min(self._history.get(hkey, 0) + depth * depth, 1 << 20)
+                        break
+
+        flag = _UPPER if best <= alpha_orig else _LOWER if best >= beta else _EXACT
+        old = self._tt[slot]
+        if old is None or old[5] != self._gen or depth >= old[1]:
+            stored = best + ply if best >= MATE_BOUND else best - ply if best <= -MATE_BOUND else best
+            self._tt[slot] = (key, depth, flag, stored, best_move, self._gen)
+        return best
+
+    def _quiesce(self, board: chess.Board, alpha: int, beta: int, ply: int) -> int:
+        self._tick()
+        self._pv[ply] = []
+        stand = self._score if board.turn == chess.WHITE else -self._score
+        if stand >= beta or ply >= MAX_PLY:
+            return stand
+        if stand > alpha:
+            alpha = stand
+        for move in self._ordered(board, None, ply, board.generate_legal_captures()):
+            self._make(board, move)
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            self._unmake(board)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def _line(board: chess.Board, score: int, pv: List[chess.Move]) -> EngineLine:
+        cp: Optional[float] = float(score)
+        mate: Optional[int] = None
+        if score >= MATE_BOUND:
+            cp, mate = None, (MATE - score + 1) // 2
+        elif score <= -MATE_BOUND:
+            cp, mate = None, -((MATE + score) // 2)
+        return EngineLine(move=pv[0], cp=cp, mate=mate, pv=list(pv), root=board.copy(stack=False))
+
+def best_move(board: chess.Board, depth: int = 3, time_limit: Optional[float] = None) -> Tuple[chess.Move, int]:
+    """Best move and its score (centipawns, side to move) from a fresh search."""
+    lines = AlphaBetaSearcher(tt_size=1 << 16).analyse(board, depth=depth, time_limit=time_limit)
+    if not lines:
+        return chess.Move.null(), evaluate(board) * (1 if board.turn else -1)
+    top = lines[0]
+    if top.mate is not None:
+        return top.move, (MATE - 2 * top.mate + 1) if top.mate > 0 else (-MATE - 2 * top.mate)
+    return top.move, int(top.cp)
@@ -1,10 +1,56 @@
+import weakref
+from contextlib import ExitStack
+
 import streamlit as st
 import chess
 
-from src.engine.engine_wrapper import EngineWrapper
+from src.engine.backends import EngineSelector, open_engine
+from src.engine.engine_wrapper import AdaptiveDepth
 from src.openings.opening_explorer import OpeningExplorer
+from src.openings.stats_db import format_stats
 from src.trainer.eval_bar import render_eval_bar
 
+@st.cache_resource
+def get_explorer() -> OpeningExplorer:
+    return OpeningExplorer(stats_path="data/cache/explorer")
+
+class _SessionEngine:
+    """
+    The engine of one browser session, so one session's start() never
+    cancels another's search. Closed when the settings change, when the
+    session is garbage collected, or at exit (weakref.finalize runs atexit).
+    """
+    def __init__(self, engine_path: str, depth: int, multipv: int):
+        self.key = (engine_path, depth, multipv)
+        stack = ExitStack()
+        self.engine: EngineSelector = stack.enter_context(
+            open_engine(engine_path, depth, multipv, ponder=False, adaptive=AdaptiveDepth()))
+        self.close = weakref.finalize(self, stack.close)
+
+def get_engine(engine_path: str, depth: int, multipv: int) -> EngineSelector:
+    """
+    This session's engine, kept warm across reruns; at most one process per
+    session. Falls back to the built-in search when the binary is missing.
+    """
+    held = st.session_state.get("engine")
+    if held is None or held.key != (engine_path, depth, multipv):
+        if held is not None:
+            held.close()
+        held = st.session_state["engine"] = _SessionEngine(engine_path, depth, multipv)
+    return held.engine
+
+def show_lines(lines, status: str, bar_slot, lines_slot):
+    if not lines:
+        lines_slot.write("_No engine output._")
+        return
+    bar, label = render_eval_bar(lines[0].cp, lines[0].mate)
+    bar_slot.write(f"{bar} {label}  \n_{status}_")
+    rows = ["**Top options:**"]
+    for i, ln in enumerate(lines[:3], 1):
+        score = ('#' + str(abs(ln.mate))) if ln.mate is not None else f'{(ln.cp or 0)/100:+.2f}'
+        rows.append(f"{i}) {ln.san} — {ln.pv_san}  ({score})")
+    lines_slot.markdown("  \n".join(rows))
+
 st.set_page_config(page_title="Chess Openings Trainer", layout="wide")
 st.title("♟️ Chess Openings Trainer")
 
@@ -16,17 +62,21 @@ col1, col2 = st.columns([2,1])
 with col1:
     fen = st.text_input("FEN", value=chess.STARTING_FEN)
     board = chess.Board(fen)
-    explorer = OpeningExplorer()
+    explorer = get_explorer()
     st.write("**Opening:**", (lambda m: f"{m.name} (ECO {m.eco}) – {m.matched_moves} moves" if (m:=explorer.identify(board)) else "[unknown]")())
+    stats = list(format_stats(board, explorer.move_stats(board)))
+    if stats:
+        st.code("\n".join(stats))
 
 with col2:
-    with EngineWrapper(engine_path, depth, multipv) as eng:
-        lines = eng.analyse(board)
-        if lines:
-            bar, label = render_eval_bar(lines[0].cp, lines[0].mate)
-            st.write(bar, label)
-            st.write("**Top options:**")
-            for i, ln in enumerate(lines[:3], 1):
-                st.write(f"{i}) {board.san(ln.move)} — {ln.pv_san}  ({('#'+str(abs(ln.mate))) if ln.mate is not None else f'{(ln.cp or 0)/100:+.2f}'})")
-        else:
-            st.write("_No engine output._")
+    engine = get_engine(engine_path, depth, multipv)
+    bar_slot, lines_slot = st.empty(), st.empty()
+    bg = engine.background
+    if bg is None:
+        show_lines(engine.analyse(board, multipv), "built-in search", bar_slot, lines_slot)
+    else:
+        # A FEN change reruns the script: start() stops the old search at once,
+        # and each completed iteration is drawn as it arrives.
+        bg.start(board)
+        for d, lines, final in bg.updates(board):
+            show_lines(lines[:multipv], "done" if final else f"depth {d}…", bar_slot, lines_slot)
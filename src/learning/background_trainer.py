@@ -0,0 +1,120 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src.learning.learner import OnlineLearner
+
+_STOP = object()
+
+class BackgroundTrainer:
+    """
+    Trains an OnlineLearner on a worker thread so the move loop never waits
+    for an optimizer step or a checkpoint write.
+
+    submit() only puts the sample on a queue. The worker drains whatever has
+    arrived, appends it to the replay buffer, runs `updates` steps on
+    `batch_size`-sample batches and checkpoints (atomically, via
+    OnlineLearner.save_checkpoint) once `checkpoint_every_s` seconds or
+    `checkpoint_every_steps` optimizer steps have passed since the last one.
+    close() drains the queue, trains on it and writes a final checkpoint;
+    it re-raises the error that stopped the worker, if any.
+
+    The learner's model and buffer belong to the worker while it runs.
+    """
+    def __init__(self, learner: OnlineLearner, updates: int = 4, batch_size: int = 256,
+                 checkpoint_every_s: float = 60.0, checkpoint_every_steps: int = 200,
+                 max_queue: int = 10_000):
+        self.learner = learner
+        self.updates = updates
+        self.batch_size = batch_size
+        self.checkpoint_every_s = checkpoint_every_s
+        self.checkpoint_every_steps = checkpoint_every_steps
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.steps = 0
+        self.checkpoints = 0
+        self.dropped = 0
+        self.last_loss: Optional[float] = None
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="background-trainer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, x_np: np.ndarray, value_target: float, policy_index: int):
+        """Queue one training sample; drops it if the worker is far behind."""
+        if self._error is not None:
+            raise self._error
+        try:
+            self._queue.put_nowait((x_np, value_target, policy_index))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # a dead worker never empties a full queue
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _drain(self, first) -> Tuple[bool, int]:
+        """
+        Append `first` and everything else already queued. Returns (running,
+        samples appended); running is False once _STOP is seen.
+        """
+        item = first
+        appended = 0
+        while True:
+            if item is _STOP:
+                return False, appended
+            x, v, p = item
+            self.learner.buffer.append(x, v, p)
+            appended += 1
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return True, appended
+
+    def _run(self):
+        last_ckpt_t = time.monotonic()
+        last_ckpt_steps = 0
+        running = True
+        try:
+            while running:
+                timeout = max(0.0, last_ckpt_t + self.checkpoint_every_s - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                appended = 0
+                if item is not None:
+                    running, appended = self._drain(item)
+                if appended:
+                    self.last_loss = self.learner.train_steps(self.updates, self.batch_size)
+                    self.steps += self.updates
+                due = (self.steps - last_ckpt_steps >= self.checkpoint_every_steps
+                       or time.monotonic() - last_ckpt_t >= self.checkpoint_every_s)
+                if (due or not running) and self.steps > last_ckpt_steps:
+                    self.learner.save_checkpoint()
+                    self.checkpoints += 1
+                    last_ckpt_steps = self.steps
+                if due or not running:
+                    last_ckpt_t = time.monotonic()
+        except BaseException as exc:
+            self._error = exc
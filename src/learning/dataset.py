@@ -3,38 +3,144 @@ from typing import Optional, Tuple
 import os
 import numpy as np
 
+from src.learning.features import pack_planes, unpack_planes
+from src.learning.move_encoding import NO_POLICY
+from src.utils.logging_utils import profiled
+
+FORMAT_VERSION = 3             # ring layout, meta.i64[0]
+
 class NPZReplayBuffer:
     """
-    Simple on-disk circular buffer using .npz files.
-    Stores (X: float32 [N, C, 8, 8], val: float32 [N,1], pol: int64 [N])
+    Fixed-size on-disk ring buffer backed by preallocated np.memmap files.
+
+    `path` names the legacy .npz file; the ring lives in a directory of the
+    same name without the suffix:
+        meta.i64   int64 [version, capacity, head, count]
+        B.u64      uint64 [capacity, 12]   piece bitboards (see pack_planes)
+        F.u8       uint8  [capacity]       side-to-move + castling flags
+        V.f32      float32 [capacity, 1]
+        P.i64      int64   [capacity]       move_encoding index or NO_POLICY
+    Samples take ~110 bytes instead of 4.6 KB of float planes; sample()
+    expands a whole batch back to float32 planes in one vectorized step.
+    append() writes one row in place and bumps the header, so it is O(1);
+    sample() gathers random rows without loading the file. An existing .npz
+    buffer is converted on first open; its to-square policy placeholders
+    are replaced by NO_POLICY. A ring opened with a different capacity keeps
+    its newest rows, copied in packed form.
     """
-    def __init__(self, path: str = "data/cache/replay_buffer.npz", capacity: int = 50000):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    def __init__(self, path: str = "data/cache/replay_buffer.npz", capacity: int = 1_000_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self.path = path
+        self.dir = path[:-4] if path.endswith(".npz") else path
         self.capacity = capacity
-        if not os.path.exists(self.path):
-            np.savez_compressed(self.path,
-                                X=np.zeros((0, 18, 8, 8), dtype=np.float32),
-                                V=np.zeros((0, 1), dtype=np.float32),
-                                P=np.zeros((0,), dtype=np.int64))
+        self._rng = np.random.default_rng()
+        os.makedirs(self.dir, exist_ok=True)
 
-    def append(self, x: np.ndarray, v: float, p: int):
+        meta_path = os.path.join(self.dir, "meta.i64")
+        if os.path.exists(meta_path):
+            self._open()
+            if int(self._meta[0]) != FORMAT_VERSION:
+                raise ValueError(f"{self.dir}: unknown replay buffer format {int(self._meta[0])}")
+            if int(self._meta[1]) != capacity:
+                self._resize()
+        else:
+            self._create()
+            if path.endswith(".npz") and os.path.exists(path):
+                self._migrate_npz()
+
+    # --- storage -----------------------------------------------------------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _open(self):
+        self._meta = np.memmap(self._path("meta.i64"), dtype=np.int64, mode="r+", shape=(4,))
+        cap = int(self._meta[1])
+        self._B = np.memmap(self._path("B.u64"), dtype="<u8", mode="r+", shape=(cap, 12))
+        self._F = np.memmap(self._path("F.u8"), dtype=np.uint8, mode="r+", shape=(cap,))
+        self._V = np.memmap(self._path("V.f32"), dtype=np.float32, mode="r+", shape=(cap, 1))
+        self._P = np.memmap(self._path("P.i64"), dtype=np.int64, mode="r+", shape=(cap,))
+
+    def _create(self):
+        # preallocate (sparse on most filesystems) so appends never grow files
+        for name, nbytes in (("B.u64", 8 * 12), ("F.u8", 1), ("V.f32", 4), ("P.i64", 8)):
+            with open(self._path(name), "wb") as fh:
+                fh.truncate(self.capacity * nbytes)
+        np.array([FORMAT_VERSION, self.capacity, 0, 0], dtype=np.int64).tofile(self._path("meta.i64"))
+        self._open()
+
+    def _resize(self):
+        """Recreate the ring at self.capacity with the newest rows, oldest first, still packed."""
+        cap, head, n = int(self._meta[1]), int(self._meta[2]), int(self._meta[3])
+        k = min(n, self.capacity)
+        order = np.arange(head - k, head) % cap
+        B, F, V, P = (np.array(a[order]) for a in (self._B, self._F, self._V, self._P))
+        self.close()
+        self._create()
+        self._B[:k], self._F[:k], self._V[:k], self._P[:k] = B, F, V, P
+        self._meta[2] = k % self.capacity
+        self._meta[3] = k
+        self.flush()
+
+    def _migrate_npz(self):
         data = np.load(self.path)
-        X = data["X"]; V = data["V"]; P = data["P"]
-        X_new = np.concatenate([X, x[None, ...]], axis=0)
-        V_new = np.concatenate([V, np.array([[v]], dtype=np.float32)], axis=0)
-        P_new = np.concatenate([P, np.array([p], dtype=np.int64)], axis=0)
-        # enforce capacity
-        if X_new.shape[0] > self.capacity:
-            off = X_new.shape[0] - self.capacity
-            X_new = X_new[off:]; V_new = V_new[off:]; P_new = P_new[off:]
-        np.savez_compressed(self.path, X=X_new, V=V_new, P=P_new)
+        self._extend(data["X"].astype(np.float32), data["V"].astype(np.float32),
+                     np.full(data["P"].shape, NO_POLICY, dtype=np.int64))
+        data.close()
+        self.flush()
+        os.replace(self.path, self.path + ".migrated")
 
+    def _extend(self, X: np.ndarray, V: np.ndarray, P: np.ndarray):
+        X, V, P = X[-self.capacity:], V[-self.capacity:], P[-self.capacity:]
+        k = X.shape[0]
+        if k == 0:
+            return
+        head = int(self._meta[2])
+        rows = (head + np.arange(k)) % self.capacity
+        self._B[rows], self._F[rows] = pack_planes(X)
+        self._V[rows] = V.reshape(k, 1)
+        self._P[rows] = P
+        self._meta[2] = (head + k) % self.capacity
+        self._meta[3] = min(self.capacity, int(self._meta[3]) + k)
+
+    @profiled("buffer.flush")
+    def flush(self):
+        for name in ("_B", "_F", "_V", "_P", "_meta"):
+            arr = getattr(self, name, None)
+            if isinstance(arr, np.memmap) and arr.mode != "r":
+                arr.flush()
+
+    def close(self):
+        if getattr(self, "_meta", None) is not None:
+            self.flush()
+        self._B = self._F = self._V = self._P = self._meta = None
+
+    def __len__(self) -> int:
+        return int(self._meta[3])
+
+    # --- API ---------------------------------------------------------------
+    def append(self, x: np.ndarray, v: float, p: int):
+        bitboards, flags = pack_planes(x)
+        self.append_packed(bitboards[0], flags[0], v, p)
+
+    @profiled("buffer.append")
+    def append_packed(self, bitboards: np.ndarray, flags: int, v: float, p: int):
+        """Append a sample already in pack_planes form (skips re-packing)."""
+        head = int(self._meta[2])
+        self._B[head] = bitboards
+        self._F[head] = flags
+        self._V[head, 0] = v
+        self._P[head] = p
+        # header last, so a crash mid-append never exposes a half-written row
+        self._meta[2] = (head + 1) % self.capacity
+        self._meta[3] = min(self.capacity, int(self._meta[3]) + 1)
+
+    @profiled("buffer.sample")
     def sample(self, batch_size: int = 64) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
-        data = np.load(self.path)
-        X = data["X"]; V = data["V"]; P = data["P"]
-        n = X.shape[0]
+        n = int(self._meta[3])
         if n == 0:
             return None
-        idx = np.random.choice(n, size=min(batch_size, n), replace=False)
-        return X[idx], V[idx], P[idx]
+        # filled rows are always 0..n-1, whichever row is the ring's head
+        idx = self._rng.choice(n, size=min(batch_size, n), replace=False)
+        idx.sort()   # sequential-ish reads from the memmap
+        X = unpack_planes(self._B[idx], self._F[idx])
+        return X, np.asarray(self._V[idx]), np.asarray(self._P[idx])
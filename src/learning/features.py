@@ -1,8 +1,10 @@
 from __future__ import annotations
-from typing import Tuple
+from typing import Sequence, Tuple
 import numpy as np
 import chess
 
+from src.learning.move_encoding import NO_POLICY, move_to_index
+
 PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
 
 def board_to_planes(board: chess.Board) -> np.ndarray:
@@ -32,15 +34,93 @@ def board_to_planes(board: chess.Board) -> np.ndarray:
     # pad remaining channels to 18 with zeros automatically (they are already zero)
     return planes
 
-def targets_from_engine(cp: float | None, multipv_cps: list[float] | None = None) -> Tuple[float, int]:
+def pack_planes(planes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compact storage form of board_to_planes output, for one (18, 8, 8) array
+    or a batch (N, 18, 8, 8):
+      - bitboards: uint64 [N, 12], one per piece plane, bit i = square i
+        (the same layout as python-chess bitboards);
+      - flags: uint8 [N], bit 0 = white to move, bits 1-4 = castling WK/WQ/BK/BQ.
+    About 100 bytes per sample instead of 4.6 KB. Inverse of unpack_planes.
+    """
+    planes = np.asarray(planes)
+    if planes.ndim == 3:
+        planes = planes[None]
+    n = planes.shape[0]
+    # plane row 0 is rank 8; flip so that flattened index == square index
+    pieces = np.ascontiguousarray(planes[:, :12, ::-1, :] > 0.5).reshape(n, 12, 64)
+    bitboards = np.packbits(pieces, axis=-1, bitorder="little").view("<u8").reshape(n, 12)
+    flags = np.packbits(planes[:, 12:17, 0, 0] > 0.5, axis=-1, bitorder="little")[:, 0]
+    return bitboards, flags
+
+def unpack_planes(bitboards: np.ndarray, flags: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Vectorized expansion of pack_planes storage back to float32 (N, 18, 8, 8)
+    planes, one np.unpackbits over the whole batch. `out` may be a
+    preallocated buffer of that shape.
+    """
+    bitboards = np.ascontiguousarray(bitboards, dtype="<u8").reshape(-1, 12)
+    n = bitboards.shape[0]
+    if out is None:
+        out = np.empty((n, 18, 8, 8), dtype=np.float32)
+    bits = np.unpackbits(bitboards.view(np.uint8).reshape(n, 12, 8), axis=-1, bitorder="little")
+    out[:, :12] = bits.reshape(n, 12, 8, 8)[:, :, ::-1, :]
+    fl = np.unpackbits(np.asarray(flags, dtype=np.uint8).reshape(n, 1), axis=-1, bitorder="little")
+    out[:, 12:17] = fl[:, :5, None, None]
+    out[:, 17] = 0.0
+    return out
+
+def _castling_sides(kings, color_bb, promoted, castling, backrank):
+    """Vectorized has_{king,queen}side_castling_rights for one colour."""
+    king = kings & color_bb & np.uint64(backrank) & ~promoted
+    rooks = castling & np.uint64(backrank)
+    below = king - np.uint64(1)            # squares below the king (masked when no king)
+    above = ~(below | king)
+    has_king = king != 0
+    return has_king & ((rooks & above) != 0), has_king & ((rooks & below) != 0)
+
+def board_row(b: chess.Board) -> tuple:
+    """The raw python-chess bitboards rows_to_bitboards() needs, as 11 ints."""
+    return (b.occupied_co[chess.WHITE], b.occupied_co[chess.BLACK],
+            b.pawns, b.knights, b.bishops, b.rooks, b.queens, b.kings,
+            b.clean_castling_rights(), b.promoted, b.turn)
+
+def boards_to_bitboards(boards: Sequence[chess.Board]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    pack_planes() output computed straight from python-chess bitboards: one
+    tuple of ints per board, then everything else (colour x piece-type ANDs,
+    castling flags) for the whole batch as uint64 array operations.
+    """
+    n = len(boards)
+    return rows_to_bitboards(np.array([board_row(b) for b in boards], dtype=np.uint64).reshape(n, 11))
+
+def rows_to_bitboards(raw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """pack_planes() output from a uint64 [N, 11] array of board_row() tuples."""
+    white, black, kings, castling, promoted = raw[:, 0], raw[:, 1], raw[:, 7], raw[:, 8], raw[:, 9]
+    # [white & P..K, black & P..K] in PIECE_TYPES order, as in board_to_planes
+    bitboards = np.concatenate([raw[:, 0:1] & raw[:, 2:8], raw[:, 1:2] & raw[:, 2:8]], axis=1)
+    wk, wq = _castling_sides(kings, white, promoted, castling, chess.BB_RANK_1)
+    bk, bq = _castling_sides(kings, black, promoted, castling, chess.BB_RANK_8)
+    flags = (raw[:, 10].astype(np.uint8) | wk.astype(np.uint8) << 1 | wq.astype(np.uint8) << 2
+             | bk.astype(np.uint8) << 3 | bq.astype(np.uint8) << 4)
+    return bitboards.astype("<u8", copy=False), flags
+
+def boards_to_planes(boards: Sequence[chess.Board], out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Batched board_to_planes: (N, 18, 8, 8) float32, bit-identical to stacking
+    board_to_planes(b) for each board. `out` may be a preallocated buffer.
+    """
+    return unpack_planes(*boards_to_bitboards(boards), out=out)
+
+def targets_from_engine(cp: float | None, multipv_cps: list[float] | None = None,
+                        best_move: chess.Move | None = None) -> Tuple[float, int]:
     """
     Build supervision targets from engine eval.
     value: tanh(cp/800) in [-1,1]; None -> 0
-    policy_index: naive "best to-square" index 0..63 (fallback 0)
+    policy_index: move_to_index(best_move), e.g. EngineLine.move of the top
+    MultiPV line; NO_POLICY (ignored by the loss) when there is none
     """
     import math
     v = 0.0 if cp is None else math.tanh((cp/100.0)/8.0)
-    # We cannot map full move space cheaply here; use a dummy index (e.g., center preference)
-    # Upstream code can override with actual move to-square index if desired.
-    pol = 27  # e4 square index as placeholder
+    pol = NO_POLICY if best_move is None else move_to_index(best_move)
     return float(v), int(pol)
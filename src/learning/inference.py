@@ -1,13 +1,22 @@
 from __future__ import annotations
+from typing import Optional
 import numpy as np
 import chess
 
-def choose_square_from_policy(board: chess.Board, policy_logits: np.ndarray) -> int:
+from src.learning.move_encoding import policy_moves
+
+def choose_move_from_policy(board: chess.Board, policy_logits: np.ndarray,
+                            temperature: float = 1.0, sample: bool = True) -> Optional[chess.Move]:
     """
-    Naive helper: picks a 'to-square' (0..63) with softmax sampling.
-    This is not a full move policy; it's a lightweight hinting signal.
+    Pick a legal move from the network's policy: softmax over the legal
+    moves only, sharpened or flattened by `temperature`. sample=False
+    returns the most likely move (useful as a cheap hint or move ordering).
     """
-    import math
-    z = policy_logits - np.max(policy_logits)
-    p = np.exp(z) / np.sum(np.exp(z))
-    return int(np.random.choice(np.arange(64), p=p))
+    ranked = policy_moves(board, policy_logits)
+    if not ranked:
+        return None
+    if not sample or temperature <= 0:
+        return ranked[0][0]
+    p = np.array([prob for _, prob in ranked]) ** (1.0 / temperature)
+    i = np.random.choice(len(ranked), p=p / p.sum())
+    return ranked[i][0]
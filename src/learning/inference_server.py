@@ -0,0 +1,226 @@
+from __future__ import annotations
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+import os
+import queue
+import threading
+import time
+
+import chess
+import numpy as np
+import torch
+import torch.nn as nn
+
+from models.nn.value_policy_net import ValuePolicyNet
+from src.learning.features import board_row, rows_to_bitboards, unpack_planes
+from src.learning.learner import load_compatible
+from src.learning.move_encoding import policy_moves
+
+MODES = ("eager", "script", "compile", "int8")
+
+@dataclass
+class Prediction:
+    value: float            # value head output in [-1, 1]
+    policy: np.ndarray      # [POLICY_SIZE] move logits (see move_encoding)
+
+    def moves(self, board: chess.Board) -> List[tuple]:
+        """Legal moves with their policy probabilities, most likely first."""
+        return policy_moves(board, self.policy)
+
+class InferenceServer:
+    """
+    Batched ValuePolicyNet inference on a frozen snapshot of the checkpoint.
+
+    Callers on any thread submit boards (or planes); one worker thread waits
+    up to `window_ms` after the first request for others to arrive, then runs
+    them as one batch of at most `max_batch` positions. The snapshot is its
+    own model instance, so training on the OnlineLearner's model never blocks
+    it; a newer checkpoint file is picked up between batches.
+
+    mode: "eager", "script" (traced + frozen TorchScript), "compile"
+    (torch.compile) or "int8" (dynamically quantized Linear layers). A mode
+    that fails to build falls back to eager. channels_last switches the
+    convolutions' memory layout.
+
+        with InferenceServer() as nn_server:
+            pred = nn_server.predict(board)
+    """
+    def __init__(self, model_path: str = "models/nn/checkpoints/latest.ckpt",
+                 mode: str = "eager", channels_last: bool = False,
+                 max_batch: int = 256, window_ms: float = 2.0,
+                 reload_every_s: float = 1.0, threads: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.model_path = model_path
+        self.mode = mode
+        self.channels_last = channels_last
+        self.max_batch = max_batch
+        self.window_s = window_ms / 1000.0
+        self.reload_every_s = reload_every_s
+        if threads:
+            torch.set_num_threads(threads)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self.model: nn.Module = self._load()
+        self.batches = 0
+        self.positions = 0
+        self._closed = False
+        self._close_lock = threading.Lock()     # orders submit() puts before close()'s sentinel
+        self._thread = threading.Thread(target=self._run, name="nn-inference", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    # --- snapshot ----------------------------------------------------------
+    def _checkpoint_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> nn.Module:
+        model = ValuePolicyNet(in_channels=18)
+        self._mtime = self._checkpoint_mtime()
+        if self._mtime is not None:
+            try:
+                load_compatible(model, torch.load(self.model_path, map_location="cpu"))
+            except Exception:
+                pass
+        model.eval()
+        for p in model.parameters():
+            p.requires_grad_(False)
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        try:
+            return self._variant(model)
+        except Exception:
+            return model
+
+    def _variant(self, model: nn.Module) -> nn.Module:
+        if self.mode == "script":
+            example = self._input(np.zeros((1, 18, 8, 8), dtype=np.float32))
+            with torch.inference_mode():
+                return torch.jit.freeze(torch.jit.trace(model, example))
+        if self.mode == "compile":
+            compiled = torch.compile(model, dynamic=True)   # batch size varies per call
+            with torch.inference_mode():
+                compiled(self._input(np.zeros((1, 18, 8, 8), dtype=np.float32)))   # compile now, not on first request
+            return compiled
+        if self.mode == "int8":
+            return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_every_s
+        if self._checkpoint_mtime() != self._mtime:
+            self.model = self._load()
+
+    # --- API ---------------------------------------------------------------
+    def submit(self, positions: Union[chess.Board, np.ndarray, Sequence[chess.Board]]) -> Future:
+        """
+        Queue a board, a list of boards or a planes array ((18, 8, 8) or
+        (N, 18, 8, 8)). The future resolves to a Prediction for a single
+        board or plane stack, otherwise to a list of them. Raises
+        RuntimeError once the server is closed.
+        """
+        if self._closed:
+            raise RuntimeError("InferenceServer closed")
+        fut: Future = Future()
+        if isinstance(positions, chess.Board):
+            item, single = [board_row(positions)], True
+        elif isinstance(positions, np.ndarray):
+            single = positions.ndim == 3
+            item = positions.reshape(-1, 18, 8, 8).astype(np.float32, copy=False)
+        else:
+            item, single = [board_row(b) for b in positions], False
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("InferenceServer closed")
+            self._queue.put((item, single, fut))
+        return fut
+
+    def predict(self, board: Union[chess.Board, np.ndarray]) -> Prediction:
+        return self.submit(board).result()
+
+    def predict_many(self, boards: Sequence[chess.Board]) -> List[Prediction]:
+        return self.submit(list(boards)).result()
+
+    # --- worker ------------------------------------------------------------
+    def _input(self, X: np.ndarray) -> torch.Tensor:
+        x = torch.from_numpy(X)
+        return x.contiguous(memory_format=torch.channels_last) if self.channels_last else x
+
+    @staticmethod
+    def _planes(item) -> np.ndarray:
+        if isinstance(item, np.ndarray):
+            return item
+        rows = np.array(item, dtype=np.uint64).reshape(len(item), 11)
+        return unpack_planes(*rows_to_bitboards(rows))
+
+    def _collect(self, first) -> tuple:
+        """`first` plus whatever arrives within the batching window."""
+        batch, n = [first], len(first[0])
+        deadline = time.monotonic() + self.window_s
+        while n < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, False
+            batch.append(item)
+            n += len(item[0])
+        return batch, True
+
+    def _run(self):
+        running = True
+        while running:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, running = self._collect(first)
+            try:
+                self._maybe_reload()
+                X = np.concatenate([self._planes(item) for item, _, _ in batch])
+                with torch.inference_mode():
+                    v, p = self.model(self._input(X))
+                v = v.float().numpy()[:, 0]
+                p = p.float().numpy()
+            except Exception as exc:
+                for _, _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            self.batches += 1
+            self.positions += len(X)
+            i = 0
+            for item, single, fut in batch:
+                k = len(item)
+                preds = [Prediction(value=float(v[j]), policy=p[j]) for j in range(i, i + k)]
+                i += k
+                fut.set_result(preds[0] if single else preds)
+        # fail anything still queued after close()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("InferenceServer closed"))
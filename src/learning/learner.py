@@ -7,6 +7,31 @@ import torch.optim as optim
 
 from models.nn.value_policy_net import ValuePolicyNet
 from src.learning.dataset import NPZReplayBuffer
+from src.learning.move_encoding import NO_POLICY
+from src.utils.logging_utils import profiled, span
+
+def save_atomic(state, path: str):
+    """torch.save to a temp file next to `path`, then rename over it."""
+    tmp = path + ".tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+def load_compatible(model: nn.Module, state: dict) -> bool:
+    """
+    Load the tensors of `state` whose shapes match `model` (e.g. keep the
+    trunk and value head of a checkpoint saved with an older policy head).
+    Returns True when everything matched.
+    """
+    own = model.state_dict()
+    keep = {k: v for k, v in state.items() if k in own and own[k].shape == v.shape}
+    model.load_state_dict(keep, strict=False)
+    return len(keep) == len(own) == len(state)
+
+def policy_loss(p_logits: torch.Tensor, targets: torch.Tensor) -> torch.Tensor:
+    """Cross-entropy over the samples that have a policy target (not NO_POLICY)."""
+    if not bool((targets != NO_POLICY).any()):
+        return p_logits.sum() * 0.0
+    return nn.functional.cross_entropy(p_logits, targets, ignore_index=NO_POLICY)
 
 class OnlineLearner:
     """
@@ -16,7 +41,8 @@ class OnlineLearner:
                  model_path: str = "models/nn/checkpoints/latest.ckpt",
                  opt_path: str = "models/nn/optimizer_state/latest.opt",
                  lr: float = 1e-3,
-                 device: str = "cpu"):
+                 device: str = "cpu",
+                 buffer_path: str = "data/cache/replay_buffer.npz"):
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         os.makedirs(os.path.dirname(opt_path), exist_ok=True)
         self.model_path = model_path
@@ -24,23 +50,29 @@ class OnlineLearner:
         self.device = torch.device(device)
         self.model = ValuePolicyNet(in_channels=18).to(self.device)
         self.optimizer = optim.Adam(self.model.parameters(), lr=lr)
-        # try load
+        # try load; optimizer moments only fit a model that loaded completely
+        complete = False
         if os.path.exists(self.model_path):
             try:
-                self.model.load_state_dict(torch.load(self.model_path, map_location=self.device))
+                complete = load_compatible(self.model, torch.load(self.model_path, map_location=self.device))
             except Exception:
                 pass
-        if os.path.exists(self.opt_path):
+        if complete and os.path.exists(self.opt_path):
             try:
                 self.optimizer.load_state_dict(torch.load(self.opt_path, map_location=self.device))
             except Exception:
                 pass
-        self.buffer = NPZReplayBuffer()
+        self.buffer = NPZReplayBuffer(buffer_path)
 
     def step_after_move(self, x_np, value_target: float, policy_index: int, updates: int = 1, batch_size: int = 64):
-        # append sample
+        """Synchronous append + train + checkpoint (see BackgroundTrainer for the async path)."""
         self.buffer.append(x_np, value_target, policy_index)
-        # train
+        loss_total = self.train_steps(updates, batch_size)
+        self.save_checkpoint()
+        return loss_total
+
+    @profiled("learner.train")
+    def train_steps(self, updates: int, batch_size: int = 64) -> float:
         self.model.train()
         loss_total = 0.0
         for _ in range(updates):
@@ -51,19 +83,27 @@ class OnlineLearner:
             X_t = torch.from_numpy(X).to(self.device)
             V_t = torch.from_numpy(V).to(self.device)
             P_t = torch.from_numpy(P).to(self.device)
-            v_pred, p_logits = self.model(X_t)
-            v_loss = torch.mean((v_pred - V_t)**2)
-            p_loss = torch.nn.functional.cross_entropy(p_logits, P_t)
-            loss = v_loss + 0.1 * p_loss
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
-            loss_total += loss.item()
-        # save checkpoints
-        torch.save(self.model.state_dict(), self.model_path)
-        torch.save(self.optimizer.state_dict(), self.opt_path)
+            with span("learner.step"):
+                v_pred, p_logits = self.model(X_t)
+                v_loss = torch.mean((v_pred - V_t)**2)
+                p_loss = policy_loss(p_logits, P_t)
+                loss = v_loss + 0.1 * p_loss
+                self.optimizer.zero_grad()
+                loss.backward()
+                self.optimizer.step()
+                loss_total += loss.item()
         return loss_total
 
+    @profiled("learner.checkpoint")
+    def save_checkpoint(self):
+        """
+        Write model and optimizer state via write-to-temp + rename, so a crash
+        mid-save never leaves a truncated checkpoint behind.
+        """
+        save_atomic(self.model.state_dict(), self.model_path)
+        save_atomic(self.optimizer.state_dict(), self.opt_path)
+        self.buffer.flush()
+
     def predict_policy_value(self, x_np):
         self.model.eval()
         with torch.no_grad():
@@ -0,0 +1,112 @@
+"""
+Policy move encoding: 64 from-squares x 73 move planes = 4672 indices.
+
+  planes  0-55  queen-style moves: 8 directions x distance 1-7
+                (also rook, bishop, king, pawn pushes/captures and
+                promotions to a queen)
+  planes 56-63  knight jumps
+  planes 64-72  under-promotions to knight/bishop/rook x
+                (capture towards the a-file, push, capture towards the h-file)
+
+index = from_square * 73 + plane. Squares are python-chess squares (a1 = 0),
+so the encoding is absolute like board_to_planes, not side-to-move relative.
+All conversions go through lookup tables built once at import.
+"""
+from __future__ import annotations
+from typing import Iterable, List, Optional, Sequence
+import numpy as np
+import chess
+
+N_PLANES = 73
+POLICY_SIZE = 64 * N_PLANES
+NO_POLICY = -1          # policy target for samples without a known best move
+
+# (file delta, rank delta) for N, NE, E, SE, S, SW, W, NW
+_DIRECTIONS = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
+_KNIGHT = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+_UNDER = [chess.KNIGHT, chess.BISHOP, chess.ROOK]
+# promotion piece -> last axis of _INDEX; queen promotions use the plain move
+_PROMO_SLOT = {None: 0, chess.QUEEN: 0, chess.KNIGHT: 1, chess.BISHOP: 2, chess.ROOK: 3}
+
+def _build_tables():
+    index = np.full((64, 64, 4), NO_POLICY, dtype=np.int32)
+    from_sq = np.full(POLICY_SIZE, -1, dtype=np.int8)
+    to_sq = np.full(POLICY_SIZE, -1, dtype=np.int8)
+    promo = np.zeros(POLICY_SIZE, dtype=np.int8)
+    for sq in range(64):
+        f, r = chess.square_file(sq), chess.square_rank(sq)
+        targets = []
+        for df, dr in _DIRECTIONS:
+            for dist in range(1, 8):
+                targets.append((f + df * dist, r + dr * dist, 0))
+        for df, dr in _KNIGHT:
+            targets.append((f + df, r + dr, 0))
+        # under-promotions: forward is up from rank 7, down from rank 2
+        fwd = 1 if r == 6 else -1 if r == 1 else 0
+        for piece in _UNDER:
+            for df in (-1, 0, 1):
+                targets.append((f + df, r + fwd, piece) if fwd else (-1, -1, piece))
+        for plane, (tf, tr, piece) in enumerate(targets):
+            if not (0 <= tf < 8 and 0 <= tr < 8):
+                continue
+            i = sq * N_PLANES + plane
+            to = chess.square(tf, tr)
+            from_sq[i], to_sq[i], promo[i] = sq, to, piece
+            index[sq, to, _PROMO_SLOT[piece or None]] = i
+    return index, from_sq, to_sq, promo
+
+_INDEX, _FROM, _TO, _PROMO = _build_tables()
+
+def move_to_index(move: chess.Move) -> int:
+    return int(_INDEX[move.from_square, move.to_square, _PROMO_SLOT[move.promotion]])
+
+def moves_to_indices(moves: Iterable[chess.Move]) -> np.ndarray:
+    """Vectorized move_to_index over any number of moves."""
+    arr = np.array([(m.from_square, m.to_square, _PROMO_SLOT[m.promotion]) for m in moves],
+                   dtype=np.intp).reshape(-1, 3)
+    return _INDEX[arr[:, 0], arr[:, 1], arr[:, 2]]
+
+def index_to_move(index: int, board: Optional[chess.Board] = None) -> Optional[chess.Move]:
+    """
+    Inverse of move_to_index, or None for an index that encodes no move.
+    With `board`, a pawn reaching the last rank on a queen plane becomes a
+    queen promotion.
+    """
+    f, t, p = int(_FROM[index]), int(_TO[index]), int(_PROMO[index])
+    if f < 0:
+        return None
+    if not p and board is not None and chess.square_rank(t) in (0, 7) \
+            and board.piece_type_at(f) == chess.PAWN:
+        p = chess.QUEEN
+    return chess.Move(f, t, promotion=p or None)
+
+def legal_indices(board: chess.Board) -> np.ndarray:
+    """Policy indices of the legal moves, in board.legal_moves order."""
+    return moves_to_indices(board.legal_moves)
+
+def legal_mask(board: chess.Board) -> np.ndarray:
+    """bool [POLICY_SIZE], True at the index of every legal move."""
+    mask = np.zeros(POLICY_SIZE, dtype=bool)
+    mask[legal_indices(board)] = True
+    return mask
+
+def legal_masks(boards: Sequence[chess.Board]) -> np.ndarray:
+    """bool [N, POLICY_SIZE] legal-move masks for a batch, set with one scatter."""
+    idx = [legal_indices(b) for b in boards]
+    rows = np.repeat(np.arange(len(boards)), [len(i) for i in idx])
+    masks = np.zeros((len(boards), POLICY_SIZE), dtype=bool)
+    if rows.size:
+        masks[rows, np.concatenate(idx)] = True
+    return masks
+
+def policy_moves(board: chess.Board, policy_logits: np.ndarray) -> List[tuple]:
+    """Legal moves with their policy probabilities, most likely first."""
+    moves = list(board.legal_moves)
+    if not moves:
+        return []
+    idx = moves_to_indices(moves)
+    z = np.asarray(policy_logits, dtype=np.float64)[idx]
+    p = np.exp(z - z.max())
+    p /= p.sum()
+    order = np.argsort(-p, kind="stable")
+    return [(moves[i], float(p[i])) for i in order]
@@ -0,0 +1,256 @@
+"""
+Offline training of ValuePolicyNet from PGN game collections.
+
+Every mainline position that has an evaluation and a following move becomes
+one sample: the value target comes from the game's [%eval] comment (or, for
+positions without one, from a precomputed EvalCache store) from the side to
+move's point of view, the policy target from the move actually played.
+
+PGNs are never loaded whole: each DataLoader worker parses its own byte
+range of every file (split at game boundaries) with a visitor that skips
+variations and never builds a game tree, and shuffles within a bounded
+buffer. Checkpoints use the same files as OnlineLearner, so the trainer
+picks up the result directly.
+
+    python -m src.learning.offline_train games.pgn --workers 4 --batch-size 1024
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import time
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import chess
+import chess.engine
+import chess.pgn
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from models.nn.value_policy_net import ValuePolicyNet
+from src.learning.features import board_row, rows_to_bitboards, targets_from_engine, unpack_planes
+from src.learning.learner import load_compatible, policy_loss, save_atomic
+from src.learning.move_encoding import move_to_index
+from src.openings.pgn_loader import RangeReader, shard_offsets
+
+MATE_CP = 10_000
+
+# (board_row, value target, policy index)
+Sample = Tuple[tuple, float, int]
+
+class _SampleVisitor(chess.pgn.BaseVisitor):
+    """Collects the samples of one game's mainline without building a tree."""
+    def __init__(self, lookup: Optional[Callable[[chess.Board], Optional[chess.engine.Score]]] = None):
+        self.lookup = lookup
+        self.samples: List[Sample] = []
+        self._eval: Optional[chess.engine.PovScore] = None
+
+    def begin_game(self):
+        self.samples = []
+        self._eval = None
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_comment(self, comment: str):
+        m = chess.pgn.EVAL_REGEX.search(comment)
+        if m is None:
+            return
+        if m.group("mate"):
+            score = chess.engine.Mate(int(m.group("mate")))
+        else:
+            score = chess.engine.Cp(int(round(float(m.group("cp")) * 100)))
+        # [%eval] is always from White's point of view
+        self._eval = chess.engine.PovScore(score, chess.WHITE)
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        # `board` is the position before `move`; its eval came after the previous move
+        score = self._eval.pov(board.turn) if self._eval is not None else None
+        self._eval = None
+        if score is None and self.lookup is not None:
+            score = self.lookup(board)
+        if score is not None:
+            value, _ = targets_from_engine(score.score(mate_score=MATE_CP))
+            self.samples.append((board_row(board), value, move_to_index(move)))
+
+    def result(self) -> List[Sample]:
+        return self.samples
+
+def iter_samples(path: str, start: int = 0, end: Optional[int] = None,
+                 lookup: Optional[Callable[[chess.Board], Optional[chess.engine.Score]]] = None) -> Iterator[Sample]:
+    """Samples of every game starting in bytes [start, end) of `path`."""
+    end = os.path.getsize(path) if end is None else end
+    with open(path, "rb") as fh:
+        reader = RangeReader(fh, start, end)
+        while True:
+            samples = chess.pgn.read_game(reader, Visitor=lambda: _SampleVisitor(lookup))
+            if samples is None:
+                break
+            yield from samples
+
+def collate(samples: Sequence[Sample]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Encode a list of samples into (X, V, P) tensors in one vectorized pass."""
+    rows = np.array([s[0] for s in samples], dtype=np.uint64).reshape(len(samples), 11)
+    X = unpack_planes(*rows_to_bitboards(rows))
+    V = np.array([s[1] for s in samples], dtype=np.float32).reshape(-1, 1)
+    P = np.array([s[2] for s in samples], dtype=np.int64)
+    return torch.from_numpy(X), torch.from_numpy(V), torch.from_numpy(P)
+
+class PGNPositionDataset(IterableDataset):
+    """
+    Streams ready-made (X, V, P) batches from PGN files. Under a DataLoader
+    with N workers, worker i parses range i of shard_offsets(path, N) of every
+    file, so each game is read by exactly one worker. Memory is bounded by
+    `shuffle_buffer` samples per worker.
+    """
+    def __init__(self, paths: Sequence[str], batch_size: int = 1024, shuffle_buffer: int = 65536,
+                 store: Optional[str] = None, engine_key: Optional[str] = None,
+                 min_depth: int = 1, seed: int = 0):
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.shuffle_buffer = max(shuffle_buffer, batch_size)
+        self.store = store
+        self.engine_key = engine_key
+        self.min_depth = min_depth
+        self.seed = seed
+        self.epoch = 0
+
+    def _lookup(self, cache):
+        def lookup(board: chess.Board) -> Optional[chess.engine.Score]:
+            lines = cache.get(self.engine_key, board, self.min_depth, 1)
+            if not lines:
+                return None
+            ln = lines[0]
+            if ln.mate is not None:
+                return chess.engine.Mate(ln.mate)
+            return None if ln.cp is None else chess.engine.Cp(int(ln.cp))
+        return lookup
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]]:
+        info = get_worker_info()
+        wid, n_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        # DataLoader hands every worker a fresh seed each epoch
+        rng = random.Random(info.seed if info is not None else self.seed + self.epoch)
+        self.epoch += 1
+        cache = None
+        if self.store and self.engine_key:
+            from src.engine.eval_cache import EvalCache
+            cache = EvalCache(self.store)
+        lookup = self._lookup(cache) if cache is not None else None
+        try:
+            buf: List[Sample] = []
+            for path in self.paths:
+                offsets = shard_offsets(path, n_workers)
+                for sample in iter_samples(path, offsets[wid], offsets[wid + 1], lookup):
+                    buf.append(sample)
+                    if len(buf) >= self.shuffle_buffer:
+                        rng.shuffle(buf)
+                        n_full = len(buf) // self.batch_size * self.batch_size
+                        for i in range(0, n_full, self.batch_size):
+                            yield collate(buf[i:i + self.batch_size])
+                        buf = buf[n_full:]
+            rng.shuffle(buf)
+            for i in range(0, len(buf), self.batch_size):
+                yield collate(buf[i:i + self.batch_size])
+        finally:
+            if cache is not None:
+                cache.close()
+
+def _worker_init(_):
+    # workers only parse PGN and run numpy; leave the cores to the training step
+    torch.set_num_threads(1)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Train ValuePolicyNet offline from PGN collections")
+    p.add_argument("pgn", nargs="+", help="PGN files with [%%eval] comments")
+    p.add_argument("--model", default="models/nn/checkpoints/latest.ckpt")
+    p.add_argument("--optimizer", default="models/nn/optimizer_state/latest.opt")
+    p.add_argument("--fresh", action="store_true", help="Ignore existing checkpoints")
+    p.add_argument("--batch-size", type=int, default=1024)
+    p.add_argument("--shuffle-buffer", type=int, default=65536, help="Samples shuffled together per worker")
+    p.add_argument("--workers", type=int, default=max(0, (os.cpu_count() or 1) - 1),
+                   help="PGN parsing processes (0 = parse in the training process)")
+    p.add_argument("--threads", type=int, default=None, help="torch intra-op threads for training")
+    p.add_argument("--lr", type=float, default=1e-3)
+    p.add_argument("--epochs", type=int, default=1)
+    p.add_argument("--max-steps", type=int, default=None)
+    p.add_argument("--checkpoint-every", type=int, default=500, help="Optimizer steps between checkpoints")
+    p.add_argument("--log-every", type=int, default=50)
+    p.add_argument("--store", default=None, help="EvalCache directory for positions without [%%eval]")
+    p.add_argument("--engine-key", default=None, help="Engine key of the store entries to use")
+    p.add_argument("--min-depth", type=int, default=12, help="Shallowest store entry accepted")
+    p.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    return p.parse_args(argv)
+
+def train(args) -> dict:
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device(args.device)
+    model = ValuePolicyNet(in_channels=18).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    if not args.fresh and os.path.exists(args.model):
+        try:
+            if load_compatible(model, torch.load(args.model, map_location=device)) \
+                    and os.path.exists(args.optimizer):
+                optimizer.load_state_dict(torch.load(args.optimizer, map_location=device))
+        except Exception:
+            pass
+    for path in (args.model, args.optimizer):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    dataset = PGNPositionDataset(args.pgn, batch_size=args.batch_size, shuffle_buffer=args.shuffle_buffer,
+                                 store=args.store, engine_key=args.engine_key, min_depth=args.min_depth)
+    loader = DataLoader(dataset, batch_size=None, num_workers=args.workers,
+                        worker_init_fn=_worker_init if args.workers else None,
+                        prefetch_factor=4 if args.workers else None,
+                        pin_memory=device.type == "cuda")
+
+    def checkpoint():
+        save_atomic(model.state_dict(), args.model)
+        save_atomic(optimizer.state_dict(), args.optimizer)
+
+    steps = positions = 0
+    loss_sum = 0.0
+    t0 = t_log = time.perf_counter()
+    pos_log = 0
+    model.train()
+    done = False
+    for _ in range(args.epochs):
+        for X, V, P in loader:
+            X, V, P = (t.to(device, non_blocking=True) for t in (X, V, P))
+            v_pred, p_logits = model(X)
+            loss = torch.mean((v_pred - V) ** 2) + 0.1 * policy_loss(p_logits, P)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+            steps += 1
+            positions += X.shape[0]
+            loss_sum += loss.item()
+            if steps % args.log_every == 0:
+                now = time.perf_counter()
+                print(f"step {steps}: loss {loss_sum / args.log_every:.4f}, "
+                      f"{(positions - pos_log) / (now - t_log):,.0f} pos/s")
+                loss_sum, t_log, pos_log = 0.0, now, positions
+            if steps % args.checkpoint_every == 0:
+                checkpoint()
+            if args.max_steps and steps >= args.max_steps:
+                done = True
+                break
+        if done:
+            break
+    if steps:
+        checkpoint()
+    dt = time.perf_counter() - t0
+    stats = {"steps": steps, "positions": positions, "seconds": dt,
+             "positions_per_s": positions / dt if dt > 0 else 0.0}
+    print(f"Done: {positions:,} positions in {steps} steps, {dt:.1f}s "
+          f"({stats['positions_per_s']:,.0f} pos/s)")
+    return stats
+
+def main(argv=None) -> int:
+    train(parse_args(argv))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
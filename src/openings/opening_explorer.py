@@ -1,11 +1,14 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional
 import json
 
 import chess
+import chess.polyglot
 from . import pgn_loader
+from .stats_db import MoveStats, StatsDB
+from src.utils.logging_utils import profiled
 from .embedded_openings import OPENINGS as EMBEDDED
 
 @dataclass
@@ -14,14 +17,68 @@ class OpeningMatch:
     name: str
     matched_moves: int
 
+@dataclass
+class _TrieNode:
+    children: Dict[str, "_TrieNode"] = field(default_factory=dict)   # keyed by UCI
+    entry: Optional[OpeningMatch] = None   # set if a book line ends exactly here
+
+@dataclass
+class BookCursor:
+    """
+    Position of a game inside the opening trie.
+    `node` is None once the game has left the book; `match` keeps the
+    longest named prefix seen so far.
+    """
+    node: Optional[_TrieNode]
+    match: Optional[OpeningMatch]
+
 class OpeningExplorer:
     """
-    Opening identification via longest-prefix match on SAN sequences.
+    Opening identification in three steps, most specific first:
+      1. the game's exact move order ends on a named book line (trie);
+      2. the current position is a named book position, reached by any move
+         order (one Zobrist-hash lookup, independent of book size);
+      3. longest named prefix of the game's move order (trie).
     Loads (a) embedded Python dict and (b) optional JSON/PGN books.
+    With a statistics database (see stats_db), move_stats() gives per-move
+    game counts and results for any position.
     """
-    def __init__(self, eco_json_path: Optional[str] = "data/openings/eco_small.json"):
-        self.trie: Dict[Tuple[str, ...], Tuple[str, str]] = dict(EMBEDDED)
+    def __init__(self, eco_json_path: Optional[str] = "data/openings/eco_small.json",
+                 stats_path: Optional[str] = None):
+        self.trie = _TrieNode()
+        self.stats: Optional[StatsDB] = None
+        # polyglot Zobrist hash of a book position -> its name. The hash ignores
+        # the move clocks, so it is effectively keyed by the position's EPD.
+        self.positions: Dict[int, OpeningMatch] = {}
+        for key, (eco, name) in EMBEDDED.items():
+            self._add_line(key, eco, name)
         self._maybe_load_json(eco_json_path)
+        if stats_path:
+            self.load_stats(stats_path)
+
+    def _add_line(self, san_moves: Iterable[str], eco: str, name: str) -> bool:
+        """Compile and insert a SAN line. Illegal lines are skipped."""
+        line = pgn_loader.compile_line(san_moves, eco, name)
+        if line is None:
+            return False
+        self._insert(line)
+        return True
+
+    def _insert(self, line: pgn_loader.BookLine):
+        """
+        Insert a compiled line into the trie and the position index. The first
+        book to name a line or position wins, mirroring the old dict.setdefault.
+        """
+        node = self.trie
+        for uci in line.uci:
+            child = node.children.get(uci)
+            if child is None:
+                child = node.children[uci] = _TrieNode()
+            node = child
+        match = OpeningMatch(eco=line.eco, name=line.name, matched_moves=len(line.uci))
+        if node.entry is None:
+            node.entry = match
+        self.positions.setdefault(line.key, match)
 
     def _maybe_load_json(self, path: Optional[str]):
         if not path:
@@ -31,29 +88,81 @@ class OpeningExplorer:
             try:
                 data = json.loads(p.read_text(encoding="utf-8"))
                 for seq, (eco, name) in data.items():
-                    key = tuple(seq.split())
-                    self.trie.setdefault(key, (eco, name))
+                    self._add_line(seq.split(), eco, name)
             except Exception:
                 pass
 
-    def load_eco_pgn(self, eco_pgn: str):
-        for key, (eco, name) in pgn_loader.iter_opening_tuples(eco_pgn):
-            self.trie.setdefault(key, (eco, name))
+    def load_eco_pgn(self, eco_pgn: str, cache_dir: Optional[str] = "data/cache"):
+        for line in pgn_loader.load_book(eco_pgn, cache_dir=cache_dir):
+            self._insert(line)
+
+    def load_stats(self, path: str) -> bool:
+        """Attach a statistics database; False if `path` holds none."""
+        try:
+            self.stats = StatsDB(path)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    @profiled("opening.stats")
+    def move_stats(self, board: chess.Board) -> List[MoveStats]:
+        """Moves played from `board` in the statistics database, most played first."""
+        if self.stats is None:
+            return []
+        return self.stats.move_stats(board)
+
+    def iter_positions(self, max_ply: Optional[int] = None) -> Iterator[chess.Board]:
+        """
+        Every position on a book line (depth-first, root included) down to
+        `max_ply` half-moves. Yields independent copies without move stacks.
+        """
+        board = chess.Board()
+        stack = [(self.trie, 0, iter(self.trie.children.items()))]
+        yield board.copy(stack=False)
+        while stack:
+            node, ply, children = stack[-1]
+            nxt = next(children, None) if max_ply is None or ply < max_ply else None
+            if nxt is None:
+                stack.pop()
+                if board.move_stack:
+                    board.pop()
+                continue
+            uci, child = nxt
+            board.push(chess.Move.from_uci(uci))
+            yield board.copy(stack=False)
+            stack.append((child, ply + 1, iter(child.children.items())))
+
+    def start(self) -> BookCursor:
+        """Cursor for the initial position."""
+        return BookCursor(node=self.trie, match=None)
+
+    def advance(self, cursor: BookCursor, move: chess.Move) -> BookCursor:
+        """
+        Incremental descent: O(1) per move. Callers that track a game ply by
+        ply keep one cursor per ply instead of replaying the move stack.
+        """
+        if cursor.node is None:
+            return cursor
+        child = cursor.node.children.get(move.uci())
+        if child is None:
+            return BookCursor(node=None, match=cursor.match)
+        return BookCursor(node=child, match=child.entry or cursor.match)
+
+    @profiled("opening.lookup")
+    def lookup(self, cursor: BookCursor, board: chess.Board) -> Optional[OpeningMatch]:
+        """
+        Name the position `board`, given the cursor that tracked its move stack.
+        Costs at most one hash lookup on top of the cursor.
+        """
+        if cursor.node is not None and cursor.node.entry is not None:
+            return cursor.node.entry
+        hit = self.positions.get(chess.polyglot.zobrist_hash(board))
+        return hit or cursor.match
 
     def identify(self, board: chess.Board) -> Optional[OpeningMatch]:
-        san_moves: List[str] = []
-        tmp = chess.Board()
+        cursor = self.start()
         for mv in board.move_stack:
-            san_moves.append(tmp.san(mv))
-            tmp.push(mv)
-
-        best: Optional[Tuple[str, str, int]] = None
-        for key, (eco, name) in self.trie.items():
-            L = len(key)
-            if tuple(san_moves[:L]) == key:
-                if best is None or L > best[2]:
-                    best = (eco, name, L)
-        if best:
-            eco, name, L = best
-            return OpeningMatch(eco=eco, name=name, matched_moves=L)
-        return None
+            cursor = self.advance(cursor, mv)
+            if cursor.node is None:
+                break
+        return self.lookup(cursor, board)
@@ -0,0 +1,214 @@
+"""
+Streaming loader for ECO / Lichess-style opening PGNs.
+
+Each game in the file is one book line: its ECO/Opening headers name the
+mainline. Games are read one at a time, so memory stays flat however large
+the file is, and games without naming headers are skipped at the header
+stage without parsing their movetext.
+
+Compiled lines (SAN, UCI and the polyglot hash of the final position) are
+cached next to the other runtime caches, keyed by the source file's
+mtime/size and content hash, so later startups skip PGN parsing entirely.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import os
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+CACHE_VERSION = 1
+
+@dataclass
+class BookLine:
+    san: Tuple[str, ...]
+    uci: Tuple[str, ...]
+    eco: str
+    name: str
+    key: int          # polyglot Zobrist hash of the position the line ends in
+
+def compile_line(san_moves: Iterable[str], eco: str, name: str) -> Optional[BookLine]:
+    """Replay a SAN line from the initial position; None if it is illegal or empty."""
+    tmp = chess.Board()
+    sans: List[str] = []
+    ucis: List[str] = []
+    try:
+        for san in san_moves:
+            mv = tmp.parse_san(san)
+            sans.append(tmp.san(mv))
+            ucis.append(mv.uci())
+            tmp.push(mv)
+    except ValueError:
+        return None
+    if not ucis:
+        return None
+    return BookLine(san=tuple(sans), uci=tuple(ucis), eco=eco, name=name,
+                    key=chess.polyglot.zobrist_hash(tmp))
+
+class _BookLineVisitor(chess.pgn.BaseVisitor):
+    """
+    Collects the mainline of one game. Returns [] for games that do not name
+    an opening or start from a custom FEN, [BookLine] otherwise.
+    """
+    def begin_game(self):
+        self.headers = {}
+        self.sans: List[str] = []
+        self.ucis: List[str] = []
+        self.board: Optional[chess.Board] = None
+        self.skipped = False
+
+    def visit_header(self, tagname: str, tagvalue: str):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        h = self.headers
+        if "FEN" in h or not (h.get("ECO") or h.get("Opening")):
+            self.skipped = True
+            return chess.pgn.SKIP
+        return None
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        self.sans.append(board.san(move))
+        self.ucis.append(move.uci())
+
+    def visit_board(self, board: chess.Board):
+        self.board = board
+
+    def handle_error(self, error: Exception):
+        # a broken line is dropped rather than aborting the whole book
+        self.skipped = True
+
+    def result(self) -> List[BookLine]:
+        if self.skipped or not self.ucis or self.board is None:
+            return []
+        h = self.headers
+        name = h.get("Opening") or "?"
+        if h.get("Variation"):
+            name = f"{name}: {h['Variation']}"
+        return [BookLine(san=tuple(self.sans), uci=tuple(self.ucis),
+                         eco=h.get("ECO") or "?", name=name,
+                         key=chess.polyglot.zobrist_hash(self.board))]
+
+def shard_offsets(path: str, n: int) -> List[int]:
+    """
+    n + 1 byte offsets cutting `path` into n ranges that each start at a game
+    (a '[' header line after a blank line, or the start of the file).
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as fh:
+        for k in range(1, n):
+            start = max(size * k // n, offsets[-1])
+            fh.seek(start)
+            fh.readline()                  # finish the partial line we landed in
+            prev_blank = False
+            while True:
+                pos = fh.tell()
+                line = fh.readline()
+                if not line:
+                    pos = size
+                    break
+                if prev_blank and line.startswith(b"["):
+                    break
+                prev_blank = not line.strip()
+            offsets.append(pos)
+    offsets.append(size)
+    return offsets
+
+class RangeReader:
+    """The readline() chess.pgn.read_game needs, over bytes [start, end) of a file."""
+    def __init__(self, fh, start: int, end: int):
+        fh.seek(start)
+        self._fh = fh
+        self._left = end - start
+
+    def readline(self) -> str:
+        if self._left <= 0:
+            return ""
+        line = self._fh.readline(self._left)
+        self._left -= len(line)
+        return line.decode("utf-8", errors="replace")
+
+def iter_book_lines(pgn_path: str) -> Iterator[BookLine]:
+    """Stream compiled book lines from a PGN file, one game at a time."""
+    with open(pgn_path, encoding="utf-8", errors="replace") as f:
+        while True:
+            got = chess.pgn.read_game(f, Visitor=_BookLineVisitor)
+            if got is None:
+                break
+            yield from got
+
+def iter_opening_tuples(pgn_path: str) -> Iterator[Tuple[Tuple[str, ...], Tuple[str, str]]]:
+    """Yields (san_tuple, (eco, name)) for every named game in the PGN."""
+    for line in iter_book_lines(pgn_path):
+        yield line.san, (line.eco, line.name)
+
+def _file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cache_path(src: Path, cache_dir: str) -> Path:
+    tag = hashlib.sha1(str(src.resolve()).encode("utf-8")).hexdigest()[:10]
+    return Path(cache_dir) / f"{src.stem}.{tag}.book.json"
+
+def _write_cache(cpath: Path, payload: dict):
+    try:
+        os.makedirs(cpath.parent, exist_ok=True)
+        tmp = cpath.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, cpath)
+    except OSError:
+        pass
+
+def load_book(pgn_path: str, cache_dir: Optional[str] = "data/cache") -> List[BookLine]:
+    """
+    Compiled book lines for `pgn_path`, served from the on-disk cache when the
+    source is unchanged. mtime/size is checked first; if only the mtime moved
+    the content hash decides. Pass cache_dir=None to always parse.
+    """
+    src = Path(pgn_path)
+    if not cache_dir:
+        return list(iter_book_lines(pgn_path))
+    st = src.stat()
+    cpath = _cache_path(src, cache_dir)
+    meta = None
+    if cpath.exists():
+        try:
+            meta = json.loads(cpath.read_text(encoding="utf-8"))
+            if meta.get("version") != CACHE_VERSION:
+                meta = None
+        except Exception:
+            meta = None
+
+    if meta is not None:
+        fresh = meta["mtime_ns"] == st.st_mtime_ns and meta["size"] == st.st_size
+        if not fresh and meta["sha1"] == _file_sha1(src):
+            # touched but unchanged: remember the new mtime, keep the lines
+            meta["mtime_ns"], meta["size"] = st.st_mtime_ns, st.st_size
+            _write_cache(cpath, meta)
+            fresh = True
+        if fresh:
+            return [BookLine(san=tuple(s.split()), uci=tuple(u.split()), eco=eco, name=name, key=key)
+                    for s, u, eco, name, key in meta["lines"]]
+
+    lines = list(iter_book_lines(pgn_path))
+    _write_cache(cpath, {
+        "version": CACHE_VERSION,
+        "source": str(src),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha1": _file_sha1(src),
+        "lines": [[" ".join(l.san), " ".join(l.uci), l.eco, l.name, l.key] for l in lines],
+    })
+    return lines
@@ -0,0 +1,302 @@
+"""
+Opening explorer statistics: for every (position, move) seen in a game
+collection, how often it was played, the White/draw/Black results and the
+players' average rating.
+
+A database is a directory of two memory-mapped arrays sorted by
+(position hash, move):
+
+  keys.npy    uint64 polyglot Zobrist hash of the position
+  stats.npy   move, white, draws, black, rated, rating_sum per row
+
+so a query is two binary searches plus one contiguous slice. Ingestion
+streams PGNs (only the first `max_ply` half-moves of each mainline are
+parsed), aggregates in vectorized chunks, and runs one process per byte
+range of each file. Each process writes a shard, and shards, like whole
+databases, are combined with merge().
+
+    python -m src.openings.stats_db build games.pgn --out data/cache/explorer --workers 4
+    python -m src.openings.stats_db merge db1 db2 --out data/cache/explorer
+    python -m src.openings.stats_db query data/cache/explorer --fen "<FEN>"
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import shutil
+import time
+
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+
+from .pgn_loader import RangeReader, shard_offsets
+
+FORMAT_VERSION = 1
+STATS_DTYPE = np.dtype([("move", "<u2"), ("white", "<u4"), ("draws", "<u4"), ("black", "<u4"),
+                        ("rated", "<u4"), ("rating_sum", "<u8")])
+_COUNTS = ("white", "draws", "black", "rated", "rating_sum")
+_RESULTS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+def encode_move(move: chess.Move) -> int:
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+def decode_move(code: int) -> chess.Move:
+    return chess.Move(code & 63, (code >> 6) & 63, promotion=(code >> 12) or None)
+
+@dataclass
+class MoveStats:
+    move: chess.Move
+    white: int
+    draws: int
+    black: int
+    avg_rating: Optional[float]     # None if no game had ratings
+
+    @property
+    def games(self) -> int:
+        return self.white + self.draws + self.black
+
+    def percentages(self) -> Tuple[float, float, float]:
+        """(white, draw, black) in percent."""
+        n = self.games or 1
+        return 100.0 * self.white / n, 100.0 * self.draws / n, 100.0 * self.black / n
+
+# --- ingestion ---------------------------------------------------------------
+
+class _GameVisitor(chess.pgn.BaseVisitor):
+    """
+    (key, move) pairs of the first `max_ply` mainline moves of a finished
+    standard game. Later moves are not parsed: parse_san hands back null moves.
+    """
+    def __init__(self, max_ply: int):
+        self.max_ply = max_ply
+
+    def begin_game(self):
+        self.headers = {}
+        self.pairs: List[Tuple[int, int]] = []
+        self.ply = 0
+
+    def visit_header(self, tagname: str, tagvalue: str):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        h = self.headers
+        if h.get("Result") not in _RESULTS or "FEN" in h or h.get("Variant", "Standard") != "Standard":
+            return chess.pgn.SKIP
+        return None
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def parse_san(self, board: chess.Board, san: str) -> chess.Move:
+        if self.ply >= self.max_ply:
+            return chess.Move.null()
+        return board.parse_san(san)
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        if self.ply < self.max_ply:
+            self.pairs.append((chess.polyglot.zobrist_hash(board), encode_move(move)))
+        self.ply += 1
+
+    def handle_error(self, error: Exception):
+        # keep the moves read so far; a broken game must not stop ingestion
+        self.ply = self.max_ply
+
+    def result(self) -> Tuple[Optional[int], int, List[Tuple[int, int]]]:
+        h = self.headers
+        rating = 0
+        try:
+            rating = (int(h["WhiteElo"]) + int(h["BlackElo"])) // 2
+        except (KeyError, ValueError):
+            pass
+        return _RESULTS.get(h.get("Result")), min(max(rating, 0), 65535), self.pairs
+
+def _aggregate(keys: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum rows sharing (key, move); the result is sorted by (key, move)."""
+    order = np.lexsort((rows["move"], keys))
+    keys, rows = keys[order], rows[order]
+    if not len(keys):
+        return keys, rows
+    new = np.empty(len(keys), dtype=bool)
+    new[0] = True
+    new[1:] = (keys[1:] != keys[:-1]) | (rows["move"][1:] != rows["move"][:-1])
+    starts = np.flatnonzero(new)
+    out = np.zeros(len(starts), dtype=STATS_DTYPE)
+    out["move"] = rows["move"][starts]
+    for col in _COUNTS:
+        out[col] = np.add.reduceat(rows[col], starts)
+    return keys[starts], out
+
+class StatsBuilder:
+    """Accumulates games; every `chunk` moves the raw rows are aggregated."""
+    def __init__(self, max_ply: int = 30, chunk: int = 1 << 20):
+        self.max_ply = max_ply
+        self.chunk = chunk
+        self.games = 0
+        self._keys: List[int] = []
+        self._raw: List[Tuple[int, int, int, int, int, int]] = []
+        self._tables: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def add_game(self, result: int, rating: int, pairs: Sequence[Tuple[int, int]]):
+        counts = [0, 0, 0]
+        counts[result] = 1
+        rated = 1 if rating else 0
+        for key, move in pairs:
+            self._keys.append(key)
+            self._raw.append((move, counts[0], counts[1], counts[2], rated, rating))
+        self.games += 1
+        if len(self._keys) >= self.chunk:
+            self._flush()
+
+    def add_pgn(self, path: str, start: int = 0, end: Optional[int] = None):
+        end = os.path.getsize(path) if end is None else end
+        with open(path, "rb") as fh:
+            reader = RangeReader(fh, start, end)
+            while True:
+                got = chess.pgn.read_game(reader, Visitor=lambda: _GameVisitor(self.max_ply))
+                if got is None:
+                    break
+                result, rating, pairs = got
+                if result is not None and pairs:
+                    self.add_game(result, rating, pairs)
+
+    def _flush(self):
+        if self._keys:
+            keys = np.array(self._keys, dtype=np.uint64)
+            rows = np.array(self._raw, dtype=STATS_DTYPE)
+            self._tables.append(_aggregate(keys, rows))
+            self._keys, self._raw = [], []
+
+    def table(self) -> Tuple[np.ndarray, np.ndarray]:
+        self._flush()
+        return merge_tables(self._tables)
+
+def merge_tables(tables: Sequence[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not tables:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=STATS_DTYPE)
+    keys = np.concatenate([np.asarray(k) for k, _ in tables])
+    rows = np.concatenate([np.asarray(r) for _, r in tables])
+    return _aggregate(keys, rows)
+
+def save(out: str, keys: np.ndarray, rows: np.ndarray, games: int, max_ply: int):
+    os.makedirs(out, exist_ok=True)
+    for name, arr in (("keys", keys), ("stats", rows)):
+        tmp = os.path.join(out, f"{name}.tmp.npy")
+        np.save(tmp, arr)
+        os.replace(tmp, os.path.join(out, f"{name}.npy"))
+    with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": FORMAT_VERSION, "games": games, "max_ply": max_ply, "rows": len(keys)}, f)
+
+def _build_shard(task) -> Tuple[str, int]:
+    path, start, end, out, max_ply = task
+    builder = StatsBuilder(max_ply=max_ply)
+    builder.add_pgn(path, start, end)
+    save(out, *builder.table(), games=builder.games, max_ply=max_ply)
+    return out, builder.games
+
+def build(paths: Sequence[str], out: str, workers: int = 1, max_ply: int = 30) -> int:
+    """Build a database from PGN files; returns the number of games ingested."""
+    workers = max(1, workers)
+    tasks = []
+    for i, path in enumerate(paths):
+        offsets = shard_offsets(path, workers)
+        for j in range(workers):
+            if offsets[j] < offsets[j + 1]:
+                tasks.append((path, offsets[j], offsets[j + 1],
+                              os.path.join(out + ".shards", f"{i:04d}-{j:04d}"), max_ply))
+    if workers == 1:
+        shards = [_build_shard(t) for t in tasks]
+    else:
+        with Pool(workers) as pool:
+            shards = list(pool.imap_unordered(_build_shard, tasks))
+    games = merge([s for s, _ in shards], out)
+    shutil.rmtree(out + ".shards", ignore_errors=True)
+    return games
+
+def merge(dbs: Sequence[str], out: str) -> int:
+    """Combine databases (or shards) into `out`; returns the total game count."""
+    opened = [StatsDB(p) for p in dbs]
+    keys, rows = merge_tables([(db.keys, db.stats) for db in opened])
+    games = sum(db.games for db in opened)
+    max_ply = max((db.max_ply for db in opened), default=0)
+    del opened
+    save(out, keys, rows, games=games, max_ply=max_ply)
+    return games
+
+# --- queries -----------------------------------------------------------------
+
+class StatsDB:
+    """Read-only, memory-mapped view of a database directory."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported explorer format {meta.get('version')}")
+        self.games = meta["games"]
+        self.max_ply = meta["max_ply"]
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.stats = np.load(os.path.join(path, "stats.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def rows(self, key: int) -> np.ndarray:
+        k = np.uint64(key)
+        lo = int(np.searchsorted(self.keys, k, "left"))
+        hi = int(np.searchsorted(self.keys, k, "right"))
+        return self.stats[lo:hi]
+
+    def move_stats(self, board: chess.Board) -> List[MoveStats]:
+        """Per-move statistics of `board`, most played first."""
+        out = []
+        for r in self.rows(chess.polyglot.zobrist_hash(board)):
+            rated = int(r["rated"])
+            out.append(MoveStats(move=decode_move(int(r["move"])), white=int(r["white"]),
+                                 draws=int(r["draws"]), black=int(r["black"]),
+                                 avg_rating=int(r["rating_sum"]) / rated if rated else None))
+        out.sort(key=lambda s: s.games, reverse=True)
+        return out
+
+def format_stats(board: chess.Board, stats: Sequence[MoveStats], limit: int = 5) -> Iterator[str]:
+    for s in stats[:limit]:
+        w, d, b = s.percentages()
+        rating = f"  ⌀{s.avg_rating:.0f}" if s.avg_rating is not None else ""
+        yield f"{board.san(s.move):<7} {s.games:>8,} games  {w:5.1f}% / {d:5.1f}% / {b:5.1f}%{rating}"
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Opening explorer statistics database")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Ingest PGN files")
+    b.add_argument("pgn", nargs="+")
+    b.add_argument("--out", default="data/cache/explorer")
+    b.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    b.add_argument("--max-ply", type=int, default=30, help="Half-moves per game to index")
+    m = sub.add_parser("merge", help="Combine databases")
+    m.add_argument("db", nargs="+")
+    m.add_argument("--out", required=True)
+    q = sub.add_parser("query", help="Show the statistics of a position")
+    q.add_argument("db")
+    q.add_argument("--fen", default=chess.STARTING_FEN)
+    args = p.parse_args(argv)
+
+    if args.cmd == "query":
+        board = chess.Board(args.fen)
+        for line in format_stats(board, StatsDB(args.db).move_stats(board), limit=20):
+            print(line)
+        return 0
+    t0 = time.perf_counter()
+    if args.cmd == "build":
+        games = build(args.pgn, args.out, workers=args.workers, max_ply=args.max_ply)
+    else:
+        games = merge(args.db, args.out)
+    dt = time.perf_counter() - t0
+    print(f"{games:,} games -> {args.out} in {dt:.1f}s ({games / dt if dt > 0 else 0:,.0f} games/s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
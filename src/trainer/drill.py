@@ -0,0 +1,269 @@
+"""
+Repertoire drills with spaced repetition.
+
+The repertoire PGN, variations included, is compiled into a graph keyed by
+the polyglot hash of each position: every position maps to the repertoire
+moves played from it. Positions where the trainee is to move are drilled
+on an SM-2 schedule, kept per position in a small structured .npy file.
+Known moves are answered from the graph alone; the engine is asked only
+when the trainee deviates, to say how much the deviation costs.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+import os
+import sys
+import time
+
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+
+from src.engine.engine_wrapper import EngineLine
+from src.trainer.scoring import cp_loss, line_cp, verdict
+
+STATS_DTYPE = np.dtype([("key", "<u8"), ("due", "<f8"), ("interval", "<f4"),
+                        ("ease", "<f4"), ("reps", "<u2"), ("lapses", "<u2")])
+RELEARN_S = 60.0            # a missed position comes back within the session
+FIRST_INTERVALS_S = (86400.0, 6 * 86400.0)
+
+class Repertoire:
+    """Position-keyed repertoire graph compiled from PGN."""
+    def __init__(self):
+        self.moves: Dict[int, List[chess.Move]] = {}
+        self.fens: Dict[int, str] = {}
+        self.parent: Dict[int, Tuple[int, chess.Move]] = {}   # first way each position was reached
+        self.order: List[int] = []                             # positions in the order first seen
+
+    @classmethod
+    def from_pgn(cls, path: str) -> "Repertoire":
+        rep = cls()
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while chess.pgn.read_game(f, Visitor=lambda: _RepertoireVisitor(rep)) is not None:
+                pass
+        return rep
+
+    def _node(self, board: chess.Board) -> int:
+        key = chess.polyglot.zobrist_hash(board)
+        if key not in self.fens:
+            self.fens[key] = board.fen()
+            self.moves[key] = []
+            self.order.append(key)
+        return key
+
+    def add(self, board: chess.Board, move: chess.Move):
+        key = self._node(board)
+        if move not in self.moves[key]:
+            self.moves[key].append(move)
+        board.push(move)
+        child = self._node(board)
+        board.pop()
+        if child not in self.parent and child != key:
+            self.parent[child] = (key, move)
+
+    def expected(self, board: chess.Board) -> List[chess.Move]:
+        return self.moves.get(chess.polyglot.zobrist_hash(board), [])
+
+    def board(self, key: int) -> chess.Board:
+        return chess.Board(self.fens[key])
+
+    def path(self, key: int) -> Tuple[chess.Board, List[chess.Move]]:
+        """A start position and the repertoire moves leading from it to `key`."""
+        moves: List[chess.Move] = []
+        seen = {key}
+        while key in self.parent:
+            key, move = self.parent[key]
+            if key in seen:
+                break
+            seen.add(key)
+            moves.append(move)
+        return self.board(key), moves[::-1]
+
+    def drill_positions(self, color: chess.Color) -> List[int]:
+        """Positions with `color` to move and a repertoire answer, in PGN order."""
+        return [k for k in self.order
+                if self.moves[k] and self.fens[k].split()[1] == ("w" if color == chess.WHITE else "b")]
+
+class _RepertoireVisitor(chess.pgn.BaseVisitor):
+    """Adds every move of a game, variations included, to a Repertoire."""
+    def __init__(self, rep: Repertoire):
+        self.rep = rep
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        self.rep.add(board, move)
+
+    def result(self) -> bool:
+        return True
+
+@dataclass
+class CardState:
+    due: float = 0.0            # unix time of the next review
+    interval: float = 0.0       # seconds
+    ease: float = 2.5
+    reps: int = 0               # successful reviews in a row
+    lapses: int = 0
+
+def sm2(state: CardState, quality: int, now: float) -> CardState:
+    """SM-2 update for a review graded 0 (blackout) to 5 (perfect)."""
+    ease = max(1.3, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return CardState(due=now + RELEARN_S, interval=RELEARN_S, ease=ease,
+                         reps=0, lapses=state.lapses + 1)
+    if state.reps < len(FIRST_INTERVALS_S):
+        interval = FIRST_INTERVALS_S[state.reps]
+    else:
+        interval = state.interval * ease
+    return CardState(due=now + interval, interval=interval, ease=ease,
+                     reps=state.reps + 1, lapses=state.lapses)
+
+class DrillStats:
+    """
+    SM-2 state per position, saved as one structured array (28 bytes per
+    position) with an atomic replace.
+    """
+    def __init__(self, path: str = "data/cache/drill_stats.npy"):
+        self.path = path
+        self.cards: Dict[int, CardState] = {}
+        if os.path.exists(path):
+            try:
+                for r in np.load(path):
+                    self.cards[int(r["key"])] = CardState(float(r["due"]), float(r["interval"]),
+                                                         float(r["ease"]), int(r["reps"]), int(r["lapses"]))
+            except (OSError, ValueError, EOFError, KeyError, IndexError) as exc:
+                # keep the history for inspection instead of overwriting it on save()
+                self.cards.clear()
+                aside = f"{path}.bad-{int(time.time())}"
+                os.replace(path, aside)
+                print(f"Could not read drill stats {path} ({exc}); moved it to {aside}, starting afresh.",
+                      file=sys.stderr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+
+    def get(self, key: int) -> Optional[CardState]:
+        return self.cards.get(key)
+
+    def review(self, key: int, quality: int, now: Optional[float] = None) -> CardState:
+        now = time.time() if now is None else now
+        state = self.cards[key] = sm2(self.cards.get(key) or CardState(), quality, now)
+        return state
+
+    def save(self):
+        arr = np.zeros(len(self.cards), dtype=STATS_DTYPE)
+        for i, (key, c) in enumerate(self.cards.items()):
+            arr[i] = (key, c.due, c.interval, c.ease, c.reps, c.lapses)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, self.path)
+
+class DrillScheduler:
+    """
+    Serves the most overdue drill position, then unseen ones (at most
+    `new_limit` per session) in repertoire order. Reviews are O(log n).
+    """
+    def __init__(self, rep: Repertoire, stats: DrillStats, color: chess.Color, new_limit: int = 20):
+        self.rep = rep
+        self.stats = stats
+        self.new_limit = new_limit
+        self._heap: List[Tuple[float, int]] = []
+        self._new: List[int] = []
+        for key in rep.drill_positions(color):
+            card = stats.get(key)
+            if card is None:
+                self._new.append(key)
+            else:
+                self._heap.append((card.due, key))
+        heapq.heapify(self._heap)
+        self._new.reverse()         # pop() from the end keeps repertoire order
+
+    def next(self, now: Optional[float] = None) -> Optional[int]:
+        now = time.time() if now is None else now
+        while self._heap:
+            due, key = self._heap[0]
+            card = self.stats.get(key)
+            if card is None or card.due != due:     # superseded by a later review
+                heapq.heappop(self._heap)
+                continue
+            if due <= now:
+                return key
+            break
+        if self._new and self.new_limit > 0:
+            return self._new[-1]
+        return None
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def review(self, key: int, quality: int, now: Optional[float] = None) -> CardState:
+        if self._new and self._new[-1] == key:
+            self._new.pop()
+            self.new_limit -= 1
+        card = self.stats.review(key, quality, now)
+        heapq.heappush(self._heap, (card.due, key))
+        return card
+
+def run_drill(rep: Repertoire, stats: DrillStats, color: chess.Color, blind: bool = False,
+              analyse: Optional[Callable[..., List[EngineLine]]] = None,
+              ask: Callable[[str], str] = input) -> int:
+    """
+    Interactive drill loop; returns the number of positions reviewed.
+    `analyse(board, root_moves=None)` (best line first) is called only for
+    moves outside the repertoire.
+    """
+    sched = DrillScheduler(rep, stats, color)
+    reviewed = 0
+    while True:
+        key = sched.next()
+        if key is None:
+            nxt = sched.next_due()
+            print("Nothing due." + (f" Next review in {max(0, nxt - time.time()) / 60:.0f} min." if nxt else ""))
+            return reviewed
+        start, path = rep.path(key)
+        board = rep.board(key)
+        print("\n" + (start.variation_san(path) if path else "(start position)"))
+        if not blind:
+            print(board)
+        expected = rep.expected(board)
+        t0 = time.perf_counter()
+        cmd = ask("Your move (SAN/show/quit): ").strip()
+        if cmd.lower() in ("quit", "q"):
+            return reviewed
+        answer = ", ".join(board.san(m) for m in expected)
+        if cmd.lower() == "show":
+            print("Repertoire:", answer)
+            sched.review(key, 1)
+            reviewed += 1
+            continue
+        try:
+            move = board.parse_san(cmd)
+        except ValueError:
+            print("Invalid SAN.")
+            continue
+        if move in expected:
+            quality = 5 if time.perf_counter() - t0 < 10.0 else 4
+            print(f"✓ Correct — {board.san(move)}")
+        else:
+            quality = 1
+            msg = f"Not in your repertoire (expected {answer})"
+            if analyse is not None:
+                msg += _deviation_cost(board, move, analyse)
+            print(msg)
+        sched.review(key, quality)
+        reviewed += 1
+
+def _deviation_cost(board: chess.Board, move: chess.Move, analyse) -> str:
+    """Scored like the trainer: best line against a search of the played move alone."""
+    before = analyse(board)
+    if not before:
+        return ""
+    played = before[0] if before[0].move == move else (analyse(board, root_moves=[move]) or [None])[0]
+    loss = cp_loss(line_cp(before[0]), line_cp(played))
+    if loss is not None:
+        loss = max(0.0, loss)
+    return f"; engine: {verdict(False, loss)}" + (f", Δcp ≈ {loss:.0f}" if loss is not None else "")
@@ -0,0 +1,84 @@
+"""
+Pre-analyse every opening-book and repertoire position before training.
+
+Walks the embedded book, eco_small.json, the ECO PGN and the repertoire PGN
+(variations included) down to --max-ply, deduplicates positions by EPD and
+analyses them on an EnginePool. Results go into the same EvalCache store the
+trainer opens, so EngineWrapper serves them without touching the engine.
+
+Each result is committed to the store as soon as it arrives and positions
+already stored at the requested depth/MultiPV are skipped, so an interrupted
+run simply continues where it stopped when started again.
+
+    python -m src.trainer.precompute_cli --engine stockfish --depth 16 --max-ply 12
+"""
+from __future__ import annotations
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import chess
+from tqdm import tqdm
+
+from src.config import load_env_default
+from src.engine.engine_pool import EnginePool
+from src.engine.eval_cache import EvalCache
+from src.openings.opening_explorer import OpeningExplorer
+from src.utils.pgn_utils import iter_pgn_games, iter_tree_positions
+
+def collect_positions(max_ply: int, eco_json: Optional[str], eco_pgn: Optional[str],
+                      repertoire: Optional[str]) -> Dict[str, chess.Board]:
+    """Unique positions (keyed by EPD) from every configured book source."""
+    explorer = OpeningExplorer(eco_json)
+    if eco_pgn and Path(eco_pgn).exists():
+        explorer.load_eco_pgn(eco_pgn)
+    positions: Dict[str, chess.Board] = {}
+    for board in explorer.iter_positions(max_ply):
+        positions.setdefault(board.epd(), board)
+    if repertoire and Path(repertoire).exists():
+        for game in iter_pgn_games(repertoire):
+            for board in iter_tree_positions(game, max_ply):
+                positions.setdefault(board.epd(), board)
+    return {epd: b for epd, b in positions.items() if not b.is_game_over()}
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Precompute engine analysis for opening books")
+    p.add_argument("--engine", default=load_env_default("ENGINE_PATH", "stockfish"))
+    p.add_argument("--depth", type=int, default=int(load_env_default("ENGINE_DEPTH", 16)))
+    p.add_argument("--multipv", type=int, default=int(load_env_default("ENGINE_MULTIPV", 3)))
+    p.add_argument("--max-ply", type=int, default=12, help="How deep to walk each book line (half-moves)")
+    p.add_argument("--workers", type=int, default=None, help="Engine processes (default: one per core)")
+    p.add_argument("--hash-total", type=int, default=1024, help="Total engine hash in MB, split across workers")
+    p.add_argument("--store", default=load_env_default("EVAL_CACHE", "data/cache/evals.lmdb"),
+                   help="EvalCache LMDB directory (the trainer reads the same one)")
+    p.add_argument("--eco-json", default="data/openings/eco_small.json")
+    p.add_argument("--eco-pgn", default="data/openings/eco_full.pgn")
+    p.add_argument("--repertoire", default="data/repertoire/my_repertoire.pgn")
+    return p.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    positions = collect_positions(args.max_ply, args.eco_json, args.eco_pgn, args.repertoire)
+    print(f"{len(positions)} unique positions up to ply {args.max_ply}")
+
+    t0 = time.perf_counter()
+    analysed = failed = 0
+    with EvalCache(args.store) as cache, \
+            EnginePool(args.engine, size=args.workers, depth=args.depth, multipv=args.multipv,
+                       hash_total_mb=args.hash_total, cache=cache) as pool:
+        key = pool.engine_key
+        todo = [b for b in positions.values() if cache.get(key, b, args.depth, args.multipv) is None]
+        print(f"{len(positions) - len(todo)} already in {args.store}, {len(todo)} to analyse "
+              f"on {pool.size} engine(s)")
+        for res in tqdm(pool.imap(todo, ordered=False), total=len(todo), unit="pos"):
+            if res.error:
+                failed += 1
+            else:
+                analysed += 1
+    dt = time.perf_counter() - t0
+    print(f"Done: {analysed} analysed, {failed} failed in {dt:.1f}s")
+    return 0 if failed == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+"""
+Review saved games after play.
+
+Every mainline position of every game is collected first, deduplicated by
+EPD (sessions share their opening positions), and analysed at once on an
+EnginePool with the shared EvalCache, so positions analysed before cost
+nothing and a whole game takes about as long as its slowest positions
+spread over the engines. Each move then gets the trainer's cp_loss/verdict,
+each side an average centipawn loss, and each game the first move that
+left the opening book.
+
+    python -m src.trainer.review_cli session_*.pgn --depth 16 --workers 8
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import chess
+import chess.pgn
+
+from src.config import load_env_default
+from src.engine.engine_pool import EnginePool
+from src.engine.engine_wrapper import EngineLine
+from src.engine.eval_cache import EvalCache
+from src.openings.opening_explorer import OpeningExplorer
+from src.trainer.scoring import MATE_CP, cp_loss, line_cp, verdict
+from src.utils.pgn_utils import iter_pgn_games
+
+CP_CLIP = 1000          # losses in lost/won positions are not counted beyond this
+
+@dataclass
+class MoveReview:
+    ply: int
+    san: str
+    best_san: Optional[str]
+    loss: Optional[float]
+    verdict: str
+
+@dataclass
+class GameReview:
+    headers: Dict[str, str]
+    moves: List[MoveReview] = field(default_factory=list)
+    acpl: Dict[bool, Optional[float]] = field(default_factory=dict)   # chess.WHITE/BLACK -> ACPL
+    deviation: Optional[str] = None     # e.g. "5... a6 (book: Nf6, Bc5)"
+
+def _clip(cp: Optional[float]) -> Optional[float]:
+    return None if cp is None else max(-CP_CLIP, min(CP_CLIP, cp))
+
+def game_positions(game: chess.pgn.Game) -> List[chess.Board]:
+    """The mainline positions of `game`, start and final position included."""
+    board = game.board()
+    out = [board.copy(stack=False)]
+    for move in game.mainline_moves():
+        board.push(move)
+        out.append(board.copy(stack=False))
+    return out
+
+def book_deviation(explorer: OpeningExplorer, game: chess.pgn.Game) -> Optional[str]:
+    board = game.board()
+    cursor = explorer.start()
+    for move in game.mainline_moves():
+        nxt = explorer.advance(cursor, move)
+        if nxt.node is None:
+            if cursor.node is None or not cursor.node.children:
+                return None          # the book ended here; nothing was left
+            book = ", ".join(board.san(chess.Move.from_uci(u)) for u in cursor.node.children)
+            dots = "." if board.turn == chess.WHITE else "..."
+            return f"{board.fullmove_number}{dots} {board.san(move)} (book: {book})"
+        cursor = nxt
+        board.push(move)
+    return None
+
+def _after_cp(board: chess.Board, lines: Dict[str, List[EngineLine]]) -> Optional[float]:
+    """Score of the position after a move, for the side that just moved."""
+    if board.is_checkmate():
+        return float(MATE_CP)
+    if board.is_game_over():
+        return 0.0
+    after = lines.get(board.epd())
+    cp = line_cp(after[0]) if after else None
+    return None if cp is None else -cp
+
+def review_game(game: chess.pgn.Game, lines: Dict[str, List[EngineLine]],
+                explorer: Optional[OpeningExplorer] = None) -> GameReview:
+    positions = game_positions(game)
+    review = GameReview(headers=dict(game.headers))
+    losses: Dict[bool, List[float]] = {chess.WHITE: [], chess.BLACK: []}
+    for ply, (before, after, move) in enumerate(zip(positions, positions[1:], game.mainline_moves()), 1):
+        best = (lines.get(before.epd()) or [None])[0]
+        best_cp = _clip(line_cp(best))
+        user_cp = _clip(_after_cp(after, lines))
+        loss = cp_loss(best_cp, user_cp)
+        if loss is not None:
+            loss = max(0.0, loss)
+            losses[before.turn].append(loss)
+        is_best = best is not None and best.move == move
+        review.moves.append(MoveReview(ply=ply, san=before.san(move),
+                                       best_san=before.san(best.move) if best is not None else None,
+                                       loss=loss, verdict=verdict(is_best, loss)))
+    review.acpl = {c: (sum(v) / len(v) if v else None) for c, v in losses.items()}
+    if explorer is not None:
+        review.deviation = book_deviation(explorer, game)
+    return review
+
+def analyse_positions(games: Sequence[chess.pgn.Game], pool: EnginePool) -> Dict[str, List[EngineLine]]:
+    """Lines for every distinct non-terminal position of `games`, keyed by EPD.
+
+    Positions the engine failed on are left out and counted in a warning on stderr.
+    """
+    unique: Dict[str, chess.Board] = {}
+    for game in games:
+        for board in game_positions(game):
+            if not board.is_game_over():
+                unique.setdefault(board.epd(), board)
+    boards = list(unique.values())
+    lines: Dict[str, List[EngineLine]] = {}
+    errors: List[str] = []
+    for res in pool.imap(boards, ordered=False):
+        if res.error is None:
+            lines[boards[res.index].epd()] = res.lines
+        else:
+            errors.append(res.error)
+    if errors:
+        print(f"warning: {len(errors)} of {len(boards)} positions could not be analysed "
+              f"(first error: {errors[0]}); their moves are left unscored", file=sys.stderr)
+    return lines
+
+def format_review(review: GameReview, name: str = "") -> str:
+    h = review.headers
+    acpl = "  ".join(f"{side} ACPL {v:.0f}" if v is not None else f"{side} ACPL –"
+                     for side, v in (("White", review.acpl.get(chess.WHITE)), ("Black", review.acpl.get(chess.BLACK))))
+    out = [f"=== {name}{h.get('White', '?')} vs {h.get('Black', '?')} ({h.get('Result', '*')}) ===", acpl,
+           f"Left book: {review.deviation or 'never (or no book line)'}"]
+    for mv in review.moves:
+        prefix = f"{(mv.ply + 1) // 2}." + ("" if mv.ply % 2 else "..")
+        extra = f"  best {mv.best_san}" if mv.best_san and mv.best_san != mv.san else ""
+        loss = f"  Δcp {mv.loss:.0f}" if mv.loss is not None else ""
+        out.append(f"{prefix:>5} {mv.san:<7} {mv.verdict}{loss}{extra}")
+    return "\n".join(out)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Review saved games with the engine")
+    p.add_argument("pgn", nargs="+", help="Session PGN files (any number of games each)")
+    p.add_argument("--engine", default=load_env_default("ENGINE_PATH", "stockfish"))
+    p.add_argument("--depth", type=int, default=int(load_env_default("ENGINE_DEPTH", 16)))
+    p.add_argument("--workers", type=int, default=None, help="Engine processes (default: one per core)")
+    p.add_argument("--hash-total", type=int, default=1024, help="Total engine hash in MB, split across workers")
+    p.add_argument("--store", default=load_env_default("EVAL_CACHE", "data/cache/evals.lmdb"),
+                   help="EvalCache LMDB directory ('none' to disable)")
+    p.add_argument("--eco-pgn", default=None, help="Optional ECO PGN for the book deviation check")
+    return p.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    games = [(path, g) for path in args.pgn for g in iter_pgn_games(path)]
+    explorer = OpeningExplorer()
+    if args.eco_pgn:
+        explorer.load_eco_pgn(args.eco_pgn)
+    t0 = time.perf_counter()
+    store = None if args.store.lower() == "none" else args.store
+    with EvalCache(store) as cache, \
+            EnginePool(args.engine, size=args.workers, depth=args.depth, multipv=1,
+                       hash_total_mb=args.hash_total, cache=cache) as pool:
+        lines = analyse_positions([g for _, g in games], pool)
+    dt = time.perf_counter() - t0
+    for path, game in games:
+        print(format_review(review_game(game, lines, explorer), name=f"{path}: "))
+        print()
+    print(f"Reviewed {len(games)} game(s), {len(lines)} positions in {dt:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,34 @@
 from __future__ import annotations
 from typing import Optional
 
+import chess
+
+from src.engine.engine_wrapper import EngineLine
+
+MATE_CP = 10000
+
+def line_cp(line: Optional[EngineLine]) -> Optional[float]:
+    """A line's score in centipawns for the side to move, mates as ±MATE_CP."""
+    if line is None:
+        return None
+    if line.mate is not None:
+        return float(MATE_CP if line.mate > 0 else -MATE_CP)
+    return line.cp
+
+def reply_line(line: Optional[EngineLine], board_after: chess.Board) -> Optional[EngineLine]:
+    """
+    The opponent's side of `line` once its first move is played: the reply
+    its PV expects, scored for the opponent. None when the PV stops at the
+    move (e.g. lines from the cache), so the position needs a search.
+    """
+    if line is None or len(line.pv) < 2 or not board_after.is_legal(line.pv[1]):
+        return None
+    if line.mate is not None:
+        mate = -(line.mate - 1) if line.mate > 0 else -line.mate
+        return EngineLine(move=line.pv[1], cp=None, mate=mate, pv=line.pv[1:], root=board_after.copy(stack=False))
+    cp = -line.cp if line.cp is not None else None
+    return EngineLine(move=line.pv[1], cp=cp, mate=None, pv=line.pv[1:], root=board_after.copy(stack=False))
+
 def cp_loss(best_cp_before: Optional[float], user_cp_after: Optional[float]) -> Optional[float]:
     """
     Centipawn loss estimate = eval(best line before move) - eval(after user's move).
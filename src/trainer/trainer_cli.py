@@ -1,110 +1,218 @@
 from __future__ import annotations
 import sys
-from typing import List
+from typing import List, Optional, Tuple
 
 import chess
 import chess.pgn
 
 from src.config import parse_args
-from src.engine.engine_wrapper import EngineWrapper
-from src.openings.opening_explorer import OpeningExplorer
+from src.engine.backends import open_engine
+from src.engine.engine_wrapper import AdaptiveDepth, EngineLine
+from src.engine.eval_cache import EvalCache
+from src.openings.opening_explorer import BookCursor, OpeningExplorer, OpeningMatch
+from src.openings.stats_db import format_stats
+from src.trainer.drill import DrillStats, Repertoire, run_drill
 from src.trainer.eval_bar import render_eval_bar
-from src.trainer.scoring import cp_loss, verdict
+from src.trainer.scoring import cp_loss, line_cp, reply_line, verdict
+from src.utils.logging_utils import PROFILER, span
+from src.utils.pgn_utils import save_game
 
 from src.learning.features import board_to_planes, targets_from_engine
+from src.learning.background_trainer import BackgroundTrainer
+from src.learning.inference_server import InferenceServer
 from src.learning.learner import OnlineLearner
 
 
-def _opening_string(explorer: OpeningExplorer, board: chess.Board) -> str:
-    m = explorer.identify(board)
+def _opening_string(m: Optional[OpeningMatch]) -> str:
     if not m:
         return "Opening: [unknown]"
     return f"Opening: {m.name} (ECO {m.eco}) – matched {m.matched_moves} move(s)."
 
 
+def drill_main(engine_cfg, trainer_cfg) -> Optional[int]:
+    """Drill/blind session over the repertoire; None if it has nothing to drill."""
+    color = trainer_cfg.side.lower() == "white"
+    try:
+        rep = Repertoire.from_pgn(trainer_cfg.repertoire)
+    except OSError:
+        rep = Repertoire()
+    if not rep.drill_positions(color):
+        print(f"No {trainer_cfg.side} positions in {trainer_cfg.repertoire}; playing freely instead.")
+        return None
+    mode = "Blindfold drill" if trainer_cfg.mode == "blind" else "Drill"
+    print(f"=== Chess Openings Trainer ({mode}) ===")
+    cache = EvalCache(engine_cfg.eval_cache)
+    # the engine is only asked about moves outside the repertoire
+    with cache, DrillStats(trainer_cfg.drill_stats) as stats, \
+            open_engine(engine_cfg.engine_path, engine_cfg.depth, 1, cache=cache, background=False,
+                        threads=engine_cfg.threads, hash_mb=engine_cfg.hash_mb,
+                        adaptive=AdaptiveDepth() if engine_cfg.adaptive else None) as engine:
+        n = run_drill(rep, stats, color, blind=trainer_cfg.mode == "blind",
+                      analyse=lambda b, root_moves=None: engine.analyse(b, 1, purpose="move",
+                                                                        root_moves=root_moves))
+    print(f"\nReviewed {n} position(s).")
+    return 0
+
+def _profile_report(trainer_cfg):
+    if trainer_cfg.profile:
+        print("\n" + PROFILER.report())
+    if trainer_cfg.profile_json:
+        PROFILER.export_json(trainer_cfg.profile_json)
+    if trainer_cfg.trace:
+        PROFILER.export_chrome_trace(trainer_cfg.trace)
+        print(f"Trace written to {trainer_cfg.trace}")
+
 def main() -> int:
     engine_cfg, trainer_cfg = parse_args()
-    explorer = OpeningExplorer()
+    PROFILER.trace = bool(trainer_cfg.trace)
+    try:
+        return _main(engine_cfg, trainer_cfg)
+    finally:
+        _profile_report(trainer_cfg)
+
+def _main(engine_cfg, trainer_cfg) -> int:
+    if trainer_cfg.mode in ("drill", "blind"):
+        rc = drill_main(engine_cfg, trainer_cfg)
+        if rc is not None:
+            return rc
+    explorer = OpeningExplorer(stats_path=trainer_cfg.explorer_db)
+    if trainer_cfg.eco_pgn:
+        explorer.load_eco_pgn(trainer_cfg.eco_pgn)
     learner = OnlineLearner()   # <-- NEW
 
     board = chess.Board()
+    # one book cursor per ply, kept in step with board.move_stack
+    book: List[BookCursor] = [explorer.start()]
     user_is_white = trainer_cfg.side.lower() == "white"
 
     print("=== Chess Openings Trainer (Learning Enabled) ===")
 
-    with EngineWrapper(engine_cfg.engine_path, engine_cfg.depth, engine_cfg.multipv) as eng:
+    cache = EvalCache(engine_cfg.eval_cache)
+    with cache, BackgroundTrainer(learner) as trainer, \
+            InferenceServer(learner.model_path) as nn_server, \
+            open_engine(engine_cfg.engine_path, engine_cfg.depth, engine_cfg.multipv, cache=cache,
+                        server=nn_server, budgets=engine_cfg.budgets, ponder=trainer_cfg.ponder,
+                        threads=engine_cfg.threads, hash_mb=engine_cfg.hash_mb,
+                        adaptive=AdaptiveDepth() if engine_cfg.adaptive else None) as engine:
+        multipv = engine_cfg.multipv
+        # analysis of the position after the user's move, reused for the engine's reply
+        reply: Optional[Tuple[str, List[EngineLine]]] = None
         while not board.is_game_over():
 
             # ENGINE MOVE WHEN NOT USER TURN
             if (board.turn and not user_is_white) or ((not board.turn) and user_is_white):
-                lines = eng.analyse(board)
+                if reply is not None and reply[0] == board.epd():
+                    lines = reply[1]
+                else:
+                    with span("turn.engine_move"):
+                        lines = engine.analyse(board, multipv, purpose="move")
+                reply = None
                 if not lines:
                     break
                 best = lines[0]
                 engine_san = board.san(best.move)
                 board.push(best.move)
+                book.append(explorer.advance(book[-1], best.move))
 
                 bar, label = render_eval_bar(best.cp, best.mate)
                 print(f"Engine: {engine_san}   {bar}   {label}")
-                print(_opening_string(explorer, board))
+                print(_opening_string(explorer.lookup(book[-1], board)))
                 continue
 
             # USER TURN
             print("\nFEN:", board.fen())
-            print(_opening_string(explorer, board))
-            lines = eng.analyse(board)
+            print(_opening_string(explorer.lookup(book[-1], board)))
+            for row in format_stats(board, explorer.move_stats(board), limit=3):
+                print("  " + row)
+            # search runs while the user thinks; the prompt does not wait for it
+            engine.start(board)
 
-            cmd = input("Your move (SAN/hint/best/undo/quit): ").strip().lower()
+            raw = input("Your move (SAN/hint/best/undo/quit): ").strip()
+            cmd = raw.lower()
 
             if cmd in ("quit", "q"):
                 break
             if cmd == "undo":
-                if board.move_stack: board.pop()
-                if board.move_stack: board.pop()
+                for _ in range(2):
+                    if board.move_stack:
+                        board.pop()
+                        book.pop()
                 continue
             if cmd == "hint":
+                # whatever analysis fits the hint budget is good enough
+                lines = engine.analyse(board, 3, depth=1, purpose="hint")
                 for i, ln in enumerate(lines[:3], 1):
-                    print(i, board.san(ln.move), ln.pv_san)
+                    print(i, ln.san, ln.pv_san)
+                ranked = nn_server.predict(board).moves(board)
+                if ranked:
+                    print(f"Net suggests: {board.san(ranked[0][0])} (p={ranked[0][1]:.2f})")
                 continue
             if cmd == "best":
-                ln = lines[0]
-                print("Best:", board.san(ln.move), ln.pv_san)
+                lines = engine.analyse(board, 1, depth=1, purpose="hint")
+                if lines:
+                    print("Best:", lines[0].san, lines[0].pv_san)
                 continue
 
             try:
-                move = board.parse_san(cmd)
-            except:
+                move = board.parse_san(raw)
+            except ValueError:
                 print("Invalid SAN.")
                 continue
 
-            # LEARNING HOOK — before move is made
-            best_before = lines[0]
-            best_cp_before = best_before.cp
-            best_move_before = best_before.move
+            # SCORING — the played move is scored by the same search as the
+            # best move: from its MultiPV line, or, outside the MultiPV, by a
+            # search of that move alone
+            with span("turn.score"):
+                lines = engine.analyse(board, multipv, purpose="move")
+                if not lines:
+                    break
+                best_before = lines[0]
+                played = next((ln for ln in lines if ln.move == move), None)
+                if played is None:
+                    played = (engine.analyse(board, 1, purpose="move", root_moves=[move]) or [None])[0]
+            best_cp_before = line_cp(best_before)
+            user_cp = line_cp(played)           # both from the user's point of view
 
             user_san = board.san(move)
             board.push(move)
-
-            # Quick position eval after user move for scoring + training target
-            after = eng.analyse(board)[0]
-            user_cp_after = after.cp
+            book.append(explorer.advance(book[-1], move))
 
             # Score output
-            is_best = (move == best_move_before)
-            loss = cp_loss(best_cp_before, user_cp_after)
+            is_best = (move == best_before.move)
+            loss = cp_loss(best_cp_before, user_cp)
+            if loss is not None:
+                loss = max(0.0, loss)
             print(f"{verdict(is_best, loss)} — You played {user_san}"
                   + (f"; Δcp ≈ {loss:.0f}" if loss is not None else ""))
 
-            # **LEARN FROM THIS POSITION**
-            x = board_to_planes(board)
-            value_target, policy_index = targets_from_engine(user_cp_after)
-            learner.step_after_move(x, value_target, policy_index, updates=2)
+            # The played line already holds the engine's reply and its score;
+            # search the new position only when its PV stops at the move
+            after: List[EngineLine] = []
+            if not board.is_game_over():
+                expected = reply_line(played, board)
+                if expected is not None:
+                    after = [expected]
+                else:
+                    with span("turn.reply_analysis"):
+                        after = engine.analyse(board, multipv, purpose="move")
+            reply = (board.epd(), after)
+
+            # **LEARN FROM THIS POSITION** (value for the side to move now)
+            with span("features.encode"):
+                x = board_to_planes(board)
+            value_target, policy_index = targets_from_engine(
+                None if user_cp is None else -user_cp, best_move=after[0].move if after else None)
+            trainer.submit(x, value_target, policy_index)
 
             # Show eval bar
-            bar, label = render_eval_bar(after.cp, after.mate)
-            print(bar, label)
+            if after:
+                bar, label = render_eval_bar(after[0].cp, after[0].mate)
+                print(bar, label)
 
         print("\nSession complete.")
+    if board.move_stack:
+        path = save_game(board, directory=trainer_cfg.sessions_dir)
+        print(f"Game saved to {path}; review it with: python -m src.trainer.review_cli {path}")
     return 0
 
 if __name__ == "__main__":
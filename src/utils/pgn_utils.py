@@ -1,14 +1,45 @@
 from __future__ import annotations
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator, Optional
 import chess
 import chess.pgn
 
-def save_game(board: chess.Board, path: str | None = None):
+def save_game(board: chess.Board, path: str | None = None, directory: str = "data/sessions"):
+    """Write the game as PGN; without an explicit path it goes into `directory`."""
     game = chess.pgn.Game.from_board(board)
     game.headers["Event"] = "Openings Trainer Session"
     game.headers["Date"] = datetime.utcnow().strftime("%Y.%m.%d")
-    out = str(path or f"session_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pgn")
+    if path is None:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        path = Path(directory) / f"session_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pgn"
+    out = str(path)
     with open(out, "w", encoding="utf-8") as f:
         print(game, file=f)
     return out
+
+def iter_pgn_games(path: str) -> Iterator[chess.pgn.Game]:
+    """Stream games from a PGN file one at a time."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            yield game
+
+def iter_tree_positions(game: chess.pgn.Game, max_ply: Optional[int] = None) -> Iterator[chess.Board]:
+    """
+    Every position in the game tree, variations included, down to `max_ply`
+    half-moves. Boards are yielded as independent copies (without move stacks).
+    """
+    root = game.board()
+    stack = [(game, root, 0)]
+    while stack:
+        node, board, ply = stack.pop()
+        yield board
+        if max_ply is not None and ply >= max_ply:
+            continue
+        for child in reversed(node.variations):
+            nxt = board.copy(stack=False)
+            nxt.push(child.move)
+            stack.append((child, nxt, ply + 1))
@@ -0,0 +1,11 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+FAKE_ENGINE = Path(__file__).with_name("fake_uci_engine.py")
+
+@pytest.fixture
+def fake_engine():
+    """Command line for the bundled fake UCI engine (no Stockfish needed)."""
+    return [sys.executable, str(FAKE_ENGINE)]
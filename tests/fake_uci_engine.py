@@ -0,0 +1,158 @@
+"""
+Tiny deterministic UCI engine for tests and offline benchmarks.
+
+It speaks enough UCI for python-chess (uci/isready/setoption/position/go/stop)
+and "searches" by ranking legal moves with a one-ply material heuristic, so
+results are stable across depths. Flags:
+  --delay SECONDS       sleep per reported depth (simulates search time)
+  --crash-after N       exit abruptly on the N-th `go` (tests restart logic)
+"""
+import argparse
+import sys
+import threading
+import time
+
+import chess
+
+VALUES = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330,
+          chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+def _material(board: chess.Board) -> int:
+    score = 0
+    for pt, val in VALUES.items():
+        score += val * (len(board.pieces(pt, chess.WHITE)) - len(board.pieces(pt, chess.BLACK)))
+    return score if board.turn == chess.WHITE else -score
+
+def _ranked(board: chess.Board, moves=None):
+    """[(cp for side to move, move)] best first, ties broken by UCI string."""
+    out = []
+    for mv in (moves or list(board.legal_moves)):
+        board.push(mv)
+        cp = -_material(board)
+        board.pop()
+        # small deterministic preference so lines never tie exactly
+        cp += (sum(map(ord, mv.uci())) % 17) - 8
+        out.append((cp, mv))
+    out.sort(key=lambda t: (-t[0], t[1].uci()))
+    return out
+
+def _pv(board: chess.Board, first: chess.Move, length: int):
+    tmp = board.copy(stack=False)
+    pv = [first]
+    tmp.push(first)
+    while len(pv) < length and not tmp.is_game_over():
+        mv = _ranked(tmp)[0][1]
+        pv.append(mv)
+        tmp.push(mv)
+    return pv
+
+class FakeEngine:
+    def __init__(self, delay: float, crash_after: int):
+        self.delay = delay
+        self.crash_after = crash_after
+        self.gos = 0
+        self.multipv = 1
+        self.board = chess.Board()
+        self.stop_evt = threading.Event()
+        self.search: threading.Thread | None = None
+        self.lock = threading.Lock()
+
+    def send(self, line: str):
+        with self.lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def set_position(self, tokens):
+        if tokens[0] == "startpos":
+            board, rest = chess.Board(), tokens[1:]
+        else:
+            idx = tokens.index("moves") if "moves" in tokens else len(tokens)
+            board, rest = chess.Board(" ".join(tokens[1:idx])), tokens[idx:]
+        if rest and rest[0] == "moves":
+            for u in rest[1:]:
+                board.push_uci(u)
+        self.board = board
+
+    def go(self, tokens):
+        self.gos += 1
+        if self.crash_after and self.gos >= self.crash_after:
+            sys.stdout.flush()
+            import os
+            os._exit(3)
+        depth, nodes, movetime, searchmoves = 8, None, None, None
+        i = 0
+        while i < len(tokens):
+            t = tokens[i]
+            if t == "depth":
+                depth = int(tokens[i + 1]); i += 2
+            elif t == "nodes":
+                nodes = int(tokens[i + 1]); i += 2
+            elif t == "movetime":
+                movetime = int(tokens[i + 1]) / 1000.0; i += 2
+            elif t == "infinite":
+                depth = 99; i += 1
+            elif t == "searchmoves":
+                searchmoves = [chess.Move.from_uci(u) for u in tokens[i + 1:]]
+                break
+            else:
+                i += 1
+        if nodes is not None:
+            depth = max(1, min(depth, nodes // 1000 or 1))
+        self.stop_evt.clear()
+        self.search = threading.Thread(
+            target=self._search, args=(self.board.copy(), depth, movetime, searchmoves), daemon=True)
+        self.search.start()
+
+    def _search(self, board, depth, movetime, searchmoves):
+        t0 = time.time()
+        ranked = _ranked(board, searchmoves)
+        best = ranked[0][1] if ranked else None
+        for d in range(1, depth + 1):
+            if self.stop_evt.is_set() or (movetime is not None and time.time() - t0 >= movetime):
+                break
+            if self.delay:
+                time.sleep(self.delay)
+            for k, (cp, mv) in enumerate(ranked[:self.multipv], 1):
+                pv = " ".join(m.uci() for m in _pv(board, mv, min(d, 6)))
+                self.send(f"info depth {d} seldepth {d} multipv {k} score cp {cp} "
+                          f"nodes {d * 1000} nps 1000000 time {int((time.time() - t0) * 1000)} pv {pv}")
+        self.send(f"bestmove {best.uci() if best else '(none)'}")
+
+    def run(self):
+        for raw in sys.stdin:
+            tokens = raw.split()
+            if not tokens:
+                continue
+            cmd = tokens[0]
+            if cmd == "uci":
+                self.send("id name FakeEngine")
+                self.send("id author tests")
+                self.send("option name Threads type spin default 1 min 1 max 512")
+                self.send("option name Hash type spin default 16 min 1 max 33554432")
+                self.send("option name MultiPV type spin default 1 min 1 max 500")
+                self.send("uciok")
+            elif cmd == "isready":
+                self.send("readyok")
+            elif cmd == "setoption" and len(tokens) >= 5 and tokens[2] == "MultiPV":
+                self.multipv = int(tokens[4])
+            elif cmd == "position":
+                self.set_position(tokens[1:])
+            elif cmd == "go":
+                self.go(tokens[1:])
+            elif cmd == "stop":
+                self.stop_evt.set()
+                if self.search is not None:
+                    self.search.join()
+            elif cmd == "quit":
+                self.stop_evt.set()
+                break
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--delay", type=float, default=0.0)
+    ap.add_argument("--crash-after", type=int, default=0)
+    args = ap.parse_args()
+    FakeEngine(args.delay, args.crash_after).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import time as _time
+
+import chess
+import chess.engine
+import pytest
+
+from src.engine.backends import EngineBackend, EngineSelector, NeuralBackend, StoreBackend, open_engine
+from src.engine.engine_wrapper import EngineLine
+from src.engine.eval_cache import EvalCache
+from src.learning.inference_server import InferenceServer
+
+class _Fixed(EngineBackend):
+    def __init__(self, name, max_depth, latency_s, timed=False, fail=False):
+        super().__init__(latency_s)
+        self.name, self.max_depth, self.timed, self.fail = name, max_depth, timed, fail
+        self.calls = []
+
+    def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+        self.calls.append((depth, time))
+        if self.fail:
+            raise chess.engine.EngineError("boom")
+        move = next(iter(board.legal_moves))
+        return [EngineLine(move=move, cp=0.0, mate=None, pv_san=self.name)]
+
+def test_selector_prefers_cheapest_qualifying_backend_and_falls_back():
+    slow = _Fixed("slow", 20, 2.0)
+    timed = _Fixed("timed", 20, 2.0, timed=True)
+    static = _Fixed("static", 0, 0.001)
+    sel = EngineSelector([slow, timed, static], default_depth=16, budgets={"hint": 0.05})
+    board = chess.Board()
+    assert sel.analyse(board, depth=0)[0].pv_san == "static"
+    assert sel.analyse(board, depth=1, purpose="hint")[0].pv_san == "timed"
+    assert timed.calls[-1][0] == 1 and 0.04 < timed.calls[-1][1] <= 0.05
+    assert not slow.calls                                           # slow cannot meet 50 ms
+    timed.fail = True
+    # nothing else reaches depth 1 within budget: relaxed pass in configured order
+    assert sel.analyse(board, depth=1, purpose="hint")[0].pv_san == "slow"
+    assert sel.last_backend == "slow"
+
+def test_selector_shares_one_deadline_across_fallbacks():
+    class Slow(_Fixed):
+        def analyse(self, board, multipv=1, depth=None, time=None, nodes=None, root_moves=None):
+            self.calls.append((depth, time))
+            _time.sleep(0.15)
+            raise chess.engine.EngineError("too slow")
+    first = Slow("first", 20, 0.1, timed=True)
+    second, third = _Fixed("second", 20, 0.1, timed=True), _Fixed("third", 20, 0.1, timed=True)
+    sel = EngineSelector([first, second, third])
+    assert sel.analyse(chess.Board(), depth=1, budget=0.5)[0].pv_san == "second"
+    assert 0.45 < first.calls[0][1] <= 0.5
+    assert second.calls[0][1] < 0.36 and not third.calls
+    second.calls.clear()
+    assert sel.analyse(chess.Board(), depth=1, budget=0.1) == []
+    assert len(first.calls) == 2 and not second.calls           # the first used up the budget
+
+def test_selector_does_not_hide_programming_errors():
+    class Broken(_Fixed):
+        def analyse(self, board, **kwargs):
+            raise TypeError("bad call")
+    sel = EngineSelector([Broken("broken", 20, 0.1), _Fixed("ok", 20, 0.1)])
+    with pytest.raises(TypeError):
+        sel.analyse(chess.Board(), depth=1)
+    with pytest.raises(TypeError):
+        EngineBackend()
+
+def test_store_serves_cached_positions_and_missing_engine_falls_back(tmp_path):
+    board = chess.Board()
+    with EvalCache(str(tmp_path / "evals.lmdb")) as cache:
+        line = EngineLine(move=chess.Move.from_uci("e2e4"), cp=30.0, mate=None, pv_san="e4")
+        cache.put("Stockfish 16", board, 20, 1, [line])
+        assert StoreBackend(cache).can_serve(board, 16)
+        with open_engine(str(tmp_path / "no-such-engine"), depth=16, cache=cache) as sel:
+            assert [be.name for be in sel.backends] == ["store", "simple_ab"]
+            assert sel.analyse(board)[0].move == line.move and sel.last_backend == "store"
+            after = board.copy()
+            after.push(line.move)
+            assert sel.analyse(after, budget=0.2) and sel.last_backend == "simple_ab"
+
+def test_neural_backend_returns_legal_multipv_lines(tmp_path):
+    board = chess.Board()
+    with InferenceServer(str(tmp_path / "missing.ckpt")) as server:
+        lines = NeuralBackend(server).analyse(board, multipv=3)
+    assert len({ln.move for ln in lines}) == 3 and all(ln.move in board.legal_moves for ln in lines)
+    assert lines[0].cp >= lines[-1].cp
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import chess
+from src.engine.background import BackgroundAnalyser
+from src.engine.engine_wrapper import EngineWrapper
+
+def test_background_ponders_candidate_replies(fake_engine):
+    b = chess.Board()
+    with EngineWrapper(fake_engine + ["--delay", "0.01"], depth=4, multipv=2) as eng, \
+            BackgroundAnalyser(eng) as bg:
+        bg.start(b)
+        lines = bg.lines(b)
+        assert len(lines) == 2 and lines[0].move in b.legal_moves
+        b.push(lines[1].move)
+        after = bg.lines(b)                     # pondered or searched on demand
+        assert after and after[0].move in b.legal_moves
+        assert bg.lines(b) is after             # served from the finished result
+
+def test_updates_stream_deeper_results(fake_engine):
+    b = chess.Board()
+    with EngineWrapper(fake_engine + ["--delay", "0.01"], depth=5, multipv=2) as eng, \
+            BackgroundAnalyser(eng, ponder=False) as bg:
+        bg.start(b)
+        seen = list(bg.updates(b))
+        depths = [d for d, _, final in seen if not final]
+        assert depths == sorted(set(depths)) and depths[-1] == 5
+        assert seen[-1][2] and seen[-1][1][0].move in b.legal_moves
+        # finished positions are served at once
+        assert [final for _, _, final in bg.updates(b)] == [True]
+
+def test_restricted_search_runs_on_the_worker(fake_engine):
+    b = chess.Board()
+    move = chess.Move.from_uci("h2h4")
+    with EngineWrapper(fake_engine + ["--delay", "0.01"], depth=4, multipv=2) as eng, \
+            BackgroundAnalyser(eng) as bg:
+        bg.start(b)
+        assert [ln.move for ln in bg.restricted(b, [move])] == [move]
+        assert len(bg.lines(b)) == 2
+
+def test_restricted_timeout_is_a_deadline_and_drops_the_result(fake_engine):
+    b = chess.Board()
+    move = chess.Move.from_uci("h2h4")
+    with EngineWrapper(fake_engine + ["--delay", "0.05"], depth=20, multipv=1) as eng, \
+            BackgroundAnalyser(eng, ponder=False) as bg:
+        stop = threading.Event()
+        def poke():             # start() notifies waiters over and over
+            while not stop.wait(0.05):
+                bg.start(b)
+        poker = threading.Thread(target=poke)
+        poker.start()
+        t0 = time.perf_counter()
+        try:
+            assert bg.restricted(b, [move], timeout=0.3) == []
+        finally:
+            stop.set()
+            poker.join()
+        assert time.perf_counter() - t0 < 0.6
+        time.sleep(1.3)         # the search started before the deadline finishes unclaimed
+        assert not bg._restricted
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+import types
+
+import chess
+import pytest
+import torch
+
+from src.learning.background_trainer import BackgroundTrainer
+from src.learning.features import board_to_planes
+from src.learning.learner import OnlineLearner
+
+def _learner(tmp_path):
+    return OnlineLearner(model_path=str(tmp_path / "ckpt" / "latest.ckpt"),
+                         opt_path=str(tmp_path / "opt" / "latest.opt"),
+                         buffer_path=str(tmp_path / "replay_buffer.npz"))
+
+def test_background_trainer_trains_and_checkpoints_on_close(tmp_path):
+    learner = _learner(tmp_path)
+    x = board_to_planes(chess.Board())
+    with BackgroundTrainer(learner, updates=2, batch_size=8, checkpoint_every_s=3600) as trainer:
+        for i in range(20):
+            trainer.submit(x, 0.1 * (i % 3), i % 64)
+    assert len(learner.buffer) == 20
+    assert trainer.steps > 0 and trainer.checkpoints >= 1
+    assert os.path.exists(learner.model_path) and not os.path.exists(learner.model_path + ".tmp")
+
+    # the checkpoint reloads into a fresh learner
+    again = _learner(tmp_path)
+    for a, b in zip(learner.model.state_dict().values(), again.model.state_dict().values()):
+        assert torch.equal(a, b)
+
+def _wait_for(cond, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_step_schedule_triggers_intermediate_checkpoints(tmp_path):
+    learner = _learner(tmp_path)
+    x = board_to_planes(chess.Board())
+    trainer = BackgroundTrainer(learner, updates=1, batch_size=4,
+                                checkpoint_every_s=3600, checkpoint_every_steps=1)
+    trainer.submit(x, 0.0, 0)
+    _wait_for(lambda: trainer.checkpoints == 1)     # from the step schedule, before close
+    assert trainer.steps == 1
+    trainer.close()
+    trainer.close()
+    # a lone stop neither trains on old data nor writes another checkpoint
+    assert trainer.steps == 1 and trainer.checkpoints == 1
+
+def test_close_checkpoints_steps_since_the_last_one(tmp_path):
+    learner = _learner(tmp_path)
+    x = board_to_planes(chess.Board())
+    trainer = BackgroundTrainer(learner, updates=1, batch_size=4,
+                                checkpoint_every_s=3600, checkpoint_every_steps=100)
+    trainer.submit(x, 0.0, 0)
+    _wait_for(lambda: trainer.steps == 1)
+    assert trainer.checkpoints == 0
+    trainer.close()
+    assert trainer.steps == 1 and trainer.checkpoints == 1
+
+def test_close_does_not_hang_on_a_dead_worker_and_reraises(tmp_path):
+    release = threading.Event()
+    def append(x, v, p):
+        release.wait()
+        raise OSError("disk full")
+    learner = types.SimpleNamespace(buffer=types.SimpleNamespace(append=append))
+    trainer = BackgroundTrainer(learner, max_queue=2)
+    x = board_to_planes(chess.Board())
+    trainer.submit(x, 0.0, 0)
+    while not trainer._queue.empty():       # the worker holds the first sample
+        time.sleep(0.01)
+    trainer.submit(x, 0.0, 0)
+    trainer.submit(x, 0.0, 0)
+    assert trainer._queue.full()
+    release.set()
+    with pytest.raises(OSError):
+        trainer.close()
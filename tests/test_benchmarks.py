@@ -0,0 +1,20 @@
+from benchmarks import bench_search
+from benchmarks.suite import compare, format_report
+
+def _run(**values):
+    return {"results": [{"name": n, "value": v, "unit": "us", "higher_is_better": n.endswith("_per_s")}
+                        for n, v in values.items()]}
+
+def test_compare_respects_direction_and_threshold():
+    base = _run(lookup=10.0, nodes_per_s=1000.0, gone=1.0)
+    cur = _run(lookup=11.5, nodes_per_s=1100.0, new=5.0)
+    rows = {r["name"]: r for r in compare(cur, base, threshold=0.10)}
+    assert set(rows) == {"lookup", "nodes_per_s"}         # only metrics in both runs
+    assert rows["lookup"]["regressed"] and abs(rows["lookup"]["change"] - 0.15) < 1e-9
+    assert not rows["nodes_per_s"]["regressed"] and rows["nodes_per_s"]["change"] < 0
+    assert not compare(cur, base, threshold=0.20)[0]["regressed"]
+    assert "REGRESSION" in format_report(cur, list(rows.values()))
+
+def test_quick_search_benchmark_reports_metrics():
+    names = {r.name for r in bench_search.results(quick=True)}
+    assert names == {"search.nodes_per_s[d3]", "search.best_move[d3]"}
@@ -0,0 +1,37 @@
+import numpy as np
+from src.learning.dataset import NPZReplayBuffer
+from src.learning.move_encoding import NO_POLICY
+
+def test_ring_buffer_wraps_and_migrates(tmp_path):
+    legacy = tmp_path / "replay_buffer.npz"
+    np.savez_compressed(legacy, X=np.ones((3, 18, 8, 8), np.float32),
+                        V=np.full((3, 1), 0.5, np.float32), P=np.arange(3, dtype=np.int64))
+    buf = NPZReplayBuffer(str(legacy), capacity=4)
+    assert len(buf) == 3 and not legacy.exists()          # imported, old file set aside
+    for i in range(3):
+        buf.append(np.zeros((18, 8, 8), np.float32), -1.0, 10 + i)
+    assert len(buf) == 4
+    X, V, P = buf.sample(batch_size=8)
+    # legacy to-square placeholders are dropped as policy targets
+    assert X.shape == (4, 18, 8, 8) and sorted(P.tolist()) == [NO_POLICY, 10, 11, 12]
+    buf.close()
+    assert len(NPZReplayBuffer(str(legacy), capacity=4)) == 4   # persisted across reopen
+
+def test_capacity_change_keeps_newest_packed_rows(tmp_path):
+    path = str(tmp_path / "replay_buffer.npz")
+    buf = NPZReplayBuffer(path, capacity=4)
+    for i in range(6):                      # wraps: rows 2..5 remain
+        x = np.zeros((18, 8, 8), np.float32)
+        x[0, 0, i] = 1.0
+        buf.append(x, float(i), i)
+    buf.close()
+    small = NPZReplayBuffer(path, capacity=3)
+    X, V, P = small.sample(batch_size=8)
+    assert sorted(P.tolist()) == [3, 4, 5]
+    for x, v, p in zip(X, V, P):
+        assert v[0] == p and x[0, 0, p] == 1.0
+    small.append(np.zeros((18, 8, 8), np.float32), 9.0, 9)   # the head continues after the copy
+    assert sorted(small.sample(batch_size=8)[2].tolist()) == [4, 5, 9]
+    small.close()
+    big = NPZReplayBuffer(path, capacity=10)
+    assert len(big) == 3
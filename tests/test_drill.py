@@ -0,0 +1,64 @@
+import chess
+from src.engine.engine_wrapper import EngineLine
+from src.trainer.drill import DrillScheduler, DrillStats, Repertoire, run_drill, sm2, CardState
+
+PGN = """[Event "Rep"]
+
+1. e4 e5 (1... c5 2. Nf3) 2. Nf3 Nc6 3. Bc4 *
+"""
+
+def _rep(tmp_path):
+    p = tmp_path / "rep.pgn"
+    p.write_text(PGN)
+    return Repertoire.from_pgn(str(p))
+
+def test_repertoire_graph_includes_variations(tmp_path):
+    rep = _rep(tmp_path)
+    b = chess.Board()
+    b.push_san("e4")
+    assert [b.san(m) for m in rep.expected(b)] == ["e5", "c5"]
+    keys = rep.drill_positions(chess.WHITE)
+    assert len(keys) == 4              # start, after 1...e5, after 1...c5, after 2...Nc6
+    start, path = rep.path(keys[2])
+    assert start.variation_san(path) == "1. e4 c5"
+
+def test_sm2_and_scheduler(tmp_path):
+    assert sm2(CardState(), 5, 0.0).interval == 86400.0
+    lapse = sm2(CardState(reps=3, interval=1e6), 1, 0.0)
+    assert lapse.reps == 0 and lapse.due == 60.0
+    rep = _rep(tmp_path)
+    stats = DrillStats(str(tmp_path / "stats.npy"))
+    sched = DrillScheduler(rep, stats, chess.WHITE)
+    first = sched.next(now=0.0)
+    assert first == rep.drill_positions(chess.WHITE)[0]
+    sched.review(first, 1, now=0.0)                   # missed: due again after a minute
+    assert sched.next(now=1.0) != first
+    assert sched.next(now=61.0) == first
+    stats.save()
+    loaded = DrillStats(stats.path).get(first)
+    assert (loaded.due, loaded.lapses) == (stats.get(first).due, 1)
+
+def test_engine_only_asked_about_deviations(tmp_path, capsys):
+    rep = _rep(tmp_path)
+    stats = DrillStats(str(tmp_path / "stats.npy"))
+    answers = iter(["e4", "Nf3", "d4", "Bc4", "q"])
+    calls = []
+    def analyse(board, root_moves=None):
+        calls.append((board.fen(), root_moves))
+        if root_moves:                  # the deviation gets mated
+            return [EngineLine(move=root_moves[0], cp=None, mate=-2, pv_san="")]
+        return [EngineLine(move=next(iter(board.legal_moves)), cp=20.0, mate=None, pv_san="")]
+    n = run_drill(rep, stats, chess.WHITE, blind=True, analyse=analyse, ask=lambda _: next(answers))
+    assert n == 4 and len(calls) == 2            # best line, then the wrong move alone
+    assert calls[0][0] == calls[1][0] and calls[1][1] == [chess.Move.from_uci("d2d4")]
+    assert "Blunder, Δcp ≈ 10020" in capsys.readouterr().out     # mates are scored too
+    assert sum(c.lapses for c in stats.cards.values()) == 1
+
+def test_unreadable_stats_are_moved_aside(tmp_path, capsys):
+    path = tmp_path / "stats.npy"
+    path.write_bytes(b"not a numpy file")
+    stats = DrillStats(str(path))
+    assert stats.cards == {} and not path.exists()
+    [aside] = tmp_path.glob("stats.npy.bad-*")
+    assert aside.read_bytes() == b"not a numpy file"
+    assert "moved it to" in capsys.readouterr().err
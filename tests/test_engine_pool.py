@@ -0,0 +1,29 @@
+import time
+
+import chess
+from src.engine.engine_pool import EnginePool
+
+def test_pool_returns_results_for_every_board(fake_engine):
+    fens = [chess.STARTING_FEN, "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"] * 3
+    with EnginePool(fake_engine, size=2, depth=3, multipv=2) as pool:
+        ordered = pool.analyse_many(fens)
+        unordered = sorted(pool.imap(fens, ordered=False), key=lambda r: r.index)
+    assert [r.index for r in ordered] == list(range(len(fens)))
+    for res in ordered + unordered:
+        assert res.error is None and res.lines[0].move in chess.Board(res.fen).legal_moves
+
+def test_pool_restarts_crashed_engine(fake_engine):
+    with EnginePool(fake_engine + ["--crash-after", "2"], size=1, depth=2) as pool:
+        results = pool.analyse_many([chess.STARTING_FEN] * 3)
+    assert all(r.error is None and r.lines for r in results)
+
+def test_task_timeout_restarts_slow_engine_without_capping_depth(fake_engine):
+    # 0.05 s per depth: depth 3 answers in time, depth 40 never does
+    with EnginePool(fake_engine + ["--delay", "0.05"], size=1, depth=3, task_timeout=2.0) as pool:
+        [ok] = pool.analyse_many([chess.STARTING_FEN])
+    assert ok.error is None and len(ok.lines[0].pv) == 3       # the fake PV is as long as the depth
+    with EnginePool(fake_engine + ["--delay", "0.05"], size=1, depth=40, task_timeout=0.3, retries=1) as pool:
+        t0 = time.perf_counter()
+        [slow] = pool.analyse_many([chess.STARTING_FEN])
+        assert time.perf_counter() - t0 < 1.5
+    assert slow.error and "no answer" in slow.error and not slow.lines
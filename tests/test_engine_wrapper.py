@@ -1,5 +1,9 @@
+import threading
+
 import chess
-from src.engine.engine_wrapper import EngineWrapper
+import chess.engine
+from src.engine.engine_wrapper import AdaptiveDepth, EngineLine, EngineWrapper
+from src.engine.eval_cache import EvalCache
 
 def test_engine_returns_lines():
     b = chess.Board()
@@ -7,3 +11,80 @@ def test_engine_returns_lines():
         lines = eng.analyse(b)
         assert len(lines) >= 1
         assert lines[0].move in b.legal_moves
+
+def test_adaptive_stops_early_when_best_move_is_clear(fake_engine):
+    b = chess.Board()
+    for san in ["e4", "d5"]:
+        b.push_san(san)
+    with EngineWrapper(fake_engine, depth=10, multipv=2) as eng:
+        full = eng.analyse(b)
+    with EngineWrapper(fake_engine, depth=10, multipv=2, adaptive=AdaptiveDepth(min_depth=4)) as eng:
+        quick = eng.analyse(b)
+        assert eng.last_depth < 10
+    assert quick[0].move == full[0].move
+
+def test_adaptive_goes_deeper_when_lines_are_close(fake_engine):
+    # the fake engine scores the quiet opening moves within a few centipawns
+    with EngineWrapper(fake_engine, depth=6, multipv=2, adaptive=AdaptiveDepth(min_depth=4, extend=3)) as eng:
+        eng.analyse(chess.Board())
+        assert eng.last_depth == 9
+
+def test_nodes_limit(fake_engine):
+    with EngineWrapper(fake_engine, depth=10, multipv=1) as eng:
+        lines = eng.analyse(chess.Board(), nodes=3000)
+        assert lines and eng.last_depth == 3
+
+def test_capped_adaptive_result_does_not_serve_full_requests(fake_engine):
+    b = chess.Board()       # quiet lines: the adaptive rule does not settle early
+    with EngineWrapper(fake_engine, depth=6, multipv=2, cache=EvalCache(None),
+                       adaptive=AdaptiveDepth(min_depth=2)) as eng:
+        eng.analyse(b, nodes=3000)
+        assert eng.last_depth == 3
+        assert eng.cached(b, depth=3) is not None and eng.cached(b) is None
+        eng.analyse(b)
+        assert eng.last_depth >= 6
+
+def test_search_without_a_completed_iteration_is_not_cached(fake_engine):
+    mated = chess.Board()
+    for san in ["f3", "e5", "g4", "Qh4#"]:
+        mated.push_san(san)
+    line = EngineLine(move=chess.Move.from_uci("e2e4"), cp=20.0, mate=None, pv_san="e4")
+    with EngineWrapper(fake_engine, depth=6, multipv=2, cache=EvalCache(None),
+                       adaptive=AdaptiveDepth(min_depth=2)) as eng:
+        eng.analyse(mated)
+        assert eng.last_depth == 0 and eng.cached(mated, depth=0) is None
+        eng.store(chess.Board(), [line], depth=0)
+        assert eng.cached(chess.Board(), depth=0) is None
+        eng.store(chess.Board(), [line])
+        assert eng.cached(chess.Board(), depth=6) is not None
+
+def test_pv_san_is_rendered_lazily():
+    b = chess.Board()
+    pv = [chess.Move.from_uci(u) for u in ["e2e4", "e7e5", "e1e2", "e8e7", "a1a8"]]
+    info = {"pv": pv, "score": chess.engine.PovScore(chess.engine.Cp(30), chess.WHITE)}
+    line = EngineWrapper.lines_from_infos(b, [info])[0]
+    b.push_san("d4")                      # later changes to the board do not leak in
+    assert line.pv == pv and line.san == "e4"
+    assert line.pv_san == "e4 e5 Ke2 Ke7"
+    assert line.root.fen() == chess.STARTING_FEN and line.san == "e4"
+
+def test_pv_san_is_safe_to_read_from_several_threads():
+    b = chess.Board()
+    pv = [chess.Move.from_uci(u) for u in ["g1f3", "g8f6", "b1c3", "b8c6"]]
+    seen = []
+    for _ in range(50):
+        line = EngineLine(move=pv[0], cp=0.0, mate=None, pv=pv, root=b)
+        readers = [threading.Thread(target=lambda: seen.append((line.san, line.pv_san))) for _ in range(4)]
+        for t in readers:
+            t.start()
+        for t in readers:
+            t.join()
+    assert set(seen) == {("Nf3", "Nf3 Nf6 Nc3 Nc6")}
+
+def test_restricted_search_scores_only_the_given_move(fake_engine):
+    b = chess.Board()
+    move = chess.Move.from_uci("a2a3")
+    with EngineWrapper(fake_engine, depth=3, multipv=3, cache=EvalCache(None)) as eng:
+        lines = eng.analyse(b, root_moves=[move])
+        assert [ln.move for ln in lines] == [move]
+        assert eng.analyse(b)[0].move != move        # restricted result was not cached
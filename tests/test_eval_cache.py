@@ -0,0 +1,42 @@
+import chess
+from src.engine.engine_wrapper import EngineLine
+from src.engine.eval_cache import EvalCache
+
+def test_deeper_entry_serves_shallower_request(tmp_path):
+    b = chess.Board()
+    lines = [EngineLine(move=chess.Move.from_uci(u), cp=cp, mate=None, pv_san=san)
+             for u, cp, san in [("e2e4", 30.0, "e4 e5"), ("d2d4", 25.0, "d4 d5"), ("g1f3", 20.0, "Nf3")]]
+    path = str(tmp_path / "evals.lmdb")
+    with EvalCache(path) as cache:
+        cache.put("fake", b, 18, 3, lines)
+        got = cache.get("fake", b, 12, 2)
+        assert [l.move for l in got] == [l.move for l in lines[:2]]
+        assert cache.get("fake", b, 20, 3) is None
+        assert cache.get("other-engine", b, 12, 2) is None
+    with EvalCache(path) as cache:   # persistent tier survives a restart
+        assert cache.get("fake", b, 18, 3)[0].pv_san == "e4 e5"
+
+def test_wider_shallower_entry_replaces_deeper_narrower():
+    b = chess.Board()
+    deep = [EngineLine(move=chess.Move.from_uci("e2e4"), cp=30.0, mate=None, pv_san="e4")]
+    wide = [EngineLine(move=chess.Move.from_uci(u), cp=cp, mate=None, pv_san=u)
+            for u, cp in [("e2e4", 25.0), ("d2d4", 20.0), ("g1f3", 15.0)]]
+    with EvalCache(None) as cache:
+        cache.put("fake", b, 18, 1, deep)
+        assert cache.get("fake", b, 12, 3) is None
+        cache.put("fake", b, 12, 3, wide)          # not dominated by (18, 1): stored
+        assert len(cache.get("fake", b, 12, 3)) == 3
+        cache.put("fake", b, 10, 2, deep)          # dominated by (12, 3): ignored
+        assert len(cache.get("fake", b, 12, 3)) == 3
+
+def test_settled_entries_serve_adaptive_requests_only(tmp_path):
+    b = chess.Board()
+    lines = [EngineLine(move=chess.Move.from_uci("e2e4"), cp=30.0, mate=None, pv_san="e4")]
+    path = str(tmp_path / "evals.lmdb")
+    with EvalCache(path) as cache:
+        cache.put("capped", b, 9, 1, lines)
+        cache.put("settled", b, 9, 1, lines, settled=True)
+        assert cache.get("capped", b, 16, 1, settled_depth=8) is None
+        assert cache.get("settled", b, 16, 1) is None
+    with EvalCache(path) as cache:   # the flag is persisted
+        assert cache.get("settled", b, 16, 1, settled_depth=8) is not None
@@ -7,3 +7,28 @@ def test_planes_shape():
     x = board_to_planes(b)
     assert x.shape == (18,8,8)
     assert x.dtype == np.float32
+
+def test_packed_planes_round_trip():
+    import numpy as np
+    from src.learning.features import pack_planes, unpack_planes
+    b = chess.Board()
+    for san in ["e4", "c5", "Nf3", "d6", "Bb5+", "Bd7", "O-O"]:
+        b.push_san(san)
+    x = board_to_planes(b)
+    bitboards, flags = pack_planes(x)
+    assert int(bitboards[0, 0]) == int(b.pieces(chess.PAWN, chess.WHITE))
+    assert bitboards.nbytes + flags.nbytes < 100
+    assert np.array_equal(unpack_planes(bitboards, flags)[0], x)
+
+def test_boards_to_planes_matches_single_board_encoder():
+    import numpy as np
+    from src.learning.features import boards_to_planes
+    boards = [chess.Board(), chess.Board("r3k2r/8/8/8/8/8/8/R3K2R b Kq - 0 1")]
+    b = chess.Board()
+    for san in ["e4", "e5", "Ke2", "Nc6"]:
+        b.push_san(san)
+        boards.append(b.copy())
+    out = np.empty((len(boards), 18, 8, 8), dtype=np.float32)
+    got = boards_to_planes(boards, out=out)
+    assert got is out
+    assert np.array_equal(got, np.stack([board_to_planes(x) for x in boards]))
@@ -0,0 +1,65 @@
+import os
+import threading
+
+import chess
+import numpy as np
+import pytest
+import torch
+
+from models.nn.value_policy_net import ValuePolicyNet
+from src.learning.features import board_to_planes
+from src.learning.inference_server import InferenceServer
+
+def _boards(n):
+    boards, b = [], chess.Board()
+    for _ in range(n):
+        b.push(next(iter(b.legal_moves)))
+        boards.append(b.copy(stack=False))
+    return boards
+
+def test_batches_concurrent_requests_and_matches_model(tmp_path):
+    path = str(tmp_path / "latest.ckpt")
+    model = ValuePolicyNet()
+    torch.save(model.state_dict(), path)
+    boards = _boards(16)
+    results = [None] * len(boards)
+    with InferenceServer(path, window_ms=50) as srv:
+        def ask(i):
+            results[i] = srv.predict(boards[i])
+        threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(boards))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert srv.batches < len(boards) and srv.positions == len(boards)
+        bulk = srv.predict_many(boards[:3])
+    model.eval()
+    with torch.no_grad():
+        v, p = model(torch.from_numpy(np.stack([board_to_planes(b) for b in boards])))
+    assert np.allclose([r.value for r in results], v[:, 0].numpy(), atol=1e-5)
+    assert np.allclose(results[5].policy, p[5].numpy(), atol=1e-4)
+    assert np.allclose(bulk[2].policy, results[2].policy, atol=1e-5)
+    assert results[0].moves(boards[0])[0][0] in boards[0].legal_moves
+
+def test_submit_after_close_raises(tmp_path):
+    path = str(tmp_path / "latest.ckpt")
+    torch.save(ValuePolicyNet().state_dict(), path)
+    srv = InferenceServer(path)
+    srv.close()
+    with pytest.raises(RuntimeError):
+        srv.submit(chess.Board())
+    srv.close()                     # idempotent
+
+def test_reloads_new_checkpoint_and_quantized_mode(tmp_path):
+    path = str(tmp_path / "latest.ckpt")
+    board = chess.Board()
+    with InferenceServer(path, reload_every_s=0.0) as srv:
+        before = srv.predict(board).value
+        model = ValuePolicyNet()
+        with torch.no_grad():
+            model.head_val[-2].bias.fill_(5.0)       # value saturates near +1
+        torch.save(model.state_dict(), path)
+        after = srv.predict(board).value
+    assert after > 0.99 and after != before
+    with InferenceServer(path, mode="int8") as srv:
+        assert srv.predict(board_to_planes(board)).value > 0.99
@@ -0,0 +1,44 @@
+import random
+
+import chess
+import numpy as np
+
+from models.nn.value_policy_net import ValuePolicyNet
+from src.learning.features import targets_from_engine
+from src.learning.inference import choose_move_from_policy
+from src.learning.move_encoding import (NO_POLICY, POLICY_SIZE, index_to_move, legal_mask, legal_masks,
+                                        move_to_index)
+
+def test_every_legal_move_round_trips_to_a_unique_index():
+    rng = random.Random(0)
+    for _ in range(30):
+        board = chess.Board()
+        for _ in range(80):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            idx = [move_to_index(m) for m in moves]
+            assert len(set(idx)) == len(moves) and min(idx) >= 0 and max(idx) < POLICY_SIZE
+            assert all(index_to_move(i, board) == m for i, m in zip(idx, moves))
+            board.push(rng.choice(moves))
+
+def test_promotions_and_masks():
+    board = chess.Board("1n5k/P7/8/8/8/8/7K/8 w - - 0 1")
+    promos = {m for m in board.legal_moves if m.from_square == chess.A7}
+    assert {index_to_move(move_to_index(m), board) for m in promos} == promos
+    assert len(promos) == 8          # a8 push and b8 capture, four pieces each
+    mask = legal_mask(board)
+    assert mask.sum() == board.legal_moves.count()
+    assert np.array_equal(legal_masks([board, chess.Board()])[0], mask)
+
+def test_targets_and_policy_choice():
+    board = chess.Board()
+    _, pol = targets_from_engine(30.0, best_move=chess.Move.from_uci("e2e4"))
+    assert pol == move_to_index(chess.Move.from_uci("e2e4"))
+    assert targets_from_engine(30.0)[1] == NO_POLICY
+    logits = np.zeros(POLICY_SIZE, dtype=np.float32)
+    logits[move_to_index(chess.Move.from_uci("a1a8"))] = 50.0   # illegal: must be masked out
+    logits[pol] = 10.0
+    assert choose_move_from_policy(board, logits, sample=False) == chess.Move.from_uci("e2e4")
+    assert choose_move_from_policy(board, logits) in board.legal_moves
+    assert ValuePolicyNet().head_pol[-1].out_features == POLICY_SIZE
@@ -0,0 +1,52 @@
+import io
+import random
+
+import chess
+import chess.pgn
+import torch
+
+from models.nn.value_policy_net import ValuePolicyNet
+from src.learning.move_encoding import move_to_index
+from src.learning.offline_train import PGNPositionDataset, _SampleVisitor, iter_samples, main, shard_offsets
+
+def _write_games(path, n_games, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for g in range(n_games):
+            game = chess.pgn.Game()
+            game.headers["Event"] = f"g{g}"
+            node, board = game, chess.Board()
+            for _ in range(12):
+                move = rng.choice(list(board.legal_moves))
+                board.push(move)
+                node = node.add_variation(move)
+                node.comment = f"[%eval {rng.uniform(-3, 3):.2f}]"
+            print(game, file=f, end="\n\n")
+
+def test_eval_targets_are_from_side_to_move():
+    pgn = io.StringIO("1. e4 { [%eval 1.5] } e5 { [%eval -0.5] } 2. Nf3 *\n")
+    samples = chess.pgn.read_game(pgn, Visitor=_SampleVisitor)
+    # position after 1.e4 (black to move, white +1.5) and after 1...e5 (white to move, -0.5)
+    (_, v1, p1), (_, v2, p2) = samples
+    assert v1 < 0 and v2 < 0
+    assert p1 == move_to_index(chess.Move.from_uci("e7e5")) and p2 == move_to_index(chess.Move.from_uci("g1f3"))
+
+def test_shards_cover_every_game_once(tmp_path):
+    path = str(tmp_path / "games.pgn")
+    _write_games(path, 40)
+    whole = list(iter_samples(path))
+    offsets = shard_offsets(path, 3)
+    parts = [s for i in range(3) for s in iter_samples(path, offsets[i], offsets[i + 1])]
+    assert len(whole) == 40 * 11
+    assert sorted(parts) == sorted(whole)
+
+def test_dataset_batches_and_training_checkpoint(tmp_path):
+    path = str(tmp_path / "games.pgn")
+    _write_games(path, 20)
+    X, V, P = next(iter(PGNPositionDataset([path], batch_size=32, shuffle_buffer=64)))
+    assert X.shape == (32, 18, 8, 8) and V.shape == (32, 1) and P.shape == (32,)
+
+    model, opt = str(tmp_path / "ckpt" / "latest.ckpt"), str(tmp_path / "opt" / "latest.opt")
+    assert main([path, "--workers", "0", "--batch-size", "64", "--model", model,
+                 "--optimizer", opt, "--max-steps", "3", "--device", "cpu"]) == 0
+    ValuePolicyNet(in_channels=18).load_state_dict(torch.load(model))
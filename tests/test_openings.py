@@ -8,3 +8,39 @@ def test_ruy_lopez_detection():
         b.push_san(san)
     m = ex.identify(b)
     assert m and m.eco == "C60" and "Ruy Lopez" in m.name
+
+def test_longest_prefix_and_incremental_cursor():
+    ex = OpeningExplorer()
+    b = chess.Board()
+    cur = ex.start()
+    for san in ["e4","e5","Nf3","Nc6","Bb5","a6","Ba4"]:
+        mv = b.push_san(san)
+        cur = ex.advance(cur, mv)
+    m = ex.identify(b)
+    assert m and m.eco == "C60" and m.matched_moves == 5
+    assert cur.match == m
+
+def test_transposition_is_identified():
+    ex = OpeningExplorer()
+    b = chess.Board()
+    for san in ["c4","c6","d4","d5"]:   # Slav Defence via the English move order
+        b.push_san(san)
+    m = ex.identify(b)
+    assert m and m.eco == "D15"
+
+def test_eco_pgn_loader_and_cache(tmp_path):
+    from src.openings import pgn_loader
+    pgn = tmp_path / "eco.pgn"
+    pgn.write_text('[ECO "C42"]\n[Opening "Petrov Defence"]\n\n1. e4 e5 2. Nf3 Nf6 *\n\n'
+                   '[Event "unnamed"]\n\n1. d4 *\n', encoding="utf-8")
+    first = pgn_loader.load_book(str(pgn), cache_dir=str(tmp_path))
+    assert [(l.san, l.eco) for l in first] == [(("e4", "e5", "Nf3", "Nf6"), "C42")]
+    assert list(tmp_path.glob("*.book.json"))
+    assert pgn_loader.load_book(str(pgn), cache_dir=str(tmp_path)) == first
+
+    ex = OpeningExplorer()
+    ex.load_eco_pgn(str(pgn), cache_dir=str(tmp_path))
+    b = chess.Board()
+    for san in ["e4","e5","Nf3","Nf6","Nxe5"]:
+        b.push_san(san)
+    assert ex.identify(b).name == "Petrov Defence"
@@ -0,0 +1,14 @@
+import os
+
+from src.trainer import precompute_cli
+
+def test_precompute_is_resumable(tmp_path, capsys, fake_engine):
+    launcher = tmp_path / "fake-engine"
+    launcher.write_text("#!/bin/sh\nexec " + " ".join(f'"{a}"' for a in fake_engine) + ' "$@"\n')
+    os.chmod(launcher, 0o755)
+    argv = ["--engine", str(launcher), "--depth", "2", "--max-ply", "2", "--workers", "1",
+            "--store", str(tmp_path / "evals.lmdb")]
+    assert precompute_cli.main(argv) == 0
+    assert precompute_cli.main(argv) == 0
+    out = capsys.readouterr().out
+    assert ", 0 to analyse" in out.splitlines()[-2]
@@ -0,0 +1,52 @@
+import json
+import threading
+import time
+
+from src.utils.logging_utils import Profiler
+
+def test_span_percentiles():
+    prof = Profiler()
+    for i in range(100):
+        prof.record("a", (i + 1) * 1_000_000)
+    with prof.span("b"):
+        time.sleep(0.001)
+    s = prof.summary()
+    assert s["a"]["count"] == 100
+    assert s["a"]["p50_ms"] == 51.0
+    assert s["a"]["p99_ms"] == 100.0
+    assert s["a"]["max_ms"] == 100.0
+    assert s["b"]["count"] == 1 and s["b"]["total_ms"] >= 1.0
+    assert "a" in prof.report()
+
+def test_disabled_records_nothing():
+    prof = Profiler(enabled=False)
+    with prof.span("a"):
+        pass
+    assert prof.summary() == {}
+
+def test_exports(tmp_path):
+    prof = Profiler(trace=True)
+    with prof.span("engine.search"):
+        with prof.span("engine.cache"):
+            pass
+    prof.export_json(str(tmp_path / "p.json"))
+    prof.export_chrome_trace(str(tmp_path / "trace.json"))
+    assert set(json.loads((tmp_path / "p.json").read_text())["spans"]) == {"engine.search", "engine.cache"}
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["engine.cache", "engine.search"]
+    assert all(e["ph"] == "X" and e["cat"] == "engine" for e in events)
+
+def test_concurrent_spans_are_all_counted():
+    prof = Profiler(trace=True)
+    def work():
+        for _ in range(5000):
+            with prof.span("hot"):
+                pass
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        prof.summary()          # reading while spans are recorded must not raise
+    for t in threads:
+        t.join()
+    assert prof.summary()["hot"]["count"] == 20000
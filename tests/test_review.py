@@ -0,0 +1,57 @@
+import chess
+import chess.pgn
+
+from src.engine.engine_pool import EnginePool, PoolResult
+from src.openings.opening_explorer import OpeningExplorer
+from src.trainer.review_cli import analyse_positions, book_deviation, main, review_game
+from src.utils.pgn_utils import save_game
+
+def _game(sans):
+    board = chess.Board()
+    for san in sans:
+        board.push_san(san)
+    return chess.pgn.Game.from_board(board)
+
+def test_review_dedupes_positions_and_scores_moves(fake_engine):
+    a = _game(["e4", "e5", "Nf3", "Nc6", "Bc4", "a6"])
+    b = _game(["e4", "e5", "Nf3", "d6", "Bc4"])
+    with EnginePool(fake_engine, size=2, depth=3, multipv=1) as pool:
+        lines = analyse_positions([a, b], pool)
+    assert len(lines) == 9                  # 7 + 6 positions, 4 shared
+    review = review_game(a, lines, OpeningExplorer())
+    assert [m.san for m in review.moves] == ["e4", "e5", "Nf3", "Nc6", "Bc4", "a6"]
+    assert all(m.loss is not None and m.loss >= 0 for m in review.moves)
+    assert set(review.acpl) == {chess.WHITE, chess.BLACK}
+
+def test_failed_positions_are_reported_on_stderr(capsys):
+    class FailingPool:
+        def imap(self, boards, ordered=True):
+            for i, board in enumerate(boards):
+                error = "EngineTerminatedError: gone" if i == 1 else None
+                yield PoolResult(index=i, fen=board.fen(), lines=[], error=error)
+
+    lines = analyse_positions([_game(["e4", "e5"])], FailingPool())
+    assert len(lines) == 2
+    err = capsys.readouterr().err
+    assert "1 of 3 positions could not be analysed" in err and "EngineTerminatedError" in err
+
+def test_book_deviation_names_the_first_move_off_book():
+    dev = book_deviation(OpeningExplorer(), _game(["e4", "e5", "Nf3", "Nc6", "h3"]))
+    assert dev is not None and dev.startswith("3. h3 (book:")
+
+def test_cli_reviews_pgn_files(fake_engine, tmp_path, capsys):
+    pgn = tmp_path / "session.pgn"
+    pgn.write_text(str(_game(["d4", "d5", "c4"])) + "\n\n" + str(_game(["e4", "c5"])) + "\n")
+    script = tmp_path / "engine.sh"
+    script.write_text("#!/bin/sh\nexec " + " ".join(fake_engine) + ' "$@"\n')
+    script.chmod(0o755)
+    assert main([str(pgn), "--engine", str(script), "--depth", "2", "--workers", "2", "--store", "none"]) == 0
+    out = capsys.readouterr().out
+    assert out.count("ACPL") == 4 and "Reviewed 2 game(s)" in out
+
+def test_save_game_writes_into_the_sessions_directory(tmp_path):
+    board = chess.Board()
+    board.push_san("e4")
+    out = save_game(board, directory=str(tmp_path / "sessions"))
+    assert out.startswith(str(tmp_path / "sessions")) and out.endswith(".pgn")
+    assert "1. e4" in open(out, encoding="utf-8").read()
@@ -0,0 +1,16 @@
+import chess
+
+from src.engine.engine_wrapper import EngineLine
+from src.trainer.scoring import reply_line
+
+def test_reply_line_flips_the_score_and_follows_the_pv():
+    b = chess.Board()
+    pv = [chess.Move.from_uci(u) for u in ["e2e4", "e7e5", "g1f3"]]
+    b.push(pv[0])
+    reply = reply_line(EngineLine(move=pv[0], cp=35.0, mate=None, pv=pv, root=chess.Board()), b)
+    assert reply.move == pv[1] and reply.cp == -35.0 and reply.pv_san == "e5 Nf3"
+    mating = reply_line(EngineLine(move=pv[0], cp=None, mate=3, pv=pv), b)
+    mated = reply_line(EngineLine(move=pv[0], cp=None, mate=-2, pv=pv), b)
+    assert mating.mate == -2 and mated.mate == 2
+    # cached lines carry no PV: the position has to be searched
+    assert reply_line(EngineLine(move=pv[0], cp=35.0, mate=None, pv_san="e4 e5"), b) is None
@@ -0,0 +1,38 @@
+import random
+import time
+
+import chess
+import chess.polyglot
+
+from src.engine.simple_ab import AlphaBetaSearcher, _piece_hash, _state_hash, best_move, material
+
+def test_incremental_hash_and_material_match_full_recompute():
+    s = AlphaBetaSearcher(tt_size=1 << 10)
+    rng = random.Random(3)
+    # castling, en passant and promotions all occur from this position
+    board = chess.Board("r3k2r/pPppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    s._score, s._phash = material(board), _piece_hash(board)
+    s._keys, s._undo = [s._phash ^ _state_hash(board)], []
+    for _ in range(150):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        s._make(board, rng.choice(moves))
+        assert s._score == material(board)
+        assert s.zobrist() == chess.polyglot.zobrist_hash(board)
+
+def test_finds_mate_and_material_with_multipv():
+    board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+    lines = AlphaBetaSearcher().analyse(board, multipv=3, depth=3)
+    assert lines[0].move == chess.Move.from_uci("h5f7") and lines[0].mate == 1
+    assert lines[0].pv_san == "Qxf7#"
+    assert len({ln.move for ln in lines}) == 3 and lines[1].cp >= lines[2].cp
+    move, score = best_move(chess.Board("4k3/8/8/3q4/8/8/3R4/3K4 w - - 0 1"), depth=2)
+    assert move == chess.Move.from_uci("d2d5") and score > 400
+
+def test_time_budget_is_respected():
+    s = AlphaBetaSearcher()
+    t0 = time.perf_counter()
+    lines = s.analyse(chess.Board(), multipv=2, time_limit=0.3)
+    assert time.perf_counter() - t0 < 1.0
+    assert len(lines) == 2 and s.depth >= 1 and lines[0].pv_san
@@ -0,0 +1,52 @@
+import random
+
+import chess
+import chess.pgn
+import numpy as np
+
+from src.openings.opening_explorer import OpeningExplorer
+from src.openings.stats_db import StatsDB, build, merge
+
+def _write_games(path, n, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(n):
+            game = chess.pgn.Game()
+            game.headers["Result"] = rng.choice(["1-0", "0-1", "1/2-1/2"])
+            game.headers["WhiteElo"] = str(1500 + i)
+            game.headers["BlackElo"] = str(1700 + i)
+            node = game
+            for _ in range(12):
+                moves = list(node.board().legal_moves)
+                if not moves:
+                    break
+                node = node.add_variation(rng.choice(moves[:4]))
+            print(game, file=f, end="\n\n")
+    # one unfinished game, which is not counted
+    with open(path, "a") as f:
+        f.write('[Result "*"]\n\n1. e4 *\n\n')
+
+def test_build_and_query(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    _write_games(pgn, 200)
+    one, two = str(tmp_path / "one"), str(tmp_path / "two")
+    assert build([str(pgn)], one, workers=1, max_ply=8) == 200
+    assert build([str(pgn)], two, workers=2, max_ply=8) == 200
+    a, b = StatsDB(one), StatsDB(two)
+    assert np.array_equal(a.keys, b.keys) and np.array_equal(a.stats, b.stats)
+
+    explorer = OpeningExplorer(stats_path=one)
+    root = explorer.move_stats(chess.Board())
+    assert sum(s.games for s in root) >= 200      # stats are per position: transpositions count too
+    assert root == sorted(root, key=lambda s: s.games, reverse=True)
+    assert all(1600 <= s.avg_rating < 1800 for s in root)
+    assert explorer.move_stats(chess.Board("8/8/8/8/8/8/8/K1k5 w - - 0 1")) == []
+
+def test_merge_adds_counts(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    _write_games(pgn, 50)
+    db = str(tmp_path / "db")
+    build([str(pgn)], db, max_ply=4)
+    assert merge([db, db], str(tmp_path / "both")) == 100
+    root = OpeningExplorer(stats_path=str(tmp_path / "both")).move_stats(chess.Board())
+    assert sum(s.games for s in root) == 2 * sum(s.games for s in OpeningExplorer(stats_path=db).move_stats(chess.Board()))